@@ -0,0 +1,187 @@
+import math
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is in seconds"""
+
+    def __init__(self, message, retry_after, code=429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.code = code
+
+
+def estimate_cost(audio_seconds, align=False, diarize=False, align_weight=0.3, diarize_weight=0.5):
+    """Estimate the model work of a request in transcription-seconds.
+
+    Transcribing one second of audio costs 1; alignment and diarization
+    add their weight per second of audio when requested.
+    """
+    weight = 1.0
+    if align:
+        weight += align_weight
+    if diarize:
+        weight += diarize_weight
+    return max(audio_seconds, 0.0) * weight
+
+
+class _Ticket:
+    __slots__ = ("cost", "client", "priority", "start", "seq", "queued_at", "admitted_at", "event")
+
+    def __init__(self, cost, client, priority, start, seq):
+        self.cost = cost
+        self.client = client
+        self.priority = priority
+        self.start = start
+        self.seq = seq
+        self.queued_at = time.time()
+        self.admitted_at = None
+        self.event = threading.Event()
+
+
+class AdmissionController:
+    """Admit model work against a cost budget, queueing the rest fairly.
+
+    Requests hold their estimated cost from admission until release; new
+    work starts only while the costs in flight fit in ``budget`` (and
+    fewer than ``max_running`` requests hold it). A request costing more
+    than the budget runs alone. Waiting requests are ordered by priority,
+    then by start-time fair queuing across clients: each client's requests
+    are tagged with the cost it has already been given, so a client
+    sending a burst of long files cannot hold back clients sending a few
+    short ones.
+
+    ``max_queued`` bounds the waiting requests (0 or None: no limit);
+    beyond it, and after ``max_wait`` seconds of waiting, ``acquire``
+    raises AdmissionRejected with an estimated ``retry_after``.
+    """
+
+    def __init__(self, budget, max_running=0, max_queued=64, max_wait=None, seconds_per_cost=0.1):
+        self.budget = budget
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_use = 0.0
+        self._running = 0
+        self._virtual_time = 0.0
+        self._client_finish = {}
+        # Observed processing seconds per unit of cost, for Retry-After
+        self._seconds_per_cost = seconds_per_cost
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _retry_after(self):
+        # Time to drain the work ahead at the observed throughput
+        outstanding = self._in_use + sum(ticket.cost for ticket in self._waiting)
+        seconds = outstanding * self._seconds_per_cost / max(self._running, 1)
+        return int(min(max(math.ceil(seconds), 1), 600))
+
+    def _reject_if_full(self):
+        if self.max_queued and len(self._waiting) >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected("Server is at capacity, please retry later", self._retry_after())
+
+    def check(self):
+        """Raise AdmissionRejected now if the queue is full.
+
+        Lets endpoints reject before downloading and decoding media whose
+        cost is only known afterwards.
+        """
+        with self._lock:
+            self._reject_if_full()
+
+    def acquire(self, cost, client=None, priority=0, bounded=True):
+        """Block until ``cost`` fits in the budget and return a ticket for ``release``.
+
+        Unbounded requests (queued jobs, batch items) skip the queue limit
+        and wait as long as it takes.
+        """
+        if self.budget > 0:
+            cost = min(cost, self.budget)
+        with self._lock:
+            if bounded:
+                self._reject_if_full()
+            start = max(self._virtual_time, self._client_finish.get(client, 0.0))
+            self._client_finish[client] = start + cost
+            ticket = _Ticket(cost, client, priority, start, next(self._seq))
+            self._waiting.append(ticket)
+            self._dispatch()
+
+        if not ticket.event.wait(self.max_wait if bounded else None):
+            with self._lock:
+                if ticket.admitted_at is None:
+                    self._waiting.remove(ticket)
+                    self._dispatch()
+                    self.timed_out += 1
+                    raise AdmissionRejected(
+                        f"Timed out after {self.max_wait}s waiting for capacity", self._retry_after(), 503
+                    )
+        return ticket
+
+    def release(self, ticket):
+        with self._lock:
+            self._in_use -= ticket.cost
+            self._running -= 1
+            held = time.time() - ticket.admitted_at
+            if ticket.cost > 0 and held > 0:
+                self._seconds_per_cost = 0.8 * self._seconds_per_cost + 0.2 * held / ticket.cost
+            self._dispatch()
+
+    @contextmanager
+    def admit(self, cost, client=None, priority=0, bounded=True):
+        """Hold ``cost`` of the budget for the duration of the block"""
+        ticket = self.acquire(cost, client, priority, bounded)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _dispatch(self):
+        # Called with the lock held: admit from the head of the queue while it fits
+        while self._waiting:
+            head = min(self._waiting, key=lambda t: (-t.priority, t.start, t.seq))
+            if self._running and (
+                (self.budget > 0 and self._in_use + head.cost > self.budget)
+                or (self.max_running > 0 and self._running >= self.max_running)
+            ):
+                break
+            self._waiting.remove(head)
+            self._in_use += head.cost
+            self._running += 1
+            self._virtual_time = max(self._virtual_time, head.start)
+            head.admitted_at = time.time()
+            self.admitted += 1
+            head.event.set()
+        # Forget clients that are no longer ahead of the virtual clock
+        if len(self._client_finish) > 1024:
+            self._client_finish = {
+                client: finish for client, finish in self._client_finish.items()
+                if finish > self._virtual_time
+            }
+
+    def stats(self):
+        with self._lock:
+            clients = {}
+            for ticket in self._waiting:
+                clients[str(ticket.client)] = clients.get(str(ticket.client), 0) + 1
+            return {
+                "budget": self.budget,
+                "in_use": round(self._in_use, 1),
+                "running": self._running,
+                "max_running": self.max_running,
+                "queued": len(self._waiting),
+                "queued_cost": round(sum(ticket.cost for ticket in self._waiting), 1),
+                "max_queued": self.max_queued,
+                "queued_by_client": clients,
+                "seconds_per_cost": round(self._seconds_per_cost, 4),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out
+            }
@@ -1,16 +1,38 @@
 import os
 import time
-import tempfile
-import requests
+import json
+import queue
+import threading
 import traceback
 import gc
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, has_request_context, stream_with_context
 from flask_cors import CORS
-import whisperx
-import torch
+import numpy as np
 
 from config import Config
+from lazy_import import torch, whisperx
+from jobs import JobManager, JobQueueFull
+from admission import AdmissionController, AdmissionRejected, estimate_cost
+from encoding import (
+    JSON_MIMETYPE, columnar_transcript, compress, dump_msgpack, negotiate_encoding, preferred_mimetype,
+    segments_from_columns
+)
+from batching import BatchScheduler, iter_transcribe, plan_chunks
+from result_cache import ResultCache, hash_file
+from model_pool import ModelPool, estimate_whisper_bytes
+from speakers import assign_speakers, diarization_to_turns
+from audio import SAMPLE_RATE, decode_audio, probe_duration
+from ingest import IngestError, MediaFetcher, MediaFile, size_limit_message
+from windowing import WindowStitcher, plan_windows
+from metrics import (
+    AUDIO_SECONDS, CACHE_LOOKUPS, CONTENT_TYPE as METRICS_CONTENT_TYPE, GPU_MEMORY_PEAK, IN_FLIGHT,
+    REAL_TIME_FACTOR, REGISTRY, REQUEST_SECONDS, REQUESTS, Counter, Gauge, record_model_load, span
+)
+from subtitles import SUBTITLE_MIMETYPES, WRITERS, generate_srt, generate_txt, generate_vtt
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -18,46 +40,110 @@ app.config.from_object(Config)
 CORS(app)
 
 # Global variables to store loaded models (for efficiency)
-whisper_model = None
-align_model = None
 diarize_model = None
-align_metadata = None
-
-def load_whisper_model():
-    """Load WhisperX model once at startup"""
-    global whisper_model
-    if whisper_model is None:
-        print(f"Loading WhisperX model: {Config.DEFAULT_MODEL}")
-        whisper_model = whisperx.load_model(
-            Config.DEFAULT_MODEL, 
-            device=Config.DEFAULT_DEVICE,
-            compute_type=Config.DEFAULT_COMPUTE_TYPE
-        )
-        print("WhisperX model loaded successfully")
-    return whisper_model
+diarize_model_lock = threading.Lock()
+diarize_model_load_seconds = None
+batch_schedulers = {}
+batch_schedulers_lock = threading.Lock()
+result_cache = None
+
+def parse_model_spec(spec):
+    """Turn a ``name`` or ``name:compute_type`` string into a pool key"""
+    name, _, compute_type = spec.partition(":")
+    return (name, Config.DEFAULT_DEVICE, compute_type or Config.DEFAULT_COMPUTE_TYPE)
+
+def _load_whisper_model(name, device, compute_type):
+    if device == "cpu" and Config.CPU_THREADS:
+        return whisperx.load_model(name, device=device, compute_type=compute_type, threads=Config.CPU_THREADS)
+    return whisperx.load_model(name, device=device, compute_type=compute_type)
+
+def _close_batch_scheduler(key):
+    # An evicted model must not be kept alive by its scheduler thread
+    with batch_schedulers_lock:
+        scheduler = batch_schedulers.pop(key, None)
+    if scheduler is not None:
+        scheduler.close()
+
+# WhisperX models keyed on (name, device, compute_type); pinned models are never evicted
+whisper_pool = ModelPool(
+    "whisper",
+    _load_whisper_model,
+    max_models=Config.WHISPER_POOL_MAX_MODELS,
+    max_bytes=Config.WHISPER_POOL_MAX_BYTES,
+    size_fn=estimate_whisper_bytes,
+    pinned=[parse_model_spec(spec) for spec in Config.WHISPER_PINNED_MODELS],
+    on_load=lambda key, seconds: record_model_load("whisper", seconds),
+    on_evict=_close_batch_scheduler
+)
+
+def whisper_model_key(params=None):
+    """Pool key of the WhisperX model a request asked for"""
+    params = params or {}
+    return (
+        params.get("model") or Config.DEFAULT_MODEL,
+        Config.DEFAULT_DEVICE,
+        params.get("compute_type") or Config.DEFAULT_COMPUTE_TYPE
+    )
+
+def _load_align_model(language_code, device):
+    return whisperx.load_align_model(language_code=language_code, device=device)
+
+# Alignment models keyed on (language, device), evicted least recently used first
+align_pool = ModelPool(
+    "alignment",
+    _load_align_model,
+    max_models=Config.ALIGN_POOL_MAX_MODELS,
+    max_bytes=Config.ALIGN_POOL_MAX_BYTES,
+    on_load=lambda key, seconds: record_model_load("alignment", seconds)
+)
+
+# Runs diarization alongside transcription (see PARALLEL_DIARIZATION)
+diarization_executor = ThreadPoolExecutor(
+    max_workers=Config.DIARIZATION_WORKERS,
+    thread_name_prefix="diarize"
+)
+
+def get_batch_scheduler(key, model):
+    """Return the cross-request batch scheduler for one pooled WhisperX model"""
+    with batch_schedulers_lock:
+        scheduler = batch_schedulers.get(key)
+        if scheduler is None:
+            scheduler = batch_schedulers[key] = BatchScheduler(
+                model,
+                batch_size=Config.DEFAULT_BATCH_SIZE,
+                max_wait=Config.BATCH_MAX_WAIT_MS / 1000.0
+            )
+            print(f"Batch scheduler started for {key} (batch size {Config.DEFAULT_BATCH_SIZE}, max wait {Config.BATCH_MAX_WAIT_MS} ms)")
+    return scheduler
+
+def get_result_cache():
+    """Open the on-disk result cache, or return None when disabled"""
+    global result_cache
+    if result_cache is None and Config.RESULT_CACHE_ENABLED:
+        try:
+            result_cache = ResultCache(Config.RESULT_CACHE_DIR, Config.RESULT_CACHE_MAX_BYTES)
+            print(f"Result cache ready at {Config.RESULT_CACHE_DIR}")
+        except OSError as e:
+            print(f"Warning: Result cache disabled: {e}")
+            Config.RESULT_CACHE_ENABLED = False
+    return result_cache
 
 def load_alignment_model(language_code):
-    """Load alignment model for specific language"""
-    global align_model, align_metadata
+    """Load alignment model for specific language from the alignment model pool"""
     try:
-        model_key = f"{language_code}_{Config.DEFAULT_DEVICE}"
-        if align_model is None or getattr(align_model, '_language', None) != language_code:
-            print(f"Loading alignment model for language: {language_code}")
-            align_model, align_metadata = whisperx.load_align_model(
-                language_code=language_code, 
-                device=Config.DEFAULT_DEVICE
-            )
-            align_model._language = language_code  # Store language for reference
-            print(f"Alignment model loaded for {language_code}")
-        return align_model, align_metadata
+        return align_pool.get((language_code, Config.DEFAULT_DEVICE))
     except Exception as e:
         print(f"Warning: Could not load alignment model for {language_code}: {e}")
         return None, None
 
 def load_diarization_model():
     """Load speaker diarization model using pyannote directly"""
-    global diarize_model
-    if diarize_model is None:
+    global diarize_model, diarize_model_load_seconds
+    if diarize_model is not None:
+        return diarize_model
+    with diarize_model_lock:
+        if diarize_model is not None:
+            return diarize_model
         print("Loading diarization model...")
         try:
             # Check for Hugging Face token in environment
@@ -65,9 +151,10 @@ def load_diarization_model():
             if not hf_token:
                 raise Exception("Speaker diarization requires a Hugging Face token. Please set HUGGINGFACE_TOKEN environment variable. Get your token at: https://huggingface.co/settings/tokens")
             
+            started = time.time()
             # Try to use whisperx.DiarizationPipeline first
             try:
-                diarize_model = whisperx.DiarizationPipeline(
+                model = whisperx.DiarizationPipeline(
                     use_auth_token=hf_token,
                     device=Config.DEFAULT_DEVICE
                 )
@@ -76,36 +163,45 @@ def load_diarization_model():
                 print("WhisperX DiarizationPipeline not found, using pyannote directly...")
                 # Use pyannote directly as fallback
                 from pyannote.audio import Pipeline
-                diarize_model = Pipeline.from_pretrained(
+                model = Pipeline.from_pretrained(
                     "pyannote/speaker-diarization-3.1",
                     use_auth_token=hf_token
                 ).to(torch.device(Config.DEFAULT_DEVICE))
                 print("Diarization model loaded successfully via pyannote")
+            diarize_model_load_seconds = time.time() - started
+            record_model_load("diarization", diarize_model_load_seconds)
+            diarize_model = model
                 
         except Exception as e:
             print(f"Failed to load diarization model: {e}")
             return None
     return diarize_model
 
-def download_file_from_url(url):
-    """Download file from URL to temporary location"""
+# Downloads and decodes batch items ahead of the GPU stage
+prefetch_executor = ThreadPoolExecutor(
+    max_workers=Config.PREFETCH_WORKERS,
+    thread_name_prefix="prefetch"
+)
+
+# Pooled HTTP downloads, uploads and allow-listed local paths
+media_fetcher = MediaFetcher(
+    Config.MAX_FILE_SIZE,
+    chunk_size=Config.DOWNLOAD_CHUNK_SIZE,
+    timeout=Config.DOWNLOAD_TIMEOUT_SECONDS,
+    pool_size=Config.DOWNLOAD_POOL_SIZE,
+    range_threshold=Config.RANGE_DOWNLOAD_THRESHOLD_BYTES,
+    range_parts=Config.RANGE_DOWNLOAD_PARTS,
+    allowed_dirs=Config.LOCAL_MEDIA_DIRS
+)
+
+def fetch_media(params):
+    """Return the request's media as a MediaFile (upload, local path or download)"""
+    if params.get("upload_path"):
+        return MediaFile(params["upload_path"], owned=True)
     try:
-        print(f"Downloading file from: {url}")
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.audio')
-        
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                temp_file.write(chunk)
-        
-        temp_file.close()
-        print(f"File downloaded to: {temp_file.name}")
-        return temp_file.name
-    except Exception as e:
-        raise Exception(f"Failed to download file: {str(e)}")
+        return media_fetcher.fetch(params["media_url"])
+    except IngestError as e:
+        raise TranscriptionError(str(e), e.code)
 
 def format_transcription_output(result, segments, word_segments, speakers_result, params):
     """Format the transcription result according to requested output format"""
@@ -131,100 +227,137 @@ def format_transcription_output(result, segments, word_segments, speakers_result
     # Handle different output formats
     output_format = params.get("output_format", "json")
     
+    subtitle_options = get_subtitle_options(params, result.get("language"))
+    
     if output_format == "srt" or output_format == "all":
-        response_data["srt"] = generate_srt(segments, params.get("max_words_per_line"))
+        response_data["srt"] = generate_srt(segments, **subtitle_options)
     
     if output_format == "txt" or output_format == "all":
-        response_data["txt"] = result.get("text", "")
+        response_data["txt"] = result.get("text", "") or generate_txt(segments, **subtitle_options)
     
     if output_format == "vtt" or output_format == "all":
-        response_data["vtt"] = generate_vtt(segments)
+        response_data["vtt"] = generate_vtt(segments, **subtitle_options)
+    
+    if params.get("response_layout") == "columnar":
+        # One array per field instead of one object per segment and word;
+        # "speakers" and "word_segments" only repeat what the columns hold
+        response_data["columns"] = columnar_transcript(
+            response_data.pop("segments", None),
+            response_data.pop("word_segments", None)
+        )
+        response_data.pop("speakers", None)
+        if response_data.get("txt") == response_data["text"]:
+            del response_data["txt"]
     
     return response_data
 
-def generate_srt(segments, max_words_per_line=None):
-    """Generate SRT format from segments"""
-    srt_content = ""
-    for i, segment in enumerate(segments, 1):
-        start_time = format_timestamp(segment.get("start", 0))
-        end_time = format_timestamp(segment.get("end", 0))
-        text = segment.get("text", "").strip()
-        
-        # Handle max words per line
-        if max_words_per_line and max_words_per_line > 0:
-            words = text.split()
-            lines = []
-            for j in range(0, len(words), max_words_per_line):
-                lines.append(" ".join(words[j:j + max_words_per_line]))
-            text = "\n".join(lines)
-        
-        srt_content += f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
-    
-    return srt_content
-
-def generate_vtt(segments):
-    """Generate VTT format from segments"""
-    vtt_content = "WEBVTT\n\n"
-    for segment in segments:
-        start_time = format_timestamp(segment.get("start", 0), vtt_format=True)
-        end_time = format_timestamp(segment.get("end", 0), vtt_format=True)
-        text = segment.get("text", "").strip()
-        vtt_content += f"{start_time} --> {end_time}\n{text}\n\n"
-    
-    return vtt_content
-
-def format_timestamp(seconds, vtt_format=False):
-    """Format timestamp for SRT/VTT"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millisecs = int((seconds % 1) * 1000)
-    
-    if vtt_format:
-        return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millisecs:03d}"
-    else:
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
+def get_subtitle_options(params, language=None):
+    """Collect the cue layout options for the subtitle writers"""
+    return {
+        "max_words_per_line": params.get("max_words_per_line"),
+        "max_chars": params.get("max_chars_per_cue"),
+        "max_words": params.get("max_words_per_cue"),
+        "max_duration": params.get("max_cue_duration"),
+        "language": language
+    }
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "version": "1.0.0"
-    })
+def format_pipeline_result(pipeline_result, params):
+    """Format a (possibly cached) pipeline result for the response"""
+    return format_transcription_output(
+        pipeline_result,
+        pipeline_result["segments"],
+        pipeline_result.get("word_segments"),
+        pipeline_result.get("speakers_result"),
+        params
+    )
 
-@app.route(f'/{Config.API_VERSION}/media/transcribe', methods=['POST'])
-def transcribe_media():
-    """Main transcription endpoint following NCAA toolkit style"""
-    start_time = time.time()
-    temp_file_path = None
-    
+# Admission control: bounds the model work running at once
+admission = AdmissionController(
+    budget=Config.ADMISSION_BUDGET_SECONDS,
+    max_running=Config.ADMISSION_MAX_RUNNING,
+    max_queued=Config.ADMISSION_QUEUE_SIZE,
+    max_wait=Config.ADMISSION_MAX_WAIT_SECONDS
+) if Config.ADMISSION_ENABLED else None
+
+ADMISSION_REJECTIONS = Counter("whisperx_admission_rejections", "Requests turned away by admission control", ["reason"], registry=REGISTRY)
+
+def check_admission():
+    """Reject early, before fetching media, when the admission queue is full"""
+    if admission is not None:
+        try:
+            admission.check()
+        except AdmissionRejected:
+            ADMISSION_REJECTIONS.labels(reason="queue_full").inc()
+            raise
+
+@contextmanager
+def admitted(duration, params, timings, bounded=True):
+    """Hold the request's estimated cost of the admission budget while the models run"""
+    if admission is None:
+        yield
+        return
+    cost = estimate_cost(
+        duration,
+        align=params["include_word_timestamps"],
+        diarize=params["include_speaker_labels"],
+        align_weight=Config.ADMISSION_ALIGN_WEIGHT,
+        diarize_weight=Config.ADMISSION_DIARIZE_WEIGHT
+    )
+    try:
+        with span("admission_wait", timings):
+            ticket = admission.acquire(cost, params.get("client_id"), Config.PRIORITIES[params["priority"]], bounded)
+    except AdmissionRejected as e:
+        ADMISSION_REJECTIONS.labels(reason="queue_full" if e.code == 429 else "timeout").inc()
+        raise
+    try:
+        yield
+    finally:
+        admission.release(ticket)
+
+def admission_rejected(endpoint, error, request_id, start_time=None):
+    """429/503 envelope with a Retry-After header for rejected requests"""
+    body = {
+        "endpoint": endpoint,
+        "code": error.code,
+        "id": request_id,
+        "response": None,
+        "message": str(error)
+    }
+    if start_time is not None:
+        body["processing_time"] = round(time.time() - start_time, 2)
+    response = jsonify(body)
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.code
+
+def envelope_response(body, code=200):
+    """Response envelope as JSON, or msgpack when the Accept header prefers it"""
+    mimetype = preferred_mimetype(request.accept_mimetypes)
+    if mimetype == JSON_MIMETYPE:
+        return jsonify(body), code
+    return Response(dump_msgpack(body), status=code, mimetype=mimetype)
+
+class TranscriptionError(Exception):
+    """Error raised by the transcription pipeline with an HTTP status code"""
+
+    def __init__(self, message, code=500):
+        super().__init__(message)
+        self.code = code
+
+def parse_transcribe_params(data, upload_path=None):
+    """Extract and validate transcription parameters from a request body"""
+    if not upload_path and (not data or not data.get('media_url')):
+        raise TranscriptionError("media_url or a file upload is required", 400)
+
+    # Extract parameters with defaults and type conversion
     try:
-        # Validate request
-        if not request.is_json:
-            return jsonify({
-                "endpoint": f"/{Config.API_VERSION}/media/transcribe",
-                "code": 400,
-                "message": "Content-Type must be application/json"
-            }), 400
-        
-        data = request.get_json()
-        
-        # Validate required parameters
-        if not data.get('media_url'):
-            return jsonify({
-                "endpoint": f"/{Config.API_VERSION}/media/transcribe",
-                "code": 400,
-                "message": "media_url is required"
-            }), 400
-        
-        # Extract parameters with defaults and type conversion
         params = {
             "media_url": data.get("media_url"),
+            "model": data.get("model") or Config.DEFAULT_MODEL,
+            "compute_type": data.get("compute_type") or Config.DEFAULT_COMPUTE_TYPE,
             "task": data.get("task", "transcribe"),
             "language": data.get("language"),  # None = auto-detect
             "output_format": data.get("output_format", "json"),
+            "response_layout": data.get("response_layout", "objects"),
             "include_word_timestamps": str(data.get("include_word_timestamps", False)).lower() == "true",
             "include_speaker_labels": str(data.get("include_speaker_labels", False)).lower() == "true",
             "include_segments": str(data.get("include_segments", True)).lower() == "true",
@@ -232,181 +365,718 @@ def transcribe_media():
             "beam_size": int(data.get("beam_size", 5)),
             "temperature": float(data.get("temperature", 0.0)),
             "max_words_per_line": int(data.get("max_words_per_line", 0)) if data.get("max_words_per_line") else None,
-            "id": data.get("id")
+            "include_timings": str(data.get("include_timings", False)).lower() == "true",
+            "max_chars_per_cue": int(data.get("max_chars_per_cue", 0)) if data.get("max_chars_per_cue") else None,
+            "max_words_per_cue": int(data.get("max_words_per_cue", 0)) if data.get("max_words_per_cue") else None,
+            "max_cue_duration": float(data.get("max_cue_duration", 0)) if data.get("max_cue_duration") else None,
+            "priority": data.get("priority") or "normal",
+            "client_id": data.get("client_id") or request_client(),
+            "id": data.get("id"),
+            "upload_path": upload_path
         }
-        
-        # Validate parameters
-        if params["task"] not in Config.SUPPORTED_TASKS:
-            return jsonify({
-                "endpoint": f"/{Config.API_VERSION}/media/transcribe",
-                "code": 400,
-                "message": f"Invalid task. Supported: {Config.SUPPORTED_TASKS}"
-            }), 400
-        
-        if params["output_format"] not in Config.SUPPORTED_OUTPUT_FORMATS:
-            return jsonify({
-                "endpoint": f"/{Config.API_VERSION}/media/transcribe",
-                "code": 400,
-                "message": f"Invalid output_format. Supported: {Config.SUPPORTED_OUTPUT_FORMATS}"
-            }), 400
-        
-        # Download audio file
-        temp_file_path = download_file_from_url(params["media_url"])
-        
-        # Load WhisperX model
-        model = load_whisper_model()
-        
-        # Transcribe audio
-        print("Starting transcription...")
-        result = model.transcribe(
-            temp_file_path,
-            batch_size=Config.DEFAULT_BATCH_SIZE,
-            language=params["language"],
-            task=params["task"]
-        )
-        
-        segments = result["segments"]
-        detected_language = result["language"]
-        word_segments = None
-        speakers_result = None
-        
-        # Word-level alignment if requested
-        if params["include_word_timestamps"]:
-            print("Performing word-level alignment...")
-            align_model_obj, metadata = load_alignment_model(detected_language)
-            if align_model_obj and metadata:
+    except (TypeError, ValueError) as e:
+        raise TranscriptionError(f"Invalid parameter: {e}", 400)
+
+    # Validate parameters
+    if params["model"] not in Config.SUPPORTED_MODELS:
+        raise TranscriptionError(f"Invalid model. Supported: {Config.SUPPORTED_MODELS}", 400)
+
+    if params["compute_type"] not in Config.SUPPORTED_COMPUTE_TYPES:
+        raise TranscriptionError(f"Invalid compute_type. Supported: {Config.SUPPORTED_COMPUTE_TYPES}", 400)
+
+    if params["task"] not in Config.SUPPORTED_TASKS:
+        raise TranscriptionError(f"Invalid task. Supported: {Config.SUPPORTED_TASKS}", 400)
+
+    if params["output_format"] not in Config.SUPPORTED_OUTPUT_FORMATS:
+        raise TranscriptionError(f"Invalid output_format. Supported: {Config.SUPPORTED_OUTPUT_FORMATS}", 400)
+
+    if params["response_layout"] not in Config.SUPPORTED_RESPONSE_LAYOUTS:
+        raise TranscriptionError(f"Invalid response_layout. Supported: {Config.SUPPORTED_RESPONSE_LAYOUTS}", 400)
+
+    if params["priority"] not in Config.PRIORITIES:
+        raise TranscriptionError(f"Invalid priority. Supported: {list(Config.PRIORITIES)}", 400)
+
+    return params
+
+def request_client():
+    """Fairness key of the current request: X-Client-Id, else the caller's address"""
+    if not has_request_context():
+        return None
+    return request.headers.get("X-Client-Id") or (request.access_route[0] if request.access_route else request.remote_addr)
+
+def parse_transcribe_request():
+    """Read a JSON body or a multipart upload into ``(data, params)``.
+
+    Uploaded files are saved before parsing so they outlive the request
+    (for jobs and streams); the copy is removed if the parameters are
+    invalid.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise TranscriptionError("Request body must be a JSON object", 400)
+        return data, parse_transcribe_params(data)
+
+    upload = request.files.get("file")
+    if upload is None:
+        raise TranscriptionError("Content-Type must be application/json, or multipart/form-data with a 'file' field", 400)
+
+    data = request.form.to_dict()
+    try:
+        media = media_fetcher.save_upload(upload.stream)
+    except IngestError as e:
+        raise TranscriptionError(str(e), e.code)
+    try:
+        return data, parse_transcribe_params(data, media.path)
+    except Exception:
+        media.cleanup()
+        raise
+
+def discard_upload(params):
+    """Remove a saved upload that will not be processed"""
+    if params and params.get("upload_path"):
+        MediaFile(params["upload_path"], owned=True).cleanup()
+
+def run_diarization(diarize_model_obj, audio, return_embeddings=False):
+    """Run speaker diarization on a decoded waveform.
+
+    With ``return_embeddings`` a ``(diarize_segments, embeddings)`` tuple is
+    returned, where ``embeddings`` maps speaker labels to vectors or is None
+    when the installed pipeline cannot provide them.
+    """
+    print(f"Diarization model type: {type(diarize_model_obj)}")
+    if isinstance(diarize_model_obj, getattr(whisperx, 'DiarizationPipeline', ())):
+        print("Using WhisperX DiarizationPipeline")
+        if not return_embeddings:
+            return diarize_model_obj(audio)
+        try:
+            return diarize_model_obj(audio, return_embeddings=True)
+        except TypeError:
+            return diarize_model_obj(audio), None
+
+    print("Using pyannote Pipeline directly")
+    # Hand pyannote the in-memory waveform instead of decoding the file again
+    waveform = {
+        "waveform": torch.from_numpy(audio).unsqueeze(0),
+        "sample_rate": SAMPLE_RATE
+    }
+    if not return_embeddings:
+        return diarize_model_obj(waveform)
+    try:
+        annotation, embeddings = diarize_model_obj(waveform, return_embeddings=True)
+    except TypeError:
+        return diarize_model_obj(waveform), None
+    return annotation, {label: embeddings[i] for i, label in enumerate(annotation.labels())}
+
+def diarization_unavailable():
+    return TranscriptionError(
+        "Speaker diarization unavailable. Please set HUGGINGFACE_TOKEN environment variable and restart container. Get token at: https://huggingface.co/settings/tokens",
+        400
+    )
+
+def diarization_failed(diarization_error):
+    """Log a diarization error and wrap it for the response"""
+    error_message = str(diarization_error)
+    print(f"Full diarization error: {error_message}")
+    print(f"Error type: {type(diarization_error)}")
+    print(f"Full traceback: {traceback.format_exc()}")
+    return TranscriptionError(
+        f"Speaker diarization failed: {error_message}. You may need to accept terms at: https://huggingface.co/pyannote/speaker-diarization-3.1",
+        400
+    )
+
+def _diarize_in_background(diarize_model_obj, audio, timings, return_embeddings=False):
+    with span("diarize", timings):
+        return run_diarization(diarize_model_obj, audio, return_embeddings)
+
+def _log_orphaned_diarization(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Background diarization failed after the request ended: {future.exception()}")
+
+def transcribe_and_align(audio, params, timings, on_segments=None):
+    """Transcribe a waveform and, if requested, align words.
+
+    ``on_segments`` is called with each batch of segments as soon as it is
+    decoded. Returns ``(result, segments, word_segments)``.
+    """
+    # Load WhisperX model
+    model_key = whisper_model_key(params)
+    with span("load_model", timings):
+        model = whisper_pool.get(model_key)
+    
+    # Transcribe audio
+    print("Starting transcription...")
+    with span("transcribe", timings):
+        if on_segments is None and not Config.BATCH_SCHEDULER_ENABLED:
+            result = model.transcribe(
+                audio,
+                batch_size=Config.DEFAULT_BATCH_SIZE,
+                language=params["language"],
+                task=params["task"]
+            )
+        else:
+            # Decode batch by batch, sharing batches with other in-flight
+            # requests when the scheduler is enabled
+            plan = plan_chunks(model, audio, language=params["language"], task=params["task"])
+            scheduler = get_batch_scheduler(model_key, model) if Config.BATCH_SCHEDULER_ENABLED else None
+            segments = []
+            for batch in iter_transcribe(model, audio, plan, Config.DEFAULT_BATCH_SIZE, scheduler=scheduler):
+                segments.extend(batch)
+                if on_segments is not None:
+                    on_segments(batch)
+            result = {"segments": segments, "language": plan["language"]}
+    
+    segments = result["segments"]
+    word_segments = None
+    
+    # Word-level alignment if requested
+    if params["include_word_timestamps"]:
+        print("Performing word-level alignment...")
+        with span("load_align_model", timings):
+            align_model_obj, metadata = load_alignment_model(result["language"])
+        if align_model_obj and metadata:
+            with span("align", timings):
                 result_aligned = whisperx.align(
                     segments, 
                     align_model_obj, 
                     metadata, 
-                    temp_file_path, 
+                    audio, 
                     Config.DEFAULT_DEVICE,
                     return_char_alignments=False
                 )
-                segments = result_aligned["segments"]
-                word_segments = result_aligned.get("word_segments")
-        
-        # Speaker diarization if requested
-        if params["include_speaker_labels"]:
-            print("Performing speaker diarization...")
+            segments = result_aligned["segments"]
+            word_segments = result_aligned.get("word_segments")
+
+    return result, segments, word_segments
+
+def transcribe_audio(audio, params, timings, on_segments=None):
+    """Run transcription, alignment and diarization on a decoded waveform"""
+    diarize_model_obj = None
+    diarize_future = None
+
+    if params["include_speaker_labels"]:
+        with span("load_diarize_model", timings):
             diarize_model_obj = load_diarization_model()
-            if diarize_model_obj is None:
-                return jsonify({
-                    "endpoint": f"/{Config.API_VERSION}/media/transcribe",
-                    "code": 400,
-                    "id": params.get("id"),
-                    "response": None,
-                    "message": "Speaker diarization unavailable. Please set HUGGINGFACE_TOKEN environment variable and restart container. Get token at: https://huggingface.co/settings/tokens",
-                    "processing_time": round(time.time() - start_time, 2)
-                }), 400
+        if diarize_model_obj is None:
+            raise diarization_unavailable()
+
+        # Diarization only needs the audio, so start it alongside transcription
+        if Config.PARALLEL_DIARIZATION:
+            print("Starting speaker diarization in parallel with transcription...")
+            diarize_future = diarization_executor.submit(_diarize_in_background, diarize_model_obj, audio, timings)
+
+    try:
+        result, segments, word_segments = transcribe_and_align(audio, params, timings, on_segments)
+    except Exception:
+        if diarize_future is not None and not diarize_future.cancel():
+            diarize_future.add_done_callback(_log_orphaned_diarization)
+        raise
+
+    detected_language = result["language"]
+    speakers_result = None
+    
+    # Speaker diarization if requested
+    if params["include_speaker_labels"]:
+        try:
+            if diarize_future is not None:
+                # Join point: wait for the parallel diarization pass
+                with span("diarize_wait", timings):
+                    diarize_segments = diarize_future.result()
+            else:
+                print("Performing speaker diarization...")
+                with span("diarize", timings):
+                    diarize_segments = run_diarization(diarize_model_obj, audio)
+            print(f"Diarization completed, segments type: {type(diarize_segments)}")
             
-            try:
-                print(f"Diarization model type: {type(diarize_model_obj)}")
-                print(f"Processing audio file: {temp_file_path}")
-                
-                # Check if using WhisperX DiarizationPipeline or pyannote directly
-                if hasattr(diarize_model_obj, '__class__') and 'Pipeline' in str(type(diarize_model_obj)):
-                    print("Using pyannote Pipeline directly")
-                    # Use the audio file path directly as pyannote can handle it better
-                    diarize_segments = diarize_model_obj(temp_file_path)
-                    print(f"Diarization completed, segments type: {type(diarize_segments)}")
-                else:
-                    print("Using WhisperX DiarizationPipeline")
-                    diarize_segments = diarize_model_obj(temp_file_path)
-                
-                print("Assigning speakers to words...")
+            print("Assigning speakers to segments and words...")
+            with span("assign_speakers", timings):
+                turns = diarization_to_turns(diarize_segments)
+                print(f"Converted {len(turns)} speaker turns")
+                segments = assign_speakers(segments, turns, word_segments)
+            print(f"Speaker assignment completed. Found speakers: {set(seg.get('speaker', 'UNKNOWN') for seg in segments)}")
+            
+            if not hasattr(diarize_segments, 'itertracks'):
+                # WhisperX diarization output also lists the labelled segments
+                speakers_result = {"segments": segments}
                 
-                # Convert pyannote format to WhisperX format if needed
-                if hasattr(diarize_segments, 'itertracks'):
-                    # Convert pyannote Annotation to WhisperX format
-                    print("Converting pyannote format to WhisperX format...")
-                    whisperx_segments = []
-                    for turn, _, speaker in diarize_segments.itertracks(yield_label=True):
-                        whisperx_segments.append({
-                            'start': turn.start,
-                            'end': turn.end,
-                            'speaker': speaker
-                        })
-                    
-                    # Create a simple object that whisperx.assign_word_speakers can use
-                    class DiarizeResult:
-                        def __init__(self, segments):
-                            self.segments = segments
-                    
-                    diarize_result = DiarizeResult(whisperx_segments)
-                    print(f"Converted {len(whisperx_segments)} speaker segments")
-                    
-                    # Manual speaker assignment instead of using whisperx.assign_word_speakers
-                    print("Performing manual speaker assignment...")
-                    transcription_segments = result_aligned['segments'] if 'result_aligned' in locals() else result['segments']
-                    
-                    for segment in transcription_segments:
-                        segment_start = segment['start']
-                        segment_end = segment['end']
-                        
-                        # Find the speaker with the most overlap
-                        best_speaker = None
-                        max_overlap = 0
-                        
-                        for speaker_seg in whisperx_segments:
-                            overlap_start = max(segment_start, speaker_seg['start'])
-                            overlap_end = min(segment_end, speaker_seg['end'])
-                            overlap = max(0, overlap_end - overlap_start)
-                            
-                            if overlap > max_overlap:
-                                max_overlap = overlap
-                                best_speaker = speaker_seg['speaker']
-                        
-                        if best_speaker:
-                            segment['speaker'] = best_speaker
-                        else:
-                            segment['speaker'] = 'SPEAKER_00'  # Default
-                    
-                    segments = transcription_segments
-                    print(f"Manual speaker assignment completed. Found speakers: {set(seg.get('speaker', 'UNKNOWN') for seg in segments)}")
-                    
+        except Exception as diarization_error:
+            raise diarization_failed(diarization_error)
+    
+    return {
+        "text": result.get("text", ""),
+        "language": detected_language,
+        "segments": segments,
+        "word_segments": word_segments,
+        "speakers_result": speakers_result
+    }
+
+def transcribe_long_audio(audio, params, timings, on_segments=None):
+    """Run the pipeline over windows of long audio cut in silence and stitch the results.
+
+    Only one window of audio is materialized at a time, so peak memory
+    does not grow with the recording length. Diarization also sees the
+    last LONG_AUDIO_OVERLAP_SECONDS of the previous window to carry
+    speaker labels across.
+    """
+    with span("plan_windows", timings):
+        windows = plan_windows(audio, SAMPLE_RATE, Config.LONG_AUDIO_WINDOW_SECONDS, Config.LONG_AUDIO_OVERLAP_SECONDS)
+    stitcher = WindowStitcher(windows, SAMPLE_RATE, Config.LONG_AUDIO_OVERLAP_SECONDS, Config.LONG_AUDIO_SPEAKER_SIMILARITY)
+    print(f"Long audio mode: processing {len(windows)} windows")
+
+    diarize_model_obj = None
+    if params["include_speaker_labels"]:
+        with span("load_diarize_model", timings):
+            diarize_model_obj = load_diarization_model()
+        if diarize_model_obj is None:
+            raise diarization_unavailable()
+
+    window_params = dict(params)
+    for index, (start, end) in enumerate(windows):
+        print(f"Processing window {index + 1}/{len(windows)} ({start / SAMPLE_RATE:.0f}s - {end / SAMPLE_RATE:.0f}s)")
+        diarize_audio = None
+        if diarize_model_obj is not None:
+            context_start, _ = stitcher.diarization_window(index)
+            diarize_audio = np.ascontiguousarray(audio[context_start:end])
+            window_audio = diarize_audio[start - context_start:]
+        else:
+            window_audio = np.ascontiguousarray(audio[start:end])
+
+        diarize_future = None
+        if diarize_model_obj is not None and Config.PARALLEL_DIARIZATION:
+            diarize_future = diarization_executor.submit(_diarize_in_background, diarize_model_obj, diarize_audio, timings, True)
+
+        window_on_segments = None
+        if on_segments is not None:
+            window_on_segments = lambda batch, index=index: on_segments(stitcher.preview(index, batch))
+
+        try:
+            result, segments, word_segments = transcribe_and_align(window_audio, window_params, timings, window_on_segments)
+        except Exception:
+            if diarize_future is not None and not diarize_future.cancel():
+                diarize_future.add_done_callback(_log_orphaned_diarization)
+            raise
+
+        # Keep the language detected on the first window for the rest
+        window_params["language"] = result["language"]
+
+        turns = None
+        embeddings = None
+        if diarize_model_obj is not None:
+            try:
+                # Embeddings let the stitcher recognize speakers across windows
+                if diarize_future is not None:
+                    with span("diarize_wait", timings):
+                        diarize_segments, embeddings = diarize_future.result()
                 else:
-                    # Use WhisperX format directly
-                    print("Using WhisperX format directly...")
-                    speakers_result = whisperx.assign_word_speakers(diarize_segments, result_aligned if 'result_aligned' in locals() else result)
-                    if 'segments' in speakers_result:
-                        segments = speakers_result["segments"]
-                        print(f"WhisperX speaker assignment completed. Found {len(segments)} segments")
-                    
+                    with span("diarize", timings):
+                        diarize_segments, embeddings = run_diarization(diarize_model_obj, diarize_audio, True)
+                turns = diarization_to_turns(diarize_segments)
             except Exception as diarization_error:
-                error_message = str(diarization_error)
-                print(f"Full diarization error: {error_message}")
-                print(f"Error type: {type(diarization_error)}")
-                import traceback
-                print(f"Full traceback: {traceback.format_exc()}")
-                return jsonify({
-                    "endpoint": f"/{Config.API_VERSION}/media/transcribe",
-                    "code": 400,
-                    "id": params.get("id"),
-                    "response": None,
-                    "message": f"Speaker diarization failed: {error_message}. You may need to accept terms at: https://huggingface.co/pyannote/speaker-diarization-3.1",
-                    "processing_time": round(time.time() - start_time, 2)
-                }), 400
-        
-        # Format output
-        response_data = format_transcription_output(result, segments, word_segments, speakers_result, params)
+                raise diarization_failed(diarization_error)
+
+        with span("stitch", timings):
+            stitcher.add(index, segments, word_segments, turns, embeddings)
+        del window_audio, diarize_audio
+
+    segments = stitcher.segments
+    word_segments = stitcher.word_segments if params["include_word_timestamps"] else None
+    if diarize_model_obj is not None:
+        with span("assign_speakers", timings):
+            segments = assign_speakers(segments, stitcher.turns, word_segments)
+        print(f"Speaker assignment completed. Found speakers: {set(seg.get('speaker', 'UNKNOWN') for seg in segments)}")
+
+    return {
+        "text": "",
+        "language": window_params["language"],
+        "segments": segments,
+        "word_segments": word_segments,
+        "speakers_result": None
+    }
+
+class PreparedMedia:
+    """Media fetched and decoded (or answered from the cache) ahead of the GPU stage"""
+
+    def __init__(self):
+        self.media = None
+        self.duration = None
+        self.decoded = None
+        self.cache_key = None
+        self.cached_result = None
+
+    def close(self):
+        if self.decoded is not None:
+            self.decoded.close()
+            self.decoded = None
+        # Clean up temporary file (local media paths are left alone)
+        if self.media is not None:
+            self.media.cleanup()
+            self.media = None
+
+def prepare_media(params, timings, decode=True):
+    """Fetch, cache-check and decode a request's media.
+
+    This is the I/O and CPU half of the pipeline, so it can run ahead of
+    the GPU stage (see the batch endpoint). With ``decode=False`` and
+    admission control on, only the duration is probed from the file
+    header and decoding is left to ``process_media`` once the request is
+    admitted, so requests waiting in the admission queue do not hold
+    decoded waveforms in memory.
+    """
+    prepared = PreparedMedia()
+    try:
+        # Download audio file (or use the upload / local path)
+        with span("download", timings):
+            prepared.media = fetch_media(params)
+
+        # Serve repeated media from the result cache without touching the GPU
+        cache = get_result_cache()
+        if cache is not None:
+            with span("cache_lookup", timings):
+                prepared.cache_key = cache.make_key(hash_file(prepared.media.path), params)
+                prepared.cached_result = cache.get(prepared.cache_key)
+            CACHE_LOOKUPS.labels(result="hit" if prepared.cached_result is not None else "miss").inc()
+            if prepared.cached_result is not None:
+                print(f"Result cache hit: {prepared.cache_key}")
+                return prepared
+
+        if not decode and admission is not None:
+            with span("probe", timings):
+                prepared.duration = probe_duration(prepared.media.path)
+        # Without a duration the cost can only be known by decoding
+        if decode or (admission is not None and prepared.duration is None):
+            decode_media(prepared, timings)
+        return prepared
+    except Exception:
+        prepared.close()
+        raise
+
+def decode_media(prepared, timings):
+    """Decode once; every stage shares the same 16 kHz waveform"""
+    with span("decode", timings):
+        prepared.decoded = decode_audio(
+            prepared.media.path,
+            mmap_threshold_seconds=Config.DECODE_MMAP_THRESHOLD_SECONDS
+        )
+    decoded = prepared.decoded
+    prepared.duration = decoded.duration
+    print(f"Decoded {decoded.duration:.1f}s of audio in {decoded.decode_seconds:.2f}s"
+          f"{' (memory-mapped)' if decoded.memory_mapped else ''}")
+
+def process_media(prepared, params, timings, on_segments=None, bounded=True):
+    """Run the model stages on prepared media and return the formatted response data.
+
+    Media that is not decoded yet is decoded, and the model stages run,
+    once admission control has room for the request's cost; ``bounded``
+    is passed on to ``AdmissionController.acquire``.
+    """
+    if prepared.cached_result is not None:
+        if on_segments is not None:
+            on_segments(prepared.cached_result["segments"])
+        with span("format", timings):
+            return format_pipeline_result(prepared.cached_result, params)
+
+    with admitted(prepared.duration, params, timings, bounded):
+        if prepared.decoded is None:
+            decode_media(prepared, timings)
+        decoded = prepared.decoded
+        pipeline_started = time.time()
+        try:
+            if Config.LONG_AUDIO_ENABLED and decoded.duration > Config.LONG_AUDIO_THRESHOLD_SECONDS:
+                pipeline_result = transcribe_long_audio(decoded.waveform, params, timings, on_segments)
+            else:
+                pipeline_result = transcribe_audio(decoded.waveform, params, timings, on_segments)
+        finally:
+            # Clean up GPU memory
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            gc.collect()
+
+    if decoded.duration > 0:
+        AUDIO_SECONDS.inc(decoded.duration)
+        REAL_TIME_FACTOR.observe((decoded.decode_seconds + time.time() - pipeline_started) / decoded.duration)
+    if prepared.cache_key is not None:
+        get_result_cache().put(prepared.cache_key, pipeline_result)
+
+    # Format output
+    with span("format", timings):
+        return format_pipeline_result(pipeline_result, params)
+
+def run_transcription(params, timings=None, on_segments=None, bounded=True):
+    """Run the full transcription pipeline and return the formatted response data.
+
+    Per-stage wall times in seconds are accumulated into ``timings``.
+    ``on_segments`` receives raw segments batch by batch as they are decoded.
+    Unbounded runs (queued jobs) wait for admission without a queue limit.
+    """
+    if timings is None:
+        timings = {}
+    prepared = None
+    IN_FLIGHT.inc()
+
+    try:
+        prepared = prepare_media(params, timings, decode=False)
+        return process_media(prepared, params, timings, on_segments, bounded)
+    finally:
+        IN_FLIGHT.dec()
+        if prepared is not None:
+            prepared.close()
+
+def run_transcription_job(params):
+    """Job handler returning the response data, processing time and stage timings"""
+    start_time = time.time()
+    timings = {}
+    response_data = run_transcription(params, timings, bounded=False)
+    return response_data, round(time.time() - start_time, 2), timings if params["include_timings"] else None
+
+job_manager = JobManager(
+    run_transcription_job,
+    max_workers=Config.JOB_WORKERS,
+    max_queued=Config.JOB_QUEUE_SIZE,
+    result_ttl=Config.JOB_RESULT_TTL_SECONDS,
+    webhook_timeout=Config.WEBHOOK_TIMEOUT_SECONDS,
+    webhook_retries=Config.WEBHOOK_RETRIES,
+    id_prefix=Config.JOB_ID_PREFIX
+)
+
+JOBS = Gauge("whisperx_jobs", "Asynchronous jobs by status", ["status"], registry=REGISTRY)
+LOADED_MODELS = Gauge("whisperx_loaded_models", "Models currently held in memory by kind", ["kind"], registry=REGISTRY)
+ADMISSION_QUEUED = Gauge("whisperx_admission_queued", "Requests waiting for admission", registry=REGISTRY)
+ADMISSION_COST = Gauge("whisperx_admission_cost_in_flight", "Estimated cost of the admitted requests", registry=REGISTRY)
+
+@REGISTRY.on_collect
+def collect_runtime_metrics():
+    """Refresh the gauges owned by other components at scrape time"""
+    for status, count in job_manager.stats().items():
+        JOBS.labels(status=status).set(count)
+    LOADED_MODELS.labels(kind="whisper").set(len(whisper_pool.loaded()))
+    LOADED_MODELS.labels(kind="alignment").set(len(align_pool.loaded()))
+    LOADED_MODELS.labels(kind="diarization").set(1 if diarize_model is not None else 0)
+    if admission is not None:
+        stats = admission.stats()
+        ADMISSION_QUEUED.set(stats["queued"])
+        ADMISSION_COST.set(stats["in_use"])
+    # Never import torch just to answer a scrape
+    if torch.loaded and torch.cuda.is_available():
+        for index in range(torch.cuda.device_count()):
+            GPU_MEMORY_PEAK.labels(device=f"cuda:{index}").set(torch.cuda.max_memory_allocated(index))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.time()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUESTS.labels(endpoint=endpoint, code=response.status_code).inc()
+    if hasattr(g, "request_started"):
+        REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.time() - g.request_started)
+    return response
+
+@app.after_request
+def report_job_backlog(response):
+    # Read by the dispatcher to balance worker processes by queue depth
+    response.headers["X-Job-Backlog"] = str(job_manager.backlog())
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress buffered responses with zstd or gzip as negotiated by Accept-Encoding"""
+    if (not Config.RESPONSE_COMPRESSION_ENABLED or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers or response.status_code in (204, 304)):
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.content_length is None or response.content_length < Config.RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(compress(
+        response.get_data(), encoding,
+        gzip_level=Config.RESPONSE_GZIP_LEVEL,
+        zstd_level=Config.RESPONSE_ZSTD_LEVEL
+    ))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """Reject uploads over MAX_FILE_SIZE before the body is read"""
+    return jsonify({
+        "endpoint": request.path,
+        "code": 413,
+        "id": None,
+        "response": None,
+        "message": size_limit_message(Config.MAX_FILE_SIZE)
+    }), 413
+
+# Background warmup: imports the ML libraries and loads the pinned models
+# after the server is already answering /health
+process_started = time.time()
+warmup_state = {"status": "pending", "started": None, "finished": None, "error": None}
+warmup_lock = threading.Lock()
+
+def warmup():
+    """Import torch and WhisperX and load the models configured for prewarming"""
+    warmup_state.update(status="warming", started=time.time())
+    try:
+        torch.load()
+        whisperx.load()
+        whisper_pool.prewarm(sorted(whisper_pool.pinned))
+        if Config.ALIGN_PREWARM_LANGUAGES:
+            align_pool.prewarm([(lang, Config.DEFAULT_DEVICE) for lang in Config.ALIGN_PREWARM_LANGUAGES])
+        if Config.DIARIZATION_PREWARM and load_diarization_model() is None:
+            print("Warning: Could not prewarm the diarization model")
+        missing = whisper_pool.pinned - set(whisper_pool.loaded())
+        if missing:
+            raise RuntimeError(f"Pinned models failed to load: {sorted(missing)}")
+        warmup_state["status"] = "ready"
+    except Exception as e:
+        print(f"Warmup failed: {e}")
+        warmup_state.update(status="failed", error=str(e))
+    finally:
+        warmup_state["finished"] = time.time()
+        print(f"Warmup {warmup_state['status']} after {warmup_state['finished'] - process_started:.2f}s")
+
+def start_warmup():
+    """Start the warmup thread once per process"""
+    with warmup_lock:
+        if warmup_state["status"] != "pending":
+            return
+        warmup_state["status"] = "starting"
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+
+@app.before_request
+def start_warmup_on_first_request():
+    # Entry points that never call start_warmup (gunicorn app:app, test
+    # clients, in-process load tests) warm up from their first request
+    if warmup_state["status"] == "pending":
+        start_warmup()
+
+def _pool_readiness(pool):
+    return [
+        {"key": model["key"], "load_seconds": model["load_seconds"], "pinned": model["pinned"]}
+        for model in pool.stats()["models"]
+    ]
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once the pinned models are loaded, 503 before"""
+    ready = warmup_state["status"] == "ready"
+    finished = warmup_state["finished"]
+    readiness = {
+        "status": warmup_state["status"],
+        "ready": ready,
+        "uptime_seconds": round(time.time() - process_started, 3),
+        "warmup_seconds": round(finished - warmup_state["started"], 3) if finished else None,
+        "error": warmup_state["error"],
+        "imports": {
+            module.name: round(module.load_seconds, 3) if module.loaded else None
+            for module in (torch, whisperx)
+        },
+        "models": {
+            "whisper": _pool_readiness(whisper_pool),
+            "alignment": _pool_readiness(align_pool),
+            "diarization": {
+                "loaded": diarize_model is not None,
+                "load_seconds": round(diarize_model_load_seconds, 2) if diarize_model_load_seconds is not None else None
+            }
+        }
+    }
+    return jsonify(readiness), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    health = {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "version": "1.0.0"
+    }
+    with batch_schedulers_lock:
+        schedulers = dict(batch_schedulers)
+    if schedulers:
+        health["batch_schedulers"] = {":".join(key): scheduler.stats() for key, scheduler in schedulers.items()}
+    if result_cache is not None:
+        health["result_cache"] = result_cache.stats()
+    health["whisper_models"] = whisper_pool.stats()
+    health["alignment_models"] = align_pool.stats()
+    if admission is not None:
+        health["admission"] = admission.stats()
+    return jsonify(health)
+
+@app.route(f'/{Config.API_VERSION}/media/transcribe', methods=['POST'])
+def transcribe_media():
+    """Main transcription endpoint following NCAA toolkit style"""
+    start_time = time.time()
+    endpoint = f"/{Config.API_VERSION}/media/transcribe"
+    data = None
+    
+    params = None
+    
+    try:
+        # Validate request (JSON body or multipart upload)
+        data, params = parse_transcribe_request()
+
+        # Job mode: queue the work and return immediately
+        webhook_url = data.get("webhook_url")
+        if webhook_url or str(data.get("async", False)).lower() == "true":
+            job = job_manager.submit(params, webhook_url=webhook_url)
+            return jsonify({
+                "endpoint": endpoint,
+                "code": 202,
+                "id": params.get("id"),
+                "job_id": job.job_id,
+                "status": "queued",
+                "status_url": f"/{Config.API_VERSION}/jobs/{job.job_id}",
+                "message": "queued"
+            }), 202
+
+        check_admission()
+        timings = {}
+        response_data = run_transcription(params, timings)
         
         # Calculate processing time
         processing_time = time.time() - start_time
         
-        # Clean up GPU memory
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        gc.collect()
-        
-        return jsonify({
-            "endpoint": f"/{Config.API_VERSION}/media/transcribe",
+        return envelope_response({
+            "endpoint": endpoint,
             "code": 200,
             "id": params.get("id"),
             "response": response_data,
             "message": "success",
-            "processing_time": round(processing_time, 2)
+            "processing_time": round(processing_time, 2),
+            "timings": timings if params["include_timings"] else None
         })
+
+    except TranscriptionError as e:
+        return jsonify({
+            "endpoint": endpoint,
+            "code": e.code,
+            "id": data.get("id") if data else None,
+            "response": None,
+            "message": str(e),
+            "processing_time": round(time.time() - start_time, 2)
+        }), e.code
+
+    except AdmissionRejected as e:
+        discard_upload(params)
+        return admission_rejected(endpoint, e, data.get("id") if data else None, start_time)
+
+    except JobQueueFull as e:
+        discard_upload(params)
+        return jsonify({
+            "endpoint": endpoint,
+            "code": 503,
+            "id": data.get("id") if data else None,
+            "response": None,
+            "message": str(e),
+            "processing_time": round(time.time() - start_time, 2)
+        }), 503
         
     except Exception as e:
         error_msg = str(e)
@@ -414,35 +1084,429 @@ def transcribe_media():
         print(traceback.format_exc())
         
         return jsonify({
-            "endpoint": f"/{Config.API_VERSION}/media/transcribe",
+            "endpoint": endpoint,
             "code": 500,
-            "id": data.get("id") if 'data' in locals() else None,
+            "id": data.get("id") if data else None,
             "response": None,
             "message": f"Internal server error: {error_msg}",
-            "processing_time": round(time.time() - start_time, 2) if 'start_time' in locals() else 0
+            "processing_time": round(time.time() - start_time, 2)
         }), 500
-    
-    finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
+
+def format_stream_event(event, stream_format):
+    """Serialize one stream event as an NDJSON line or an SSE message"""
+    data = json.dumps(event)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+def stream_transcription(params, stream_format):
+    """Yield segment events while the pipeline runs, then the final result"""
+    endpoint = f"/{Config.API_VERSION}/media/transcribe/stream"
+    start_time = time.time()
+    events = queue.Queue()
+    timings = {}
+
+    def on_segments(batch):
+        # Copy: later stages add words and speakers to the same dicts
+        events.put(("segments", [dict(segment) for segment in batch]))
+
+    def worker():
+        try:
+            events.put(("result", run_transcription(params, timings, on_segments)))
+        except Exception as e:
+            events.put(("error", e))
+
+    threading.Thread(target=worker, name="transcribe-stream", daemon=True).start()
+
+    index = 0
+    while True:
+        kind, payload = events.get()
+        if kind == "segments":
+            for segment in payload:
+                yield format_stream_event({"type": "segment", "index": index, "segment": segment}, stream_format)
+                index += 1
+        elif kind == "result":
+            yield format_stream_event({
+                "type": "result",
+                "endpoint": endpoint,
+                "code": 200,
+                "id": params.get("id"),
+                "response": payload,
+                "message": "success",
+                "processing_time": round(time.time() - start_time, 2),
+                "timings": timings if params["include_timings"] else None
+            }, stream_format)
+            return
+        else:
+            code = getattr(payload, "code", 500)
+            message = str(payload) if code != 500 else f"Internal server error: {payload}"
+            print(f"Error in streaming transcription: {payload}")
+            yield format_stream_event({
+                "type": "error",
+                "endpoint": endpoint,
+                "code": code,
+                "id": params.get("id"),
+                "response": None,
+                "message": message,
+                "processing_time": round(time.time() - start_time, 2)
+            }, stream_format)
+            return
+
+@app.route(f'/{Config.API_VERSION}/media/transcribe/stream', methods=['POST'])
+def transcribe_media_stream():
+    """Streaming transcription endpoint emitting segments as NDJSON or SSE"""
+    endpoint = f"/{Config.API_VERSION}/media/transcribe/stream"
+    data = None
+    params = None
+    try:
+        data, params = parse_transcribe_request()
+        check_admission()
+    except TranscriptionError as e:
+        return jsonify({
+            "endpoint": endpoint,
+            "code": e.code,
+            "id": data.get("id") if data else None,
+            "response": None,
+            "message": str(e)
+        }), e.code
+    except AdmissionRejected as e:
+        discard_upload(params)
+        return admission_rejected(endpoint, e, data.get("id") if data else None)
+    except Exception as e:
+        discard_upload(params)
+        error_msg = str(e)
+        print(f"Error in streaming transcription: {error_msg}")
+        print(traceback.format_exc())
+
+        return jsonify({
+            "endpoint": endpoint,
+            "code": 500,
+            "id": data.get("id") if data else None,
+            "response": None,
+            "message": f"Internal server error: {error_msg}"
+        }), 500
+
+    stream_format = data.get("stream_format")
+    if stream_format is None:
+        stream_format = "sse" if "text/event-stream" in request.headers.get("Accept", "") else "ndjson"
+    if stream_format not in ("ndjson", "sse"):
+        discard_upload(params)
+        return jsonify({
+            "endpoint": endpoint,
+            "code": 400,
+            "id": params.get("id"),
+            "response": None,
+            "message": "Invalid stream_format. Supported: ['ndjson', 'sse']"
+        }), 400
+
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(
+        stream_with_context(stream_transcription(params, stream_format)),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def read_batch_items():
+    """Return the batch's request dicts from a JSON body or JSON Lines.
+
+    JSON bodies are either a list of requests or an object with a
+    ``requests`` list and optional ``defaults`` applied to every item.
+    Lines that are not valid JSON become exceptions, reported per item.
+    """
+    if request.is_json:
+        body = request.get_json()
+        defaults = {}
+        if isinstance(body, dict):
+            defaults = body.get("defaults") or {}
+            body = body.get("requests")
+        if not isinstance(body, list):
+            raise TranscriptionError("Batch body must be a list of requests or an object with a 'requests' list", 400)
+        return [dict(defaults, **item) if isinstance(item, dict) else item for item in body]
+
+    items = []
+    for number, line in enumerate(request.get_data(as_text=True).splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(TranscriptionError(f"Invalid JSON on line {number}: {e}", 400))
+    return items
+
+def _close_prefetched(future):
+    # A prefetch finished after the batch stopped; release its files
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def stream_batch(entries):
+    """Yield one NDJSON line per batch item, then a summary.
+
+    Items are prepared (downloaded, cache-checked, decoded) on the
+    prefetch pool at most ``PREFETCH_DEPTH`` items ahead of the one on the
+    GPU, so the next file is ready when the current one finishes while
+    memory stays bounded. A failing item is reported and skipped.
+    """
+    endpoint = f"/{Config.API_VERSION}/media/transcribe/batch"
+    started = time.time()
+    pending = deque()
+    position = 0
+    succeeded = 0
+    failed = 0
+
+    try:
+        while position < len(entries) or pending:
+            while position < len(entries) and len(pending) <= Config.PREFETCH_DEPTH:
+                params, error = entries[position]
+                timings = {}
+                future = None
+                if error is None:
+                    future = prefetch_executor.submit(prepare_media, params, timings)
+                pending.append((position, params, error, future, timings, time.time()))
+                position += 1
+
+            index, params, error, future, timings, item_started = pending.popleft()
+            item = {"type": "item", "index": index, "endpoint": endpoint}
             try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+                if error is not None:
+                    raise error
+                with span("prefetch_wait", timings):
+                    prepared = future.result()
+                IN_FLIGHT.inc()
+                try:
+                    # Items wait their turn instead of failing when the queue is full
+                    response_data = process_media(prepared, params, timings, bounded=False)
+                finally:
+                    IN_FLIGHT.dec()
+                    prepared.close()
+                item.update({
+                    "code": 200,
+                    "id": params.get("id"),
+                    "response": response_data,
+                    "message": "success",
+                    "processing_time": round(time.time() - item_started, 2),
+                    "timings": timings if params["include_timings"] else None
+                })
+                succeeded += 1
+            except Exception as e:
+                code = getattr(e, "code", 500)
+                if code == 500:
+                    print(f"Error in batch item {index}: {e}")
+                    print(traceback.format_exc())
+                item.update({
+                    "code": code,
+                    "id": params.get("id") if params else None,
+                    "response": None,
+                    "message": str(e) if code != 500 else f"Internal server error: {e}",
+                    "processing_time": round(time.time() - item_started, 2)
+                })
+                failed += 1
+            yield json.dumps(item) + "\n"
+
+        yield json.dumps({
+            "type": "summary",
+            "endpoint": endpoint,
+            "code": 200,
+            "total": len(entries),
+            "succeeded": succeeded,
+            "failed": failed,
+            "processing_time": round(time.time() - started, 2)
+        }) + "\n"
+    finally:
+        # Client went away or the batch ended early: drop queued prefetches
+        for _, _, _, future, _, _ in pending:
+            if future is not None and not future.cancel():
+                future.add_done_callback(_close_prefetched)
+
+@app.route(f'/{Config.API_VERSION}/media/transcribe/batch', methods=['POST'])
+def transcribe_media_batch():
+    """Transcribe many media files in one call, streaming a result per item"""
+    endpoint = f"/{Config.API_VERSION}/media/transcribe/batch"
+    try:
+        items = read_batch_items()
+        if not items:
+            raise TranscriptionError("Batch contains no requests", 400)
+        if len(items) > Config.BATCH_REQUEST_MAX_ITEMS:
+            raise TranscriptionError(f"Batch is limited to {Config.BATCH_REQUEST_MAX_ITEMS} requests", 400)
+    except TranscriptionError as e:
+        return jsonify({
+            "endpoint": endpoint,
+            "code": e.code,
+            "id": None,
+            "response": None,
+            "message": str(e)
+        }), e.code
+
+    # Validate every item up front; invalid ones are reported in the stream
+    entries = []
+    for item in items:
+        try:
+            if isinstance(item, Exception):
+                raise item
+            if not isinstance(item, dict):
+                raise TranscriptionError("Each batch item must be a JSON object", 400)
+            entries.append((parse_transcribe_params(item), None))
+        except TranscriptionError as e:
+            entries.append(({"id": item.get("id")} if isinstance(item, dict) else None, e))
+
+    return Response(
+        stream_with_context(stream_batch(entries)),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def subtitle_response(segments, subtitle_format, params, language, filename):
+    """Stream a subtitle file rendered cue by cue as a download"""
+    writer = WRITERS[subtitle_format]
+    chunks = (chunk.encode("utf-8") for chunk in writer(segments, **get_subtitle_options(params, language)))
+    return Response(
+        chunks,
+        mimetype=SUBTITLE_MIMETYPES[subtitle_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{subtitle_format}"'}
+    )
+
+def invalid_subtitle_format(endpoint, subtitle_format, request_id=None):
+    return jsonify({
+        "endpoint": endpoint,
+        "code": 400,
+        "id": request_id,
+        "response": None,
+        "message": f"Invalid subtitle format '{subtitle_format}'. Supported: {sorted(WRITERS)}"
+    }), 400
+
+@app.route(f'/{Config.API_VERSION}/media/transcribe/subtitles/<subtitle_format>', methods=['POST'])
+def transcribe_media_subtitles(subtitle_format):
+    """Transcribe and return the subtitle file itself instead of a JSON envelope"""
+    start_time = time.time()
+    endpoint = f"/{Config.API_VERSION}/media/transcribe/subtitles/{subtitle_format}"
+    data = None
+    params = None
+
+    if subtitle_format not in WRITERS:
+        return invalid_subtitle_format(endpoint, subtitle_format)
+
+    try:
+        data, params = parse_transcribe_request()
+        params["output_format"] = "json"
+        params["response_layout"] = "objects"
+        params["include_segments"] = True
+        # Cue splitting needs word timings
+        if params["max_chars_per_cue"] or params["max_words_per_cue"] or params["max_cue_duration"]:
+            params["include_word_timestamps"] = True
+
+        check_admission()
+        timings = {}
+        response_data = run_transcription(params, timings)
+        response = subtitle_response(
+            response_data["segments"],
+            subtitle_format,
+            params,
+            response_data.get("detected_language"),
+            params.get("id") or "transcript"
+        )
+        response.headers["X-Processing-Time"] = str(round(time.time() - start_time, 2))
+        return response
+
+    except TranscriptionError as e:
+        return jsonify({
+            "endpoint": endpoint,
+            "code": e.code,
+            "id": data.get("id") if data else None,
+            "response": None,
+            "message": str(e),
+            "processing_time": round(time.time() - start_time, 2)
+        }), e.code
+
+    except AdmissionRejected as e:
+        discard_upload(params)
+        return admission_rejected(endpoint, e, data.get("id") if data else None, start_time)
+
+    except Exception as e:
+        error_msg = str(e)
+        print(f"Error in subtitle transcription: {error_msg}")
+        print(traceback.format_exc())
+
+        return jsonify({
+            "endpoint": endpoint,
+            "code": 500,
+            "id": data.get("id") if data else None,
+            "response": None,
+            "message": f"Internal server error: {error_msg}",
+            "processing_time": round(time.time() - start_time, 2)
+        }), 500
+
+@app.route(f'/{Config.API_VERSION}/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll the status and result of an asynchronous transcription job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "endpoint": f"/{Config.API_VERSION}/jobs/{job_id}",
+            "code": 404,
+            "job_id": job_id,
+            "response": None,
+            "message": "Job not found or expired"
+        }), 404
+
+    job_data = job.to_dict()
+    job_data["endpoint"] = f"/{Config.API_VERSION}/jobs/{job_id}"
+    return envelope_response(job_data)
+
+@app.route(f'/{Config.API_VERSION}/jobs/<job_id>/subtitles/<subtitle_format>', methods=['GET'])
+def get_job_subtitles(job_id, subtitle_format):
+    """Download the subtitles of a completed asynchronous job"""
+    endpoint = f"/{Config.API_VERSION}/jobs/{job_id}/subtitles/{subtitle_format}"
+    if subtitle_format not in WRITERS:
+        return invalid_subtitle_format(endpoint, subtitle_format)
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "endpoint": endpoint,
+            "code": 404,
+            "job_id": job_id,
+            "response": None,
+            "message": "Job not found or expired"
+        }), 404
+
+    segments = None
+    if job.status == "completed" and job.response:
+        segments = job.response.get("segments")
+        if segments is None and "columns" in job.response:
+            segments = segments_from_columns(job.response["columns"])
+    if segments is None:
+        message = f"Job is {job.status}" if job.status != "completed" else "Job result has no segments (include_segments was false)"
+        return jsonify({
+            "endpoint": endpoint,
+            "code": 409,
+            "job_id": job_id,
+            "status": job.status,
+            "response": None,
+            "message": message
+        }), 409
+
+    return subtitle_response(
+        segments,
+        subtitle_format,
+        job.params,
+        job.response.get("detected_language"),
+        job.params.get("id") or job_id
+    )
 
 if __name__ == '__main__':
     print("Starting WhisperX API Server...")
     print(f"Device: {Config.DEFAULT_DEVICE}")
-    print(f"Model: {Config.DEFAULT_MODEL}")
+    print(f"Default model: {Config.DEFAULT_MODEL} ({Config.DEFAULT_COMPUTE_TYPE})")
     print(f"Port: {Config.PORT}")
     print(f"Timeout: {Config.TIMEOUT_SECONDS} seconds")
+    print(f"Job workers: {Config.JOB_WORKERS}")
     
-    # Pre-load the main model to avoid delays on first request
-    load_whisper_model()
+    # Load models in the background so /health answers during the cold start;
+    # /ready turns 200 once the pinned models are loaded
+    start_warmup()
     
     app.run(
         host=Config.HOST,
         port=Config.PORT,
         debug=Config.DEBUG,
         threaded=True
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,163 @@
+import os
+import time
+import wave
+import tempfile
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Bytes read from ffmpeg per iteration (int16 samples)
+_READ_SIZE = 4 * 1024 * 1024
+
+
+class DecodedAudio:
+    """A mono float32 waveform shared by every pipeline stage.
+
+    Long inputs are backed by a memory-mapped temporary file instead of
+    process memory; call ``close`` to release it.
+    """
+
+    def __init__(self, waveform, sample_rate=SAMPLE_RATE, backing_path=None, decode_seconds=0.0):
+        self.waveform = waveform
+        self.sample_rate = sample_rate
+        self.backing_path = backing_path
+        self.decode_seconds = decode_seconds
+
+    @property
+    def duration(self):
+        return len(self.waveform) / float(self.sample_rate)
+
+    @property
+    def memory_mapped(self):
+        return self.backing_path is not None
+
+    def close(self):
+        self.waveform = None
+        if self.backing_path and os.path.exists(self.backing_path):
+            try:
+                os.unlink(self.backing_path)
+            except OSError:
+                pass
+        self.backing_path = None
+
+
+def _read_wav(path, sample_rate, max_frames=None):
+    """Read 16-bit mono PCM WAV at the target rate without ffmpeg, or None"""
+    try:
+        with wave.open(path, "rb") as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != sample_rate:
+                return None
+            if max_frames and wav.getnframes() > max_frames:
+                return None
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    return _int16_to_float32(frames)
+
+
+def probe_duration(path):
+    """Return a media file's duration in seconds without decoding it, or None.
+
+    WAV headers are read directly; anything else is asked of ffprobe,
+    which reads the container header. Used to estimate a request's cost
+    before its waveform is materialized.
+    """
+    try:
+        with wave.open(path, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, OSError):
+        pass
+
+    cmd = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    try:
+        return float(result.stdout.strip().splitlines()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _int16_to_float32(data, count=-1):
+    samples = np.frombuffer(data, dtype=np.int16, count=count)
+    waveform = np.empty(len(samples), dtype=np.float32)
+    np.multiply(samples, 1.0 / 32768.0, out=waveform, casting="unsafe")
+    return waveform
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE, mmap_threshold_seconds=0, temp_dir=None):
+    """Decode any ffmpeg-readable file once into a 16 kHz float32 waveform.
+
+    Output larger than ``mmap_threshold_seconds`` (0 disables) is spilled
+    to a temporary float32 file as it is decoded and memory-mapped, so the
+    full waveform never has to sit in RAM.
+    """
+    started = time.time()
+
+    max_frames = mmap_threshold_seconds * sample_rate if mmap_threshold_seconds else None
+    waveform = _read_wav(path, sample_rate, max_frames)
+    if waveform is not None:
+        return DecodedAudio(waveform, sample_rate, decode_seconds=time.time() - started)
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"
+    ]
+    threshold_bytes = mmap_threshold_seconds * sample_rate * 2 if mmap_threshold_seconds else None
+
+    buffer = bytearray()
+    spill = None
+    spill_path = None
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            while True:
+                chunk = process.stdout.read(_READ_SIZE)
+                if not chunk:
+                    break
+                if spill is None:
+                    buffer += chunk
+                    if threshold_bytes and len(buffer) > threshold_bytes:
+                        # Switch to a float32 file on disk for the rest of the stream
+                        fd, spill_path = tempfile.mkstemp(suffix=".f32", dir=temp_dir)
+                        spill = os.fdopen(fd, "wb")
+                        usable = len(buffer) - len(buffer) % 2
+                        spill.write(_int16_to_float32(bytes(buffer[:usable])).tobytes())
+                        buffer = buffer[usable:]
+                else:
+                    buffer += chunk
+                    usable = len(buffer) - len(buffer) % 2
+                    spill.write(_int16_to_float32(bytes(buffer[:usable])).tobytes())
+                    del buffer[:usable]
+            stderr = process.stderr.read()
+        finally:
+            process.stdout.close()
+            process.stderr.close()
+            returncode = process.wait()
+
+        if returncode != 0:
+            raise RuntimeError(f"Failed to decode audio: {stderr.decode(errors='ignore').strip()[-500:]}")
+
+        if spill is None:
+            waveform = _int16_to_float32(buffer, count=len(buffer) // 2)
+            del buffer
+            return DecodedAudio(waveform, sample_rate, decode_seconds=time.time() - started)
+
+        spill.close()
+        spill = None
+        # Copy-on-write mapping: stages may write to the array without touching the file
+        waveform = np.memmap(spill_path, dtype=np.float32, mode="c")
+        return DecodedAudio(waveform, sample_rate, backing_path=spill_path, decode_seconds=time.time() - started)
+
+    except Exception:
+        if spill is not None:
+            spill.close()
+        if spill_path and os.path.exists(spill_path):
+            os.unlink(spill_path)
+        raise
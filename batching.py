@@ -0,0 +1,257 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from lazy_import import torch
+
+SAMPLE_RATE = 16000
+
+
+def _merge_chunks(model, vad_segments, chunk_size):
+    """Merge VAD output into decoder-sized chunks across WhisperX versions"""
+    try:
+        from whisperx.vad import merge_chunks
+    except ImportError:
+        merge_chunks = model.vad_model.merge_chunks
+    return merge_chunks(
+        vad_segments,
+        chunk_size,
+        onset=model._vad_params["vad_onset"],
+        offset=model._vad_params["vad_offset"]
+    )
+
+
+def plan_chunks(model, audio, language=None, task=None, chunk_size=30):
+    """Run VAD on the audio and plan the chunks for batched decoding.
+
+    Returns a dict with the resolved ``language`` and ``task`` and the
+    chunk ``spans`` as ``(start, end)`` seconds. Features are computed
+    lazily per batch by ``chunk_features`` so memory does not grow with
+    the number of chunks. The shared model's tokenizer is never touched,
+    so several requests can plan chunks concurrently.
+    """
+    waveform = torch.from_numpy(audio).unsqueeze(0)
+    if hasattr(model.vad_model, "preprocess_audio"):
+        waveform = model.vad_model.preprocess_audio(audio)
+    vad_segments = model.vad_model({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+    vad_segments = _merge_chunks(model, vad_segments, chunk_size)
+
+    language = language or getattr(model, "preset_language", None) or model.detect_language(audio)
+    task = task or "transcribe"
+    spans = [(segment["start"], segment["end"]) for segment in vad_segments]
+
+    return {"language": language, "task": task, "spans": spans}
+
+
+def chunk_features(model, audio, span):
+    """Compute the padded log-mel features of one chunk"""
+    f1 = int(span[0] * SAMPLE_RATE)
+    f2 = int(span[1] * SAMPLE_RATE)
+    return model.preprocess({"inputs": audio[f1:f2]})["inputs"]
+
+
+def make_tokenizer(model, language, task):
+    """Build a decoding tokenizer without mutating the shared model"""
+    import faster_whisper.tokenizer
+    return faster_whisper.tokenizer.Tokenizer(
+        model.model.hf_tokenizer,
+        model.model.model.is_multilingual,
+        task=task,
+        language=language
+    )
+
+
+def decode_features(model, features, tokenizer):
+    """Decode a list of chunk features as one batch, returning their texts"""
+    batch = torch.stack([torch.as_tensor(f) for f in features])
+    return model.model.generate_segment_batched(batch, tokenizer, model.options)
+
+
+def build_segments(spans, texts):
+    """Build WhisperX-style segments from chunk spans and decoded texts"""
+    return [
+        {"text": text, "start": round(start, 3), "end": round(end, 3)}
+        for (start, end), text in zip(spans, texts)
+    ]
+
+
+def iter_transcribe(model, audio, plan, batch_size=16, scheduler=None):
+    """Yield lists of segments as each batch of planned chunks is decoded"""
+    if scheduler is not None:
+        yield from scheduler.iter_transcribe(audio, plan)
+        return
+
+    tokenizer = make_tokenizer(model, plan["language"], plan["task"])
+    spans = plan["spans"]
+    for offset in range(0, len(spans), batch_size):
+        batch_spans = spans[offset:offset + batch_size]
+        features = [chunk_features(model, audio, span) for span in batch_spans]
+        yield build_segments(batch_spans, decode_features(model, features, tokenizer))
+
+
+class _PendingChunk:
+    __slots__ = ("features", "future", "enqueued_at")
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """Decode VAD chunks from all in-flight requests in shared batches.
+
+    Chunks are grouped by ``(language, task)`` because a batch is decoded
+    with a single tokenizer. A group is flushed as soon as it holds
+    ``batch_size`` chunks or its oldest chunk has waited ``max_wait``
+    seconds, so a lone short request is never held back for long.
+    """
+
+    def __init__(self, model, batch_size=16, max_wait=0.05):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queues = OrderedDict()
+        self._tokenizers = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+        # Statistics
+        self._batches = 0
+        self._chunks = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def transcribe(self, audio, language=None, task=None, chunk_size=30):
+        """Drop-in replacement for ``model.transcribe`` using shared batches"""
+        plan = plan_chunks(self.model, audio, language=language, task=task, chunk_size=chunk_size)
+        segments = []
+        for batch in self.iter_transcribe(audio, plan):
+            segments.extend(batch)
+        return {"segments": segments, "language": plan["language"]}
+
+    def iter_transcribe(self, audio, plan):
+        """Yield segments in order, ``batch_size`` at a time, as their chunks
+        are decoded. At most two batches of one request's chunks are queued
+        at once, which bounds the memory held by pending features."""
+        spans = plan["spans"]
+        window = 2 * self.batch_size
+        pending = deque()
+        submitted = 0
+        emitted = 0
+        texts = []
+
+        while emitted < len(spans):
+            while submitted < len(spans) and len(pending) < window:
+                features = chunk_features(self.model, audio, spans[submitted])
+                pending.append(self.submit(plan["language"], plan["task"], features))
+                submitted += 1
+
+            texts.append(pending.popleft().result())
+            if len(texts) == self.batch_size or emitted + len(texts) == len(spans):
+                yield build_segments(spans[emitted:emitted + len(texts)], texts)
+                emitted += len(texts)
+                texts = []
+
+    def submit(self, language, task, features):
+        """Queue one chunk's features, returning a future for its text"""
+        pending = _PendingChunk(features)
+        with self._cond:
+            self._ensure_thread()
+            self._queues.setdefault((language, task), deque()).append(pending)
+            self._cond.notify()
+        return pending.future
+
+    def stats(self):
+        """Report batch fill and queue wait statistics"""
+        with self._cond:
+            batches = self._batches
+            return {
+                "batch_size": self.batch_size,
+                "batches": batches,
+                "chunks": self._chunks,
+                "mean_batch_fill": round(self._chunks / (batches * self.batch_size), 3) if batches else 0.0,
+                "mean_queue_wait_ms": round(1000 * self._wait_total / self._chunks, 2) if self._chunks else 0.0,
+                "max_queue_wait_ms": round(1000 * self._wait_max, 2),
+                "queued": sum(len(q) for q in self._queues.values())
+            }
+
+    def close(self):
+        """Let the decoding thread exit once the queued chunks are decoded,
+        releasing its reference to the model"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        """Pop the next ready batch, waiting on the condition until one is due.
+        Returns None when the scheduler is closed and idle."""
+        while True:
+            if self._closed and not self._queues:
+                return None
+            now = time.monotonic()
+            ready_key = None
+            next_deadline = None
+            for key, queue in self._queues.items():
+                oldest = queue[0].enqueued_at
+                deadline = oldest + self.max_wait
+                if len(queue) >= self.batch_size or deadline <= now:
+                    # Serve the group that has waited longest first
+                    if ready_key is None or oldest < self._queues[ready_key][0].enqueued_at:
+                        ready_key = key
+                elif next_deadline is None or deadline < next_deadline:
+                    next_deadline = deadline
+
+            if ready_key is not None:
+                queue = self._queues[ready_key]
+                batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                if not queue:
+                    del self._queues[ready_key]
+                return ready_key, batch
+
+            self._cond.wait(None if next_deadline is None else next_deadline - now)
+
+    def _get_tokenizer(self, language, task):
+        key = (language, task)
+        if key not in self._tokenizers:
+            self._tokenizers[key] = make_tokenizer(self.model, language, task)
+        return self._tokenizers[key]
+
+    def _decode(self, key, batch):
+        tokenizer = self._get_tokenizer(*key)
+        return decode_features(self.model, [item.features for item in batch], tokenizer)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                ready = self._next_batch()
+                if ready is None:
+                    self._thread = None
+                    return
+            key, batch = ready
+
+            started = time.monotonic()
+            try:
+                texts = self._decode(key, batch)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            with self._cond:
+                self._batches += 1
+                self._chunks += len(batch)
+                for item in batch:
+                    wait = started - item.enqueued_at
+                    self._wait_total += wait
+                    self._wait_max = max(self._wait_max, wait)
+
+            for item, text in zip(batch, texts):
+                item.future.set_result(text)
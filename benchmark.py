@@ -0,0 +1,372 @@
+"""Micro-benchmarks for the CPU-side hot paths of the API.
+
+Usage:
+    python benchmark.py speakers --turns 10000 --segments 10000
+    python benchmark.py subtitles --segments 50000
+    python benchmark.py startup --runs 5 --server
+    python benchmark.py encoding --segments 5000
+
+Results are printed as JSON so they can be compared between runs.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+
+def synthetic_diarization(num_turns, num_segments, num_speakers=4, words_per_segment=8, seed=0):
+    """Build random speaker turns plus segments and words covering the same span"""
+    rng = random.Random(seed)
+    turns = []
+    position = 0.0
+    for _ in range(num_turns):
+        duration = rng.uniform(0.5, 8.0)
+        turns.append({
+            "start": position,
+            "end": position + duration,
+            "speaker": f"SPEAKER_{rng.randrange(num_speakers):02d}"
+        })
+        # Occasional overlapping speech
+        position += duration * rng.uniform(0.7, 1.1)
+
+    total = position
+    segments = []
+    word_segments = []
+    step = total / max(num_segments, 1)
+    for i in range(num_segments):
+        start = i * step
+        end = start + step * rng.uniform(0.6, 1.0)
+        words = []
+        word_step = (end - start) / words_per_segment
+        for j in range(words_per_segment):
+            word = {"word": f"w{j}", "start": start + j * word_step, "end": start + (j + 1) * word_step, "score": 0.9}
+            words.append(word)
+            word_segments.append(word)
+        segments.append({"start": start, "end": end, "text": " ".join(w["word"] for w in words), "words": words})
+    return turns, segments, word_segments
+
+
+def naive_assign(segments, turns):
+    """The original nested-loop segment assignment, kept for comparison"""
+    for segment in segments:
+        best_speaker = None
+        max_overlap = 0
+        for turn in turns:
+            overlap = max(0, min(segment["end"], turn["end"]) - max(segment["start"], turn["start"]))
+            if overlap > max_overlap:
+                max_overlap = overlap
+                best_speaker = turn["speaker"]
+        segment["speaker"] = best_speaker if best_speaker else "SPEAKER_00"
+    return segments
+
+
+def bench_speakers(args):
+    from speakers import assign_speakers
+
+    turns, segments, word_segments = synthetic_diarization(args.turns, args.segments, seed=args.seed)
+
+    started = time.perf_counter()
+    assign_speakers(segments, turns, word_segments)
+    sweep_seconds = time.perf_counter() - started
+
+    # The nested loop is too slow for the full input; time a sample and extrapolate
+    sample = [{"start": s["start"], "end": s["end"]} for s in segments[:args.naive_segments]]
+    started = time.perf_counter()
+    naive_assign(sample, turns)
+    naive_seconds = time.perf_counter() - started
+    naive_estimate = naive_seconds * len(segments) / max(len(sample), 1)
+
+    mismatches = sum(1 for a, b in zip(sample, segments) if a["speaker"] != b["speaker"])
+
+    # Long turns (background speech, overlap) spanning the recording must not
+    # widen the search window for every other turn
+    long_case_turns, long_case_segments, long_case_words = synthetic_diarization(args.turns, args.segments, seed=args.seed)
+    span_end = max(turn["end"] for turn in long_case_turns)
+    for i in range(args.long_turns):
+        long_case_turns.append({"start": 0.0, "end": span_end, "speaker": f"SPEAKER_LONG_{i}"})
+    started = time.perf_counter()
+    assign_speakers(long_case_segments, long_case_turns, long_case_words)
+    long_turn_seconds = time.perf_counter() - started
+
+    return {
+        "benchmark": "speakers",
+        "turns": len(turns),
+        "segments": len(segments),
+        "words": len(word_segments),
+        "sweep_seconds": round(sweep_seconds, 4),
+        "naive_sample_segments": len(sample),
+        "naive_sample_seconds": round(naive_seconds, 4),
+        "naive_estimated_seconds": round(naive_estimate, 4),
+        "speedup_segments_only": round(naive_estimate / sweep_seconds, 1) if sweep_seconds else None,
+        "sample_mismatches": mismatches,
+        "long_turns": args.long_turns,
+        "with_long_turns_seconds": round(long_turn_seconds, 4)
+    }
+
+
+def naive_timestamp(seconds):
+    """The original SRT timestamp formatter, kept for comparison"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millisecs = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
+
+
+def naive_srt(segments, max_words_per_line=None):
+    """The original string-concatenation SRT writer, kept for comparison"""
+    srt_content = ""
+    for i, segment in enumerate(segments, 1):
+        start_time = naive_timestamp(segment.get("start", 0))
+        end_time = naive_timestamp(segment.get("end", 0))
+        text = segment.get("text", "").strip()
+        if max_words_per_line and max_words_per_line > 0:
+            words = text.split()
+            lines = []
+            for j in range(0, len(words), max_words_per_line):
+                lines.append(" ".join(words[j:j + max_words_per_line]))
+            text = "\n".join(lines)
+        srt_content += f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
+    return srt_content
+
+
+def peak_memory(func):
+    """Run ``func`` and return its result and peak traced allocation in bytes"""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_subtitles(args):
+    from subtitles import generate_srt, generate_vtt, iter_srt
+
+    _, segments, _ = synthetic_diarization(1, args.segments, seed=args.seed)
+
+    started = time.perf_counter()
+    naive = naive_srt(segments, args.max_words_per_line)
+    naive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    srt = generate_srt(segments, args.max_words_per_line)
+    srt_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vtt = generate_vtt(segments, args.max_words_per_line)
+    vtt_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cues = sum(1 for _ in iter_srt(segments, args.max_words_per_line, max_chars=args.max_chars, max_duration=args.max_duration))
+    cue_seconds = time.perf_counter() - started
+
+    # Streaming writes cue by cue; only the document being built is held in memory
+    started = time.perf_counter()
+    next(iter_srt(segments, args.max_words_per_line))
+    first_chunk_seconds = time.perf_counter() - started
+    _, naive_peak = peak_memory(lambda: naive_srt(segments, args.max_words_per_line))
+    _, stream_peak = peak_memory(lambda: sum(len(chunk) for chunk in iter_srt(segments, args.max_words_per_line)))
+
+    return {
+        "benchmark": "subtitles",
+        "segments": len(segments),
+        "srt_bytes": len(srt),
+        "vtt_bytes": len(vtt),
+        "naive_srt_seconds": round(naive_seconds, 4),
+        "srt_seconds": round(srt_seconds, 4),
+        "vtt_seconds": round(vtt_seconds, 4),
+        "srt_matches_naive": srt == naive,
+        "word_cues": cues,
+        "word_cue_srt_seconds": round(cue_seconds, 4),
+        "stream_first_chunk_ms": round(1000 * first_chunk_seconds, 3),
+        "naive_peak_bytes": naive_peak,
+        "stream_peak_bytes": stream_peak
+    }
+
+
+def time_import(statement, runs):
+    """Median wall time of ``statement`` in fresh interpreters, or None if it fails"""
+    code = f"import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)"
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return round(statistics.median(samples), 4)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url, started, timeout):
+    """Poll ``url`` until it answers 200; return seconds since ``started``"""
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def time_server_start(timeout):
+    """Start ``app.py`` and time until /health and then /ready answer 200"""
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1")
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=cwd, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        health = _wait_for(f"http://127.0.0.1:{port}/health", started, timeout)
+        ready = _wait_for(f"http://127.0.0.1:{port}/ready", started, timeout) if health is not None else None
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "health_seconds": round(health, 3) if health is not None else None,
+        "ready_seconds": round(ready, 3) if ready is not None else None
+    }
+
+
+def bench_startup(args):
+    # Each import runs in a fresh interpreter so module caches do not hide the cost
+    result = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "import_app_seconds": time_import("import app", args.runs),
+        "import_torch_seconds": time_import("import torch", args.runs),
+        # Recent whisperx releases defer their submodules, so import the ASR and alignment code explicitly
+        "import_whisperx_seconds": time_import("import whisperx, whisperx.asr, whisperx.alignment", args.runs),
+        # What importing the app cost when torch and whisperx were imported eagerly
+        "import_app_eager_seconds": time_import("import app, torch, whisperx, whisperx.asr, whisperx.alignment", args.runs)
+    }
+    if args.server:
+        result["server"] = time_server_start(args.timeout)
+    return result
+
+
+def synthetic_transcript(num_segments, seed=0):
+    """A word-aligned, diarized transcript shaped like the pipeline output"""
+    from speakers import assign_speakers
+
+    rng = random.Random(seed)
+    turns, segments, word_segments = synthetic_diarization(max(num_segments // 4, 1), num_segments, seed=seed)
+    # WhisperX reports times and scores to the millisecond
+    for word in word_segments:
+        word["start"] = round(word["start"], 3)
+        word["end"] = round(word["end"], 3)
+        word["score"] = round(rng.uniform(0.3, 1.0), 3)
+    for segment in segments:
+        segment["start"] = round(segment["start"], 3)
+        segment["end"] = round(segment["end"], 3)
+    segments = assign_speakers(segments, turns, word_segments)
+    return segments, word_segments
+
+
+def _median_ms(func, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return result, round(1000 * statistics.median(samples), 2)
+
+
+def bench_encoding(args):
+    from encoding import columnar_transcript, compress, msgpack, zstandard
+
+    segments, word_segments = synthetic_transcript(args.segments, seed=args.seed)
+    text = " ".join(segment["text"] for segment in segments)
+    # The response body with include_word_timestamps and include_speaker_labels
+    objects = {"text": text, "segments": segments, "word_segments": word_segments, "speakers": segments}
+    layouts = {
+        "objects": lambda: objects,
+        "columnar": lambda: {"text": text, "columns": columnar_transcript(segments, word_segments)}
+    }
+    serializers = {"json": lambda body: json.dumps(body, separators=(",", ":")).encode("utf-8")}
+    if msgpack is not None:
+        serializers["msgpack"] = lambda body: msgpack.packb(body, use_bin_type=True)
+    encodings = [None, "gzip"] + (["zstd"] if zstandard is not None else [])
+
+    results = {}
+    for layout, build in layouts.items():
+        for serializer, dump in serializers.items():
+            for encoding in encodings:
+                def encode():
+                    data = dump(build())
+                    return compress(data, encoding) if encoding else data
+                data, encode_ms = _median_ms(encode, args.runs)
+                name = f"{layout}+{serializer}" + (f"+{encoding}" if encoding else "")
+                results[name] = {"bytes": len(data), "encode_ms": encode_ms}
+
+    baseline = results["objects+json"]["bytes"]
+    for result in results.values():
+        result["size_ratio"] = round(result["bytes"] / baseline, 3)
+    return {
+        "benchmark": "encoding",
+        "segments": len(segments),
+        "words": len(word_segments),
+        "msgpack_available": msgpack is not None,
+        "zstd_available": zstandard is not None,
+        "encodings": results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WhisperX API micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    speakers = subparsers.add_parser("speakers", help="Speaker assignment on synthetic diarization")
+    speakers.add_argument("--turns", type=int, default=10000)
+    speakers.add_argument("--segments", type=int, default=10000)
+    speakers.add_argument("--naive-segments", type=int, default=500)
+    speakers.add_argument("--long-turns", type=int, default=1, help="Turns spanning the whole recording for the second run")
+    speakers.add_argument("--seed", type=int, default=0)
+    speakers.set_defaults(func=bench_speakers)
+
+    subtitles = subparsers.add_parser("subtitles", help="SRT/VTT rendering of a large transcript")
+    subtitles.add_argument("--segments", type=int, default=50000)
+    subtitles.add_argument("--max-words-per-line", type=int, default=6)
+    subtitles.add_argument("--max-chars", type=int, default=42)
+    subtitles.add_argument("--max-duration", type=float, default=5.0)
+    subtitles.add_argument("--seed", type=int, default=0)
+    subtitles.set_defaults(func=bench_subtitles)
+
+    startup = subparsers.add_parser("startup", help="Import time and time until /health and /ready answer")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--server", action="store_true", help="Also start app.py and poll /health and /ready")
+    startup.add_argument("--timeout", type=float, default=600.0)
+    startup.set_defaults(func=bench_startup)
+
+    encoding = subparsers.add_parser("encoding", help="Response size and encode time per layout, serializer and compression")
+    encoding.add_argument("--segments", type=int, default=5000)
+    encoding.add_argument("--runs", type=int, default=5)
+    encoding.add_argument("--seed", type=int, default=0)
+    encoding.set_defaults(func=bench_encoding)
+
+    args = parser.parse_args(argv)
+    print(json.dumps(args.func(args), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
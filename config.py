@@ -21,10 +21,67 @@ class Config:
     DEFAULT_DEVICE = 'cuda' if os.environ.get('FORCE_CPU', 'False').lower() != 'true' else 'cpu'
     DEFAULT_COMPUTE_TYPE = os.environ.get('DEFAULT_COMPUTE_TYPE', 'float16')
     DEFAULT_BATCH_SIZE = int(os.environ.get('DEFAULT_BATCH_SIZE', 16))
+    CPU_THREADS = int(os.environ.get('CPU_THREADS', 0))  # CTranslate2 threads on CPU, 0 = library default
+    
+    # Whisper model pool: requests may pick a model and compute type
+    SUPPORTED_MODELS = [m.strip() for m in os.environ.get(
+        'SUPPORTED_MODELS',
+        'tiny,tiny.en,base,base.en,small,small.en,medium,medium.en,large-v2,large-v3,large-v3-turbo'
+    ).split(',') if m.strip()]
+    if DEFAULT_MODEL not in SUPPORTED_MODELS:
+        SUPPORTED_MODELS.append(DEFAULT_MODEL)
+    SUPPORTED_COMPUTE_TYPES = ['float16', 'float32', 'bfloat16', 'int8', 'int8_float16', 'int8_float32']
+    WHISPER_POOL_MAX_MODELS = int(os.environ.get('WHISPER_POOL_MAX_MODELS', 3))  # 0 = no count limit
+    WHISPER_POOL_MAX_BYTES = int(os.environ.get('WHISPER_POOL_MAX_BYTES', 6 * 1024 * 1024 * 1024))  # Estimated weights, 0 = no limit
+    # Models kept resident, as "name" or "name:compute_type"
+    WHISPER_PINNED_MODELS = [m.strip() for m in os.environ.get('WHISPER_PINNED_MODELS', DEFAULT_MODEL).split(',') if m.strip()]
+    
+    # Audio decoding: inputs longer than this are decoded into a memory-mapped temp file (0 = never)
+    DECODE_MMAP_THRESHOLD_SECONDS = int(os.environ.get('DECODE_MMAP_THRESHOLD_SECONDS', 3600))
+    
+    # Long audio: process recordings in overlapping windows to keep memory flat
+    LONG_AUDIO_ENABLED = os.environ.get('LONG_AUDIO_ENABLED', 'True').lower() == 'true'
+    LONG_AUDIO_THRESHOLD_SECONDS = int(os.environ.get('LONG_AUDIO_THRESHOLD_SECONDS', 1800))  # 30 minutes
+    LONG_AUDIO_WINDOW_SECONDS = int(os.environ.get('LONG_AUDIO_WINDOW_SECONDS', 900))
+    LONG_AUDIO_OVERLAP_SECONDS = int(os.environ.get('LONG_AUDIO_OVERLAP_SECONDS', 15))  # Span searched for a pause before each cut, and diarization context shared with the previous window
+    LONG_AUDIO_SPEAKER_SIMILARITY = float(os.environ.get('LONG_AUDIO_SPEAKER_SIMILARITY', 0.5))  # Min embedding cosine similarity to reuse a speaker label
+    
+    # Cross-request batching: share decoder batches between concurrent requests
+    BATCH_SCHEDULER_ENABLED = os.environ.get('BATCH_SCHEDULER_ENABLED', 'False').lower() == 'true'
+    BATCH_MAX_WAIT_MS = int(os.environ.get('BATCH_MAX_WAIT_MS', 50))  # Max time a chunk waits for a batch to fill
     
     # API configuration
     API_VERSION = 'v1'
     MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE', 500 * 1024 * 1024))  # 500MB default
+    MAX_CONTENT_LENGTH = MAX_FILE_SIZE + 1024 * 1024  # Uploads: file plus multipart overhead
+    
+    # Media ingestion
+    DOWNLOAD_TIMEOUT_SECONDS = int(os.environ.get('DOWNLOAD_TIMEOUT_SECONDS', 30))
+    DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 1024 * 1024))  # 1MB streamed writes
+    DOWNLOAD_POOL_SIZE = int(os.environ.get('DOWNLOAD_POOL_SIZE', 16))  # Pooled connections per host
+    RANGE_DOWNLOAD_THRESHOLD_BYTES = int(os.environ.get('RANGE_DOWNLOAD_THRESHOLD_BYTES', 64 * 1024 * 1024))  # 0 = never split
+    RANGE_DOWNLOAD_PARTS = int(os.environ.get('RANGE_DOWNLOAD_PARTS', 4))
+    LOCAL_MEDIA_DIRS = [d.strip() for d in os.environ.get('LOCAL_MEDIA_DIRS', '').split(',') if d.strip()]  # Allowed file:// roots
+    
+    # Admission control: bound concurrent model work by estimated cost (audio seconds weighted by stage)
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_BUDGET_SECONDS = float(os.environ.get('ADMISSION_BUDGET_SECONDS', 3600))  # Cost in flight, 0 = no limit
+    ADMISSION_MAX_RUNNING = int(os.environ.get('ADMISSION_MAX_RUNNING', 4))  # Pipelines running at once, 0 = no limit
+    ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 64))  # Waiting requests before answering 429, 0 = no limit
+    ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', 300))
+    ADMISSION_ALIGN_WEIGHT = float(os.environ.get('ADMISSION_ALIGN_WEIGHT', 0.3))  # Cost per audio second relative to transcription
+    ADMISSION_DIARIZE_WEIGHT = float(os.environ.get('ADMISSION_DIARIZE_WEIGHT', 0.5))
+    PRIORITIES = {'low': 0, 'normal': 1, 'high': 2}
+    
+    # Multi-process serving (gunicorn -c gunicorn.conf.py): a dispatcher in front of model worker processes
+    WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', 0))  # 0 = one per device (GPU) or one (FORCE_CPU)
+    WORKER_DEVICES = [d.strip() for d in os.environ.get('WORKER_DEVICES', os.environ.get('CUDA_VISIBLE_DEVICES', '0')).split(',') if d.strip()]  # GPU indices workers are pinned to
+    WORKER_THREADS = int(os.environ.get('WORKER_THREADS', 8))  # Request threads per worker process
+    WORKER_BASE_PORT = int(os.environ.get('WORKER_BASE_PORT', PORT + 1))  # Workers listen on 127.0.0.1:WORKER_BASE_PORT + slot
+    DISPATCHER_THREADS = int(os.environ.get('DISPATCHER_THREADS', 64))  # Concurrent proxied requests
+    DISPATCHER_POLL_SECONDS = float(os.environ.get('DISPATCHER_POLL_SECONDS', 2))  # Worker readiness polling interval
+    WORKER_SLOT = os.environ.get('WORKER_SLOT')  # Set by the dispatcher for its worker processes
+    JOB_ID_PREFIX = os.environ.get('JOB_ID_PREFIX', '')  # Routes job lookups to the worker that owns the job
     
     # Supported languages for WhisperX
     SUPPORTED_LANGUAGES = [
@@ -35,5 +92,41 @@ class Config:
     # Output formats
     SUPPORTED_OUTPUT_FORMATS = ['json', 'srt', 'txt', 'vtt', 'all']
     
+    # Response layouts: per-object segments and words, or parallel column arrays
+    SUPPORTED_RESPONSE_LAYOUTS = ['objects', 'columnar']
+    
+    # Response compression negotiated via Accept-Encoding (zstd needs the zstandard package)
+    RESPONSE_COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'True').lower() == 'true'
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+    RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 6))
+    RESPONSE_ZSTD_LEVEL = int(os.environ.get('RESPONSE_ZSTD_LEVEL', 3))
+    
     # Task types
-    SUPPORTED_TASKS = ['transcribe', 'translate']
\ No newline at end of file
+    SUPPORTED_TASKS = ['transcribe', 'translate']
+    
+    # Batch endpoint: items are downloaded and decoded ahead of the GPU stage
+    BATCH_REQUEST_MAX_ITEMS = int(os.environ.get('BATCH_REQUEST_MAX_ITEMS', 1000))
+    PREFETCH_DEPTH = int(os.environ.get('PREFETCH_DEPTH', 2))  # Items prepared ahead per batch (bounds memory)
+    PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))  # Download/decode threads shared by all batches
+    
+    # Alignment model pool (one wav2vec2 model per language and device)
+    ALIGN_POOL_MAX_MODELS = int(os.environ.get('ALIGN_POOL_MAX_MODELS', 4))  # 0 = no count limit
+    ALIGN_POOL_MAX_BYTES = int(os.environ.get('ALIGN_POOL_MAX_BYTES', 0))  # 0 = no memory limit
+    ALIGN_PREWARM_LANGUAGES = [lang.strip() for lang in os.environ.get('ALIGN_PREWARM_LANGUAGES', '').split(',') if lang.strip()]
+    
+    # Run speaker diarization concurrently with transcription (disable on GPU-memory-constrained hosts)
+    PARALLEL_DIARIZATION = os.environ.get('PARALLEL_DIARIZATION', 'True').lower() == 'true'
+    DIARIZATION_WORKERS = int(os.environ.get('DIARIZATION_WORKERS', 2))
+    DIARIZATION_PREWARM = os.environ.get('DIARIZATION_PREWARM', 'False').lower() == 'true'  # Load the diarization model during startup warmup
+    
+    # Result cache: reuse pipeline output for identical audio and decoding parameters
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'True').lower() == 'true'
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'whisperx-api', 'results'))
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # 2GB default
+    
+    # Asynchronous job configuration
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))  # Concurrent pipeline runs for queued jobs
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 100))
+    JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600))  # Keep finished jobs for 1 hour
+    WEBHOOK_TIMEOUT_SECONDS = int(os.environ.get('WEBHOOK_TIMEOUT_SECONDS', 30))
+    WEBHOOK_RETRIES = int(os.environ.get('WEBHOOK_RETRIES', 3))
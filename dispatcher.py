@@ -0,0 +1,317 @@
+"""Front dispatcher for multi-process serving.
+
+Each model worker is a separate process running the full API (``app.py``)
+with its own models, pinned to one GPU through ``CUDA_VISIBLE_DEVICES``
+or, with ``FORCE_CPU``, to a share of the CPU threads. The dispatcher
+proxies every request to the ready worker with the shortest queue and
+routes job lookups back to the worker that owns the job.
+
+Run it with ``gunicorn -c gunicorn.conf.py``; the gunicorn master starts
+and supervises the workers (see ``workers.py``).
+"""
+import os
+import re
+import json
+import time
+import itertools
+import threading
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from config import Config
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Counter, Gauge, Registry
+
+# Headers that describe one connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade", "host"
+}
+
+JOB_PATH = re.compile(r"^/[^/]+/jobs/([^/]+)")
+
+
+class _RequestBody:
+    """Incoming request body streamed to a worker in fixed-size chunks.
+
+    ``__len__`` lets requests send a Content-Length header instead of
+    switching to chunked encoding, which the WSGI input does not support.
+    """
+
+    def __init__(self, stream, length, chunk_size=1024 * 1024):
+        self.stream = stream
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.stream.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class Backend:
+    """Dispatcher-side view of one worker process"""
+
+    def __init__(self, slot, url, device=None, pool_size=64):
+        self.slot = slot
+        self.url = url.rstrip("/")
+        self.device = device
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.in_flight = 0
+        self.job_backlog = 0
+        self.up = False
+        self.ready = False
+        self.readiness = None
+        self.last_picked = 0
+
+    @property
+    def depth(self):
+        """Open proxied requests plus the queued and running jobs it reported"""
+        return self.in_flight + self.job_backlog
+
+    def stats(self):
+        return {
+            "slot": self.slot,
+            "device": self.device,
+            "url": self.url,
+            "up": self.up,
+            "ready": self.ready,
+            "in_flight": self.in_flight,
+            "job_backlog": self.job_backlog,
+            "depth": self.depth
+        }
+
+
+class Dispatcher:
+    """Pick a worker for each request by queue depth and proxy to it"""
+
+    def __init__(self, backends, timeout=1200, poll_interval=2.0):
+        self.backends = backends
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._picks = itertools.count(1)
+        self._poll_thread = None
+
+        self.registry = Registry()
+        self.depth_gauge = Gauge("whisperx_worker_queue_depth", "Open requests plus job backlog per worker", ["worker"], registry=self.registry)
+        self.up_gauge = Gauge("whisperx_worker_ready", "1 when the worker answers /ready with 200", ["worker"], registry=self.registry)
+        self.routed = Counter("whisperx_dispatched_requests", "Requests proxied to each worker", ["worker"], registry=self.registry)
+        self.unavailable = Counter("whisperx_dispatch_failures", "Requests that could not be proxied to any worker", registry=self.registry)
+        self.registry.on_collect(self._collect)
+
+    @classmethod
+    def from_env(cls):
+        """Build the dispatcher from DISPATCHER_WORKERS, set by gunicorn.conf.py"""
+        workers = json.loads(os.environ.get("DISPATCHER_WORKERS", "[]"))
+        backends = [Backend(w["slot"], w["url"], w.get("device"), Config.DISPATCHER_THREADS) for w in workers]
+        return cls(backends, timeout=Config.TIMEOUT_SECONDS, poll_interval=Config.DISPATCHER_POLL_SECONDS)
+
+    def _collect(self):
+        for backend in self.backends:
+            self.depth_gauge.labels(worker=backend.slot).set(backend.depth)
+            self.up_gauge.labels(worker=backend.slot).set(1 if backend.ready else 0)
+
+    def start_polling(self):
+        if self._poll_thread is None and self.backends:
+            self.poll()
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="dispatcher-poll", daemon=True)
+            self._poll_thread.start()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.poll()
+
+    def poll(self):
+        """Refresh each worker's readiness and job backlog"""
+        for backend in self.backends:
+            try:
+                response = backend.session.get(f"{backend.url}/ready", timeout=2)
+            except requests.RequestException:
+                backend.up = backend.ready = False
+                backend.readiness = None
+                continue
+            backend.up = True
+            backend.ready = response.status_code == 200
+            self._read_backlog(backend, response)
+            try:
+                backend.readiness = response.json()
+            except ValueError:
+                backend.readiness = None
+
+    @staticmethod
+    def _read_backlog(backend, response):
+        backlog = response.headers.get("X-Job-Backlog")
+        if backlog is not None and backlog.isdigit():
+            backend.job_backlog = int(backlog)
+
+    def owner(self, job_id):
+        """Return the worker whose JOB_ID_PREFIX starts ``job_id``, or None"""
+        prefix = job_id.split("-", 1)[0]
+        for backend in self.backends:
+            if prefix == f"w{backend.slot}":
+                return backend
+        return None
+
+    def pick(self):
+        """Return the ready worker with the shortest queue (least recently
+        picked on a tie) and count the request against it"""
+        with self._lock:
+            candidates = [b for b in self.backends if b.ready] or [b for b in self.backends if b.up]
+            if not candidates:
+                return None
+            backend = min(candidates, key=lambda b: (b.depth, b.last_picked))
+            backend.last_picked = next(self._picks)
+            backend.in_flight += 1
+            return backend
+
+    def release(self, backend):
+        with self._lock:
+            backend.in_flight -= 1
+
+    def forward(self, backend, counted=True):
+        """Proxy the current Flask request to ``backend``, streaming both ways"""
+        url = backend.url + request.path
+        if request.query_string:
+            url += "?" + request.query_string.decode("latin-1")
+        headers = {
+            k: v for k, v in request.headers.items()
+            if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() != "content-length"
+        }
+        # Otherwise requests would ask the worker for gzip on the client's behalf
+        headers.setdefault("Accept-Encoding", "identity")
+        # Workers key admission fairness on the original client address
+        forwarded = request.headers.get("X-Forwarded-For")
+        headers["X-Forwarded-For"] = f"{forwarded}, {request.remote_addr}" if forwarded else request.remote_addr
+        if request.content_length:
+            body = _RequestBody(request.stream, request.content_length)
+        else:
+            body = request.get_data() or None
+
+        def done():
+            if counted:
+                self.release(backend)
+
+        try:
+            upstream = backend.session.request(
+                request.method, url, headers=headers, data=body, stream=True,
+                allow_redirects=False, timeout=(5, self.timeout)
+            )
+        except requests.RequestException as e:
+            done()
+            backend.up = backend.ready = False
+            self.unavailable.inc()
+            return error_response(502, f"Worker {backend.slot} is unavailable: {e}")
+
+        self.routed.labels(worker=backend.slot).inc()
+        self._read_backlog(backend, upstream)
+        response_headers = [(k, v) for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS]
+        response_headers.append(("X-Worker-Slot", str(backend.slot)))
+        # Pass the body through undecoded so Content-Encoding and Content-Length stay valid
+        response = Response(upstream.raw.stream(64 * 1024, decode_content=False), status=upstream.status_code, headers=response_headers)
+
+        def close():
+            upstream.close()
+            done()
+
+        response.call_on_close(close)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return [backend.stats() for backend in self.backends]
+
+
+def error_response(code, message):
+    return jsonify({
+        "endpoint": request.path,
+        "code": code,
+        "id": None,
+        "response": None,
+        "message": message
+    }), code
+
+
+def create_app(dispatcher):
+    """Flask app that fronts the worker processes"""
+    front = Flask(__name__)
+    front.config.from_object(Config)
+    # Same CORS policy as app.py; worker responses already carry their headers
+    CORS(front)
+    started = time.time()
+    dispatcher.start_polling()
+
+    @front.route('/health', methods=['GET'])
+    def health_check():
+        """Liveness of the dispatcher itself, with the workers' queue depths"""
+        return jsonify({
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "version": "1.0.0",
+            "uptime_seconds": round(time.time() - started, 3),
+            "workers": dispatcher.stats()
+        })
+
+    @front.route('/ready', methods=['GET'])
+    def readiness_check():
+        """200 once at least one worker is ready"""
+        workers = []
+        for backend in dispatcher.backends:
+            worker = backend.stats()
+            worker["readiness"] = backend.readiness
+            workers.append(worker)
+        ready = any(backend.ready for backend in dispatcher.backends)
+        return jsonify({"ready": ready, "workers": workers}), 200 if ready else 503
+
+    @front.route('/metrics', methods=['GET'])
+    def metrics():
+        """Dispatcher metrics; each worker's own metrics are at /workers/<slot>/metrics"""
+        return Response(dispatcher.registry.render(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+    @front.route('/workers/<int:slot>/metrics', methods=['GET'])
+    def worker_metrics(slot):
+        for backend in dispatcher.backends:
+            if backend.slot == slot:
+                try:
+                    upstream = backend.session.get(f"{backend.url}/metrics", timeout=10)
+                except requests.RequestException as e:
+                    return error_response(502, f"Worker {slot} is unavailable: {e}")
+                return Response(upstream.content, status=upstream.status_code, headers={"Content-Type": METRICS_CONTENT_TYPE})
+        return error_response(404, f"Unknown worker {slot}")
+
+    @front.route('/', defaults={"path": ""}, methods=['GET', 'POST', 'PUT', 'DELETE'])
+    @front.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+    def proxy(path):
+        match = JOB_PATH.match(request.path)
+        if match:
+            # Jobs live in the memory of the worker that accepted them
+            backend = dispatcher.owner(match.group(1))
+            if backend is None:
+                return error_response(404, "Job not found")
+            return dispatcher.forward(backend, counted=False)
+
+        backend = dispatcher.pick()
+        if backend is None:
+            dispatcher.unavailable.inc()
+            response, code = error_response(503, "No worker is available yet, please retry")
+            response.headers["Retry-After"] = str(max(int(dispatcher.poll_interval), 1))
+            return response, code
+        return dispatcher.forward(backend)
+
+    return front
+
+
+app = create_app(Dispatcher.from_env())
@@ -0,0 +1,153 @@
+"""Compact response encodings.
+
+Word-level transcripts of long media are dominated by repeated keys:
+every word carries ``word``/``start``/``end``/``score``/``speaker``. The
+columnar layout stores each field once as a parallel array, with speaker
+labels as indices into a table. On top of either layout, responses can
+be sent as msgpack (``Accept: application/msgpack``) and compressed with
+zstd or gzip (``Accept-Encoding``). msgpack and zstd are optional
+dependencies; without them the server falls back to JSON and gzip.
+"""
+import gzip
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+SEGMENT_FIELDS = ("start", "end", "text", "speaker")
+WORD_FIELDS = ("word", "start", "end", "score", "speaker")
+
+
+def _round(value, digits):
+    return round(value, digits) if isinstance(value, float) else value
+
+
+def columnar_transcript(segments=None, word_segments=None, time_digits=3):
+    """Return segments and words as column arrays.
+
+    ``segments`` columns are ``start``, ``end``, ``text`` and ``speaker``.
+    Words are taken from each segment's aligned ``words`` (with a
+    ``segment`` column pointing back to their segment) or, when segments
+    are not given or carry none, from ``word_segments``. Speakers are
+    indices into the ``speakers`` table; columns that would be all null
+    (no speakers, no scores) are left out.
+    """
+    speakers = []
+    speaker_index = {}
+
+    def speaker_id(label):
+        if label is None:
+            return None
+        index = speaker_index.get(label)
+        if index is None:
+            index = speaker_index[label] = len(speakers)
+            speakers.append(label)
+        return index
+
+    def add_word(word, segment_index=None):
+        if segment_index is not None:
+            words["segment"].append(segment_index)
+        words["word"].append(word.get("word"))
+        words["start"].append(_round(word.get("start"), time_digits))
+        words["end"].append(_round(word.get("end"), time_digits))
+        words["score"].append(_round(word.get("score"), time_digits))
+        words["speaker"].append(speaker_id(word.get("speaker")))
+
+    columns = {"speakers": speakers}
+    nested_words = segments is not None and any(segment.get("words") for segment in segments)
+    words = {"segment": []} if nested_words else {}
+    words.update({field: [] for field in WORD_FIELDS})
+
+    if segments is not None:
+        table = {field: [] for field in SEGMENT_FIELDS}
+        for index, segment in enumerate(segments):
+            table["start"].append(_round(segment.get("start"), time_digits))
+            table["end"].append(_round(segment.get("end"), time_digits))
+            table["text"].append(segment.get("text", ""))
+            table["speaker"].append(speaker_id(segment.get("speaker")))
+            if nested_words:
+                for word in segment.get("words") or ():
+                    add_word(word, index)
+        columns["segments"] = _drop_empty_columns(table, ("speaker",))
+
+    if not nested_words and word_segments:
+        for word in word_segments:
+            add_word(word)
+    if words["word"]:
+        columns["words"] = _drop_empty_columns(words, ("score", "speaker"))
+    return columns
+
+
+def _drop_empty_columns(table, optional):
+    for field in optional:
+        if all(value is None for value in table[field]):
+            del table[field]
+    return table
+
+
+def segments_from_columns(columns):
+    """Rebuild segment dicts (with their aligned words) from ``columnar_transcript`` output"""
+    speakers = columns.get("speakers", [])
+    table = columns.get("segments")
+    if table is None:
+        return None
+
+    def rows(table, fields):
+        present = [field for field in fields if field in table]
+        for values in zip(*(table[field] for field in present)):
+            row = {}
+            for field, value in zip(present, values):
+                if field == "speaker":
+                    if value is not None:
+                        row["speaker"] = speakers[value]
+                elif value is not None:
+                    row[field] = value
+            yield row
+
+    segments = list(rows(table, SEGMENT_FIELDS))
+    words = columns.get("words")
+    if words and "segment" in words:
+        for segment in segments:
+            segment["words"] = []
+        for segment_index, word in zip(words["segment"], rows(words, WORD_FIELDS)):
+            segments[segment_index]["words"].append(word)
+    return segments
+
+
+def preferred_mimetype(accept_mimetypes):
+    """Return the msgpack mimetype the client asked for, or JSON.
+
+    ``accept_mimetypes`` is werkzeug's parsed Accept header; JSON wins
+    ties and wildcards, and msgpack is only offered when installed.
+    """
+    offers = [JSON_MIMETYPE]
+    if msgpack is not None:
+        offers.extend(MSGPACK_MIMETYPES)
+    return accept_mimetypes.best_match(offers, default=JSON_MIMETYPE)
+
+
+def dump_msgpack(body):
+    return msgpack.packb(body, use_bin_type=True)
+
+
+def negotiate_encoding(accept_encodings):
+    """Pick ``zstd`` or ``gzip`` from werkzeug's parsed Accept-Encoding, or None"""
+    offers = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    return accept_encodings.best_match(offers)
+
+
+def compress(data, encoding, gzip_level=6, zstd_level=3):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
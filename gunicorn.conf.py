@@ -0,0 +1,51 @@
+"""Gunicorn configuration for multi-process serving.
+
+    gunicorn -c gunicorn.conf.py
+
+The gunicorn master starts one model worker process per device slot (see
+``workers.plan_workers``) and restarts any that exit, while a single
+front worker runs the dispatcher on HOST:PORT. The model workers are
+themselves gunicorn servers started with this file and ``WORKER_SLOT``
+set; each serves ``app.py`` on 127.0.0.1:WORKER_BASE_PORT + slot.
+"""
+import json
+import os
+
+from config import Config
+
+timeout = Config.TIMEOUT_SECONDS
+graceful_timeout = 30
+worker_class = "gthread"
+workers = 1
+
+if Config.WORKER_SLOT is None:
+    # Front: proxy requests to the model workers
+    wsgi_app = "dispatcher:app"
+    bind = f"{Config.HOST}:{Config.PORT}"
+    threads = Config.DISPATCHER_THREADS
+
+    _supervisor = None
+
+    def on_starting(server):
+        global _supervisor
+        # Importing dispatcher here would build its app before DISPATCHER_WORKERS
+        # is set; the front worker imports it after the fork
+        from workers import WorkerSupervisor, plan_workers_from_config
+
+        specs = plan_workers_from_config()
+        # Read by dispatcher.Dispatcher.from_env in the front worker
+        os.environ["DISPATCHER_WORKERS"] = json.dumps([spec.to_dict() for spec in specs])
+        _supervisor = WorkerSupervisor(specs)
+        _supervisor.start()
+
+    def on_exit(server):
+        if _supervisor is not None:
+            _supervisor.stop()
+else:
+    # Model worker: one process owning its models, bound by the supervisor
+    wsgi_app = "app:app"
+    threads = Config.WORKER_THREADS
+
+    def post_worker_init(worker):
+        from app import start_warmup
+        start_warmup()
@@ -0,0 +1,235 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class IngestError(Exception):
+    """Media could not be fetched; ``code`` is the HTTP status to report"""
+
+    def __init__(self, message, code=400):
+        super().__init__(message)
+        self.code = code
+
+
+class MediaFile:
+    """A media file on local disk.
+
+    ``owned`` files are temporary copies made for this request and are
+    deleted by ``cleanup``; files read in place from a shared volume are
+    never touched.
+    """
+
+    def __init__(self, path, owned=True, size=None):
+        self.path = path
+        self.owned = owned
+        self.size = size if size is not None else os.path.getsize(path)
+
+    def cleanup(self):
+        if self.owned and self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def size_limit_message(max_bytes):
+    if max_bytes >= 1024 * 1024:
+        return f"Media file exceeds the maximum size of {max_bytes // (1024 * 1024)} MB"
+    return f"Media file exceeds the maximum size of {max_bytes} bytes"
+
+
+def _size_error(max_bytes):
+    return IngestError(size_limit_message(max_bytes), 413)
+
+
+class MediaFetcher:
+    """Fetch media from HTTP(S) URLs, uploads and allow-listed local paths.
+
+    HTTP downloads share a pooled session and are streamed to disk in
+    ``chunk_size`` blocks. Files over ``max_bytes`` are rejected from their
+    Content-Length before any body is read, or as soon as the streamed
+    size passes the limit. Objects of at least ``range_threshold`` bytes
+    on servers that accept byte ranges are fetched in ``range_parts``
+    parallel range requests.
+    """
+
+    def __init__(self, max_bytes, chunk_size=1024 * 1024, timeout=30, pool_size=16,
+                 range_threshold=0, range_parts=4, allowed_dirs=(), temp_dir=None):
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.range_threshold = range_threshold
+        self.range_parts = range_parts
+        self.allowed_dirs = [os.path.realpath(d) for d in allowed_dirs]
+        self.temp_dir = temp_dir
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._range_executor = None
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        """Return a MediaFile for an ``http(s)://`` or ``file://`` URL"""
+        scheme = urlparse(url).scheme.lower()
+        if scheme in ("http", "https"):
+            return self.download(url)
+        if scheme == "file":
+            return self.open_local(url)
+        raise IngestError(f"Unsupported media_url scheme '{scheme}'. Use http, https or file", 400)
+
+    def _temp_file(self):
+        fd, path = tempfile.mkstemp(suffix=".audio", dir=self.temp_dir)
+        return os.fdopen(fd, "wb"), path
+
+    def download(self, url):
+        """Stream a URL to a temporary file, enforcing the size limit"""
+        print(f"Downloading file from: {url}")
+        try:
+            response = self.session.get(url, stream=True, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise IngestError(f"Failed to download file: {e}", 400)
+
+        with response:
+            length = response.headers.get("Content-Length")
+            length = int(length) if length and length.isdigit() else None
+            if length is not None and self.max_bytes and length > self.max_bytes:
+                raise _size_error(self.max_bytes)
+
+            # Uncompressed body with a known length: split into range requests
+            use_ranges = (
+                self.range_threshold and length is not None and length >= self.range_threshold
+                and self.range_parts > 1
+                and response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                and response.headers.get("Content-Encoding", "identity") == "identity"
+            )
+            if not use_ranges:
+                return self._stream_to_file(response)
+
+        media = self._download_ranges(url, length)
+        if media is not None:
+            return media
+        try:
+            response = self.session.get(url, stream=True, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise IngestError(f"Failed to download file: {e}", 400)
+        with response:
+            return self._stream_to_file(response)
+
+    def _stream_to_file(self, response):
+        f, path = self._temp_file()
+        size = 0
+        try:
+            with f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise _size_error(self.max_bytes)
+                    f.write(chunk)
+        except IngestError:
+            os.unlink(path)
+            raise
+        except Exception as e:
+            os.unlink(path)
+            raise IngestError(f"Failed to download file: {e}", 400)
+
+        print(f"File downloaded to: {path} ({size} bytes)")
+        return MediaFile(path, owned=True, size=size)
+
+    def _get_range_executor(self):
+        with self._lock:
+            if self._range_executor is None:
+                self._range_executor = ThreadPoolExecutor(
+                    max_workers=self.range_parts * 2,
+                    thread_name_prefix="range-download"
+                )
+            return self._range_executor
+
+    def _fetch_range(self, url, path, start, end):
+        headers = {"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 206:
+                raise IngestError(f"Server ignored range request (HTTP {response.status_code})", 400)
+            written = 0
+            with open(path, "r+b") as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    written += len(chunk)
+                    if written > end - start + 1:
+                        raise IngestError("Range response longer than requested", 400)
+                    f.write(chunk)
+            if written != end - start + 1:
+                raise IngestError("Range response shorter than requested", 400)
+
+    def _download_ranges(self, url, length):
+        """Download ``length`` bytes in parallel parts; None if the server
+        does not honour ranges, so the caller can fall back to one stream"""
+        f, path = self._temp_file()
+        with f:
+            f.truncate(length)
+
+        part = -(-length // self.range_parts)
+        spans = [(start, min(start + part, length) - 1) for start in range(0, length, part)]
+        print(f"Downloading {length} bytes in {len(spans)} range requests")
+        futures = [self._get_range_executor().submit(self._fetch_range, url, path, start, end) for start, end in spans]
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            os.unlink(path)
+            print(f"Range download failed, falling back to a single stream: {errors[0]}")
+            return None
+        print(f"File downloaded to: {path} ({length} bytes)")
+        return MediaFile(path, owned=True, size=length)
+
+    def open_local(self, url):
+        """Use a ``file://`` path in place if it is inside an allowed directory"""
+        parsed = urlparse(url)
+        if parsed.netloc not in ("", "localhost"):
+            raise IngestError("file:// URLs must refer to a local path", 400)
+        if not self.allowed_dirs:
+            raise IngestError("Local media paths are disabled (set LOCAL_MEDIA_DIRS)", 403)
+
+        path = os.path.realpath(unquote(parsed.path))
+        if not any(os.path.commonpath([path, root]) == root for root in self.allowed_dirs):
+            raise IngestError("Local media path is outside the allowed directories", 403)
+        if not os.path.isfile(path):
+            raise IngestError("Local media file not found", 404)
+
+        size = os.path.getsize(path)
+        if self.max_bytes and size > self.max_bytes:
+            raise _size_error(self.max_bytes)
+        print(f"Using local file: {path}")
+        return MediaFile(path, owned=False, size=size)
+
+    def save_upload(self, stream):
+        """Copy an uploaded file stream to a temporary file"""
+        f, path = self._temp_file()
+        size = 0
+        try:
+            with f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise _size_error(self.max_bytes)
+                    f.write(chunk)
+        except Exception:
+            os.unlink(path)
+            raise
+        print(f"Upload saved to: {path} ({size} bytes)")
+        return MediaFile(path, owned=True, size=size)
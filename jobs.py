@@ -0,0 +1,173 @@
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no free slots"""
+    pass
+
+
+class Job:
+    """A single asynchronous transcription job"""
+
+    def __init__(self, params, webhook_url=None, id_prefix=""):
+        self.job_id = id_prefix + uuid.uuid4().hex
+        self.params = params
+        self.webhook_url = webhook_url
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.code = 202
+        self.response = None
+        self.message = "queued"
+        self.processing_time = None
+        self.timings = None
+
+    def to_dict(self):
+        """Serialize the job in the API response style"""
+        queue_time = None
+        if self.started_at is not None:
+            queue_time = round(self.started_at - self.created_at, 2)
+        return {
+            "job_id": self.job_id,
+            "id": self.params.get("id"),
+            "status": self.status,
+            "code": self.code,
+            "response": self.response,
+            "message": self.message,
+            "queue_time": queue_time,
+            "processing_time": self.processing_time,
+            "timings": self.timings
+        }
+
+
+class JobManager:
+    """Runs transcription jobs on a bounded worker pool.
+
+    ``handler`` is called with the job params and must return a
+    ``(response_data, processing_time, timings)`` tuple. Exceptions may
+    carry a ``code`` attribute which is reported as the job's status code.
+    Job ids start with ``id_prefix``, which lets a dispatcher in front of
+    several processes route job lookups back to the process that owns them.
+    """
+
+    def __init__(self, handler, max_workers=1, max_queued=100, result_ttl=3600,
+                 webhook_timeout=30, webhook_retries=3, id_prefix=""):
+        self.handler = handler
+        self.id_prefix = id_prefix
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.webhook_timeout = webhook_timeout
+        self.webhook_retries = webhook_retries
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        # Created lazily so importing the app does not spawn threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="transcribe-job"
+                )
+            return self._executor
+
+    def submit(self, params, webhook_url=None):
+        """Queue a job, raising JobQueueFull when no slot is available"""
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull("Job queue is full, please retry later")
+
+        job = Job(params, webhook_url, self.id_prefix)
+        self._purge_expired()
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._pending += 1
+
+        try:
+            self._get_executor().submit(self._run, job)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+                self._pending -= 1
+            self._slots.release()
+            raise
+        return job
+
+    def get(self, job_id):
+        """Return a job by id or None if unknown or expired"""
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        """Count jobs by status"""
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def backlog(self):
+        """Number of queued or running jobs"""
+        return self._pending
+
+    def _run(self, job):
+        job.status = "running"
+        job.message = "running"
+        job.started_at = time.time()
+        try:
+            response_data, processing_time, timings = self.handler(job.params)
+            job.response = response_data
+            job.processing_time = processing_time
+            job.timings = timings
+            job.code = 200
+            job.message = "success"
+            job.status = "completed"
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {e}")
+            print(traceback.format_exc())
+            job.code = getattr(e, "code", 500)
+            job.message = str(e)
+            job.processing_time = round(time.time() - job.started_at, 2)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+        if job.webhook_url:
+            self._send_webhook(job)
+
+    def _send_webhook(self, job):
+        payload = job.to_dict()
+        for attempt in range(1, self.webhook_retries + 1):
+            try:
+                response = requests.post(job.webhook_url, json=payload, timeout=self.webhook_timeout)
+                response.raise_for_status()
+                print(f"Webhook delivered for job {job.job_id}")
+                return True
+            except Exception as e:
+                print(f"Webhook attempt {attempt} for job {job.job_id} failed: {e}")
+                if attempt < self.webhook_retries:
+                    time.sleep(min(2 ** attempt, 30))
+        return False
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,52 @@
+import time
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access.
+
+    ``torch`` and ``whisperx`` take seconds to import. Binding them through
+    a LazyModule lets the web server start and answer health checks
+    immediately, while the first real use (or the background warmup)
+    pays for the import. ``load_seconds`` records how long it took.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._module = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        """Import the module now and return it"""
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self.name)
+                self.load_seconds = time.perf_counter() - started
+                print(f"Imported {self.name} in {self.load_seconds:.2f}s")
+                self._module = module
+            return self._module
+
+    def __getattr__(self, attr):
+        # Only called for attributes not set in __init__
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self.name} ({state})>"
+
+
+# Heavy dependencies shared by the API modules
+torch = LazyModule("torch")
+whisperx = LazyModule("whisperx")
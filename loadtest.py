@@ -0,0 +1,534 @@
+"""Offline load test for the transcription API.
+
+WhisperX, pyannote and (when it is not installed) torch are replaced by
+deterministic stubs with configurable latency, media is served from a
+local HTTP server, and the real Flask app is driven over HTTP at a given
+concurrency. No GPU, model download or network access is needed, so the
+request path, download, decoding, formatting and speaker assignment can
+be tracked in CI.
+
+Usage:
+    python loadtest.py --requests 200 --concurrency 8 --audio-seconds 60
+    python loadtest.py --speakers --words --output-format all --output result.json
+    python loadtest.py --workers 4 --stub-cpu-share 0.5 --concurrency 8
+
+With ``--workers`` the app runs in that many stubbed worker processes
+behind the dispatcher used by ``gunicorn.conf.py``, as in multi-process
+serving with ``FORCE_CPU``. ``--stub-cpu-share`` turns part of each stub
+latency into busy Python work that holds the GIL, like the real pre- and
+post-processing, so the gain from more processes is visible.
+
+Results are printed as JSON.
+"""
+import os
+import sys
+import json
+import time
+import types
+import wave
+import shutil
+import argparse
+import tempfile
+import contextlib
+import threading
+import functools
+import http.server
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Stub latencies in seconds; set from the command line before the app is imported
+LATENCY = {
+    "load": 0.0,
+    "transcribe_per_audio_second": 0.002,
+    "align_per_audio_second": 0.001,
+    "diarize_per_audio_second": 0.001,
+    "cpu_share": 0.0
+}
+SEGMENT_SECONDS = 5.0
+WORDS_PER_SEGMENT = 10
+
+
+def _stub_wait(seconds):
+    """Spend ``seconds`` in a stub: the ``cpu_share`` part busy, the rest asleep"""
+    busy_until = time.perf_counter() + seconds * LATENCY["cpu_share"]
+    while time.perf_counter() < busy_until:
+        pass
+    time.sleep(seconds * (1.0 - LATENCY["cpu_share"]))
+
+
+def _audio_seconds(audio):
+    if isinstance(audio, dict):
+        audio = audio["waveform"]
+    return np.shape(audio)[-1] / float(SAMPLE_RATE)
+
+
+def _stub_segments(duration):
+    """Deterministic segments covering ``duration`` seconds"""
+    segments = []
+    start = 0.0
+    index = 0
+    while start < duration:
+        end = min(start + SEGMENT_SECONDS, duration)
+        text = " " + " ".join(f"word{index}_{i}" for i in range(WORDS_PER_SEGMENT))
+        segments.append({"start": round(start, 3), "end": round(end, 3), "text": text})
+        start = end
+        index += 1
+    return segments
+
+
+class _StubVad:
+    def __call__(self, inputs):
+        duration = _audio_seconds(inputs)
+        return [{"start": s["start"], "end": s["end"]} for s in _stub_segments(duration)]
+
+    @staticmethod
+    def merge_chunks(segments, chunk_size, onset=None, offset=None):
+        return segments
+
+
+class _StubDecoder:
+    hf_tokenizer = None
+
+    class model:
+        is_multilingual = True
+
+    def generate_segment_batched(self, features, tokenizer, options):
+        seconds = sum(float(np.ravel(f)[0]) for f in features)
+        _stub_wait(LATENCY["transcribe_per_audio_second"] * seconds)
+        return [" " + " ".join(f"word{i}" for i in range(WORDS_PER_SEGMENT)) for _ in features]
+
+
+class _StubWhisperModel:
+    vad_model = _StubVad()
+    _vad_params = {"vad_onset": 0.5, "vad_offset": 0.363}
+    preset_language = None
+    options = None
+
+    def __init__(self):
+        self.model = _StubDecoder()
+
+    def detect_language(self, audio):
+        return "en"
+
+    def preprocess(self, inputs):
+        return {"inputs": np.array([len(inputs["inputs"]) / float(SAMPLE_RATE)], dtype=np.float32)}
+
+    def transcribe(self, audio, batch_size=16, language=None, task=None, **kwargs):
+        duration = _audio_seconds(audio)
+        _stub_wait(LATENCY["transcribe_per_audio_second"] * duration)
+        return {"segments": _stub_segments(duration), "language": language or "en"}
+
+
+class _StubAlignModel:
+    pass
+
+
+class _StubTurn:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class _StubAnnotation:
+    """Alternating two-speaker turns in pyannote ``Annotation`` form"""
+
+    def __init__(self, duration, turn_seconds=7.0):
+        self.turns = []
+        start = 0.0
+        index = 0
+        while start < duration:
+            end = min(start + turn_seconds, duration)
+            self.turns.append((_StubTurn(start, end), f"SPEAKER_{index % 2:02d}"))
+            start = end
+            index += 1
+
+    def itertracks(self, yield_label=True):
+        for turn, speaker in self.turns:
+            yield turn, None, speaker
+
+    def labels(self):
+        return sorted({speaker for _, speaker in self.turns})
+
+
+class _StubDiarizationPipeline:
+    def __init__(self, *args, **kwargs):
+        time.sleep(LATENCY["load"])
+
+    def __call__(self, audio, return_embeddings=False, **kwargs):
+        duration = _audio_seconds(audio)
+        _stub_wait(LATENCY["diarize_per_audio_second"] * duration)
+        annotation = _StubAnnotation(duration)
+        if return_embeddings:
+            embeddings = {label: np.eye(2)[i] for i, label in enumerate(annotation.labels())}
+            return annotation, embeddings
+        return annotation
+
+
+def _stub_load_model(name, device=None, compute_type=None, **kwargs):
+    time.sleep(LATENCY["load"])
+    return _StubWhisperModel()
+
+
+def _stub_load_align_model(language_code, device, **kwargs):
+    time.sleep(LATENCY["load"])
+    return _StubAlignModel(), {"language": language_code}
+
+
+def _stub_align(segments, model, metadata, audio, device, return_char_alignments=False, **kwargs):
+    _stub_wait(LATENCY["align_per_audio_second"] * _audio_seconds(audio))
+    aligned = []
+    word_segments = []
+    for segment in segments:
+        texts = segment["text"].split()
+        step = (segment["end"] - segment["start"]) / max(len(texts), 1)
+        words = [
+            {"word": text, "start": round(segment["start"] + i * step, 3),
+             "end": round(segment["start"] + (i + 1) * step, 3), "score": 0.9}
+            for i, text in enumerate(texts)
+        ]
+        aligned.append(dict(segment, words=words))
+        word_segments.extend(words)
+    return {"segments": aligned, "word_segments": word_segments}
+
+
+def _stub_torch():
+    """A numpy-backed stand-in for the few torch calls made by the API"""
+    torch = types.ModuleType("torch")
+
+    class Tensor(np.ndarray):
+        def unsqueeze(self, dim):
+            return np.expand_dims(self, dim).view(Tensor)
+
+    torch.Tensor = Tensor
+    torch.from_numpy = lambda array: np.asarray(array).view(Tensor)
+    torch.as_tensor = lambda data: np.asarray(data)
+    torch.stack = lambda tensors: np.stack(tensors)
+    torch.device = lambda name: name
+    torch.cuda = types.SimpleNamespace(
+        is_available=lambda: False,
+        empty_cache=lambda: None,
+        device_count=lambda: 0,
+        max_memory_allocated=lambda device=None: 0
+    )
+    return torch
+
+
+def install_stubs():
+    """Register stub modules so importing the app loads no real models"""
+    whisperx = types.ModuleType("whisperx")
+    whisperx.load_model = _stub_load_model
+    whisperx.load_align_model = _stub_load_align_model
+    whisperx.align = _stub_align
+    whisperx.DiarizationPipeline = _StubDiarizationPipeline
+    sys.modules["whisperx"] = whisperx
+
+    faster_whisper = types.ModuleType("faster_whisper")
+    tokenizer = types.ModuleType("faster_whisper.tokenizer")
+
+    class Tokenizer:
+        def __init__(self, hf_tokenizer, multilingual, task=None, language=None):
+            self.task = task
+            self.language = language
+
+    tokenizer.Tokenizer = Tokenizer
+    faster_whisper.tokenizer = tokenizer
+    sys.modules["faster_whisper"] = faster_whisper
+    sys.modules["faster_whisper.tokenizer"] = tokenizer
+
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        sys.modules["torch"] = _stub_torch()
+
+
+def write_wav(path, seconds, seed=0):
+    """Write a 16 kHz mono PCM16 file of low-level noise"""
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 1000).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory):
+    """Serve a directory over HTTP on a free local port"""
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="loadtest-media", daemon=True).start()
+    return server
+
+
+def serve_app(app):
+    """Run the Flask app on a threaded local server"""
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-api", daemon=True).start()
+    return server
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "p99": round(percentile(values, 0.99), 4),
+        "max": round(max(values), 4)
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_load(api_url, payloads, concurrency, timeout):
+    """POST every payload with ``concurrency`` workers, returning per-request results"""
+    import requests
+
+    local = threading.local()
+
+    def send(payload):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = session.post(api_url, json=payload, timeout=timeout)
+            latency = time.perf_counter() - started
+            body = response.json()
+            return {"status": response.status_code, "latency": latency, "body": body,
+                    "worker": response.headers.get("X-Worker-Slot")}
+        except Exception as e:
+            return {"status": None, "latency": time.perf_counter() - started, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(send, payloads))
+
+
+def _latency_args(args):
+    return [
+        "--load-latency", str(args.load_latency),
+        "--transcribe-rtf", str(args.transcribe_rtf),
+        "--align-rtf", str(args.align_rtf),
+        "--diarize-rtf", str(args.diarize_rtf),
+        "--stub-cpu-share", str(args.stub_cpu_share)
+    ]
+
+
+def serve_worker(port):
+    """Serve the stubbed app on ``port`` until killed (one ``--workers`` process)"""
+    from werkzeug.serving import make_server
+
+    install_stubs()
+    import app as app_module
+
+    app_module.start_warmup()
+    make_server("127.0.0.1", port, app_module.app, threaded=True).serve_forever()
+
+
+def start_workers(args):
+    """Start ``--workers`` stubbed worker processes and wait until all are ready"""
+    from workers import WorkerSupervisor, plan_workers
+    from dispatcher import Backend, Dispatcher
+
+    specs = plan_workers(force_cpu=True, processes=args.workers, base_port=args.worker_base_port)
+    command = lambda spec: [sys.executable, os.path.abspath(__file__), "--serve-worker", str(spec.port)] + _latency_args(args)
+    # Worker logs go to stderr so stdout keeps only the report
+    supervisor = WorkerSupervisor(specs, command=command, stdout=None if args.verbose else sys.stderr)
+    supervisor.start()
+
+    dispatcher = Dispatcher([Backend(spec.slot, spec.url, spec.device) for spec in specs], timeout=args.timeout, poll_interval=0.5)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        dispatcher.poll()
+        if all(backend.ready for backend in dispatcher.backends):
+            return supervisor, dispatcher
+        time.sleep(0.2)
+    supervisor.stop()
+    raise RuntimeError("Worker processes did not become ready within 60 seconds")
+
+
+def create_dispatcher_app(dispatcher):
+    from dispatcher import create_app
+    return create_app(dispatcher)
+
+
+def _run(args, media_dir):
+    """Start the media server and the stubbed app, then send the load"""
+    names = []
+    for i, seconds in enumerate(args.audio_seconds):
+        name = f"audio_{i}_{int(seconds)}s.wav"
+        write_wav(os.path.join(media_dir, name), seconds, seed=i)
+        names.append(name)
+    media_server = serve_directory(media_dir)
+    media_base = f"http://127.0.0.1:{media_server.server_address[1]}"
+
+    if args.workers:
+        supervisor, dispatcher = start_workers(args)
+        rss_before_app = peak_rss_bytes()
+        api_server = serve_app(create_dispatcher_app(dispatcher))
+    else:
+        supervisor = None
+        install_stubs()
+        rss_before_app = peak_rss_bytes()
+        import app as app_module
+        api_server = serve_app(app_module.app)
+
+    from config import Config
+    api_url = f"http://127.0.0.1:{api_server.server_address[1]}/{Config.API_VERSION}/media/transcribe"
+
+    def payload(i):
+        return {
+            "media_url": f"{media_base}/{names[i % len(names)]}",
+            "include_speaker_labels": args.speakers,
+            "include_word_timestamps": args.words,
+            "output_format": args.output_format,
+            "include_timings": True,
+            "id": f"loadtest-{i}"
+        }
+
+    try:
+        if args.warmup:
+            run_load(api_url, [payload(i) for i in range(args.warmup)], min(args.concurrency, args.warmup), args.timeout)
+
+        started = time.perf_counter()
+        results = run_load(api_url, [payload(i) for i in range(args.requests)], args.concurrency, args.timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        api_server.shutdown()
+        media_server.shutdown()
+        if supervisor is not None:
+            supervisor.stop()
+    return results, elapsed, rss_before_app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the WhisperX API")
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests sent first (model loading)")
+    parser.add_argument("--audio-seconds", type=float, nargs="+", default=[30.0],
+                        help="Durations of the synthetic files; requests cycle through them")
+    parser.add_argument("--speakers", action="store_true", help="Request speaker labels")
+    parser.add_argument("--words", action="store_true", help="Request word timestamps")
+    parser.add_argument("--output-format", default="json")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Seconds per stub model load")
+    parser.add_argument("--transcribe-rtf", type=float, default=0.002, help="Stub transcription seconds per audio second")
+    parser.add_argument("--align-rtf", type=float, default=0.001, help="Stub alignment seconds per audio second")
+    parser.add_argument("--diarize-rtf", type=float, default=0.001, help="Stub diarization seconds per audio second")
+    parser.add_argument("--stub-cpu-share", type=float, default=0.0,
+                        help="Fraction of stub latency spent busy holding the GIL instead of sleeping")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run the app in this many worker processes behind the dispatcher (0 = in-process)")
+    parser.add_argument("--worker-base-port", type=int, default=17300, help="First local port for --workers")
+    parser.add_argument("--serve-worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-cache", action="store_true", help="Leave the result cache enabled")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the API's log output on stdout")
+    args = parser.parse_args(argv)
+
+    LATENCY["load"] = args.load_latency
+    LATENCY["transcribe_per_audio_second"] = args.transcribe_rtf
+    LATENCY["align_per_audio_second"] = args.align_rtf
+    LATENCY["diarize_per_audio_second"] = args.diarize_rtf
+    LATENCY["cpu_share"] = args.stub_cpu_share
+
+    if args.serve_worker:
+        serve_worker(args.serve_worker)
+        return 0
+
+    media_dir = tempfile.mkdtemp(prefix="whisperx-loadtest-")
+    os.environ.setdefault("HUGGINGFACE_TOKEN", "loadtest")
+    os.environ["RESULT_CACHE_ENABLED"] = "true" if args.result_cache else "false"
+    os.environ.setdefault("RESULT_CACHE_DIR", os.path.join(media_dir, "result-cache"))
+
+    # Keep stdout for the report; the API logs every stage with print
+    logs = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(sys.stderr)
+    try:
+        with logs:
+            results, elapsed, rss_before_app = _run(args, media_dir)
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+
+    ok = [r for r in results if r["status"] == 200]
+    errors = {}
+    for r in results:
+        if r["status"] != 200:
+            key = str(r["status"]) if r["status"] is not None else "connection"
+            errors[key] = errors.get(key, 0) + 1
+
+    per_worker = {}
+    for r in ok:
+        if r.get("worker") is not None:
+            per_worker[r["worker"]] = per_worker.get(r["worker"], 0) + 1
+
+    stages = {}
+    for r in ok:
+        for stage, seconds in (r["body"].get("timings") or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    audio_seconds = sum(args.audio_seconds[i % len(args.audio_seconds)] for i, r in enumerate(results) if r["status"] == 200)
+    report = {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "requests_per_worker": per_worker,
+        "audio_seconds": args.audio_seconds,
+        "options": {
+            "speakers": args.speakers,
+            "words": args.words,
+            "output_format": args.output_format,
+            "result_cache": args.result_cache
+        },
+        "stub_latency": dict(LATENCY),
+        "duration_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(ok) / elapsed, 3) if elapsed else None,
+        "audio_seconds_per_second": round(audio_seconds / elapsed, 2) if elapsed else None,
+        "latency_seconds": summarize([r["latency"] for r in ok]),
+        "server_processing_seconds": summarize([r["body"].get("processing_time", 0.0) for r in ok]),
+        "stages": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "rss_bytes_before_app": rss_before_app,
+        "peak_rss_bytes": peak_rss_bytes()
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Pipeline stages and requests run far longer than prometheus_client's default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float("inf"))
+
+
+class Registry(CollectorRegistry):
+    """A prometheus_client registry with scrape-time callbacks.
+
+    Callbacks added with ``on_collect`` run before every collection, so
+    values owned by other components (pool sizes, queue depths) are read
+    at scrape time instead of being pushed on every change.
+    """
+
+    def __init__(self):
+        super().__init__(auto_describe=True)
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_collect(self, callback):
+        with self._callbacks_lock:
+            self._callbacks.append(callback)
+        return callback
+
+    def collect(self):
+        with self._callbacks_lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Warning: metrics callback failed: {e}")
+        yield from super().collect()
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        return generate_latest(self).decode("utf-8")
+
+
+REGISTRY = Registry()
+
+# Pipeline metrics shared by the API modules
+STAGE_SECONDS = Histogram(
+    "whisperx_stage_duration_seconds",
+    "Wall time spent in each pipeline stage",
+    ["stage"],
+    registry=REGISTRY,
+    buckets=DEFAULT_BUCKETS
+)
+REQUESTS = Counter(
+    "whisperx_http_requests",
+    "HTTP requests by endpoint and status code",
+    ["endpoint", "code"],
+    registry=REGISTRY
+)
+REQUEST_SECONDS = Histogram(
+    "whisperx_http_request_duration_seconds",
+    "HTTP request handling time (until the response starts for streams)",
+    ["endpoint"],
+    registry=REGISTRY,
+    buckets=DEFAULT_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "whisperx_transcriptions_in_flight",
+    "Pipeline runs currently in progress",
+    registry=REGISTRY
+)
+AUDIO_SECONDS = Counter(
+    "whisperx_audio_seconds_processed",
+    "Seconds of audio run through the pipeline",
+    registry=REGISTRY
+)
+REAL_TIME_FACTOR = Histogram(
+    "whisperx_real_time_factor",
+    "Pipeline wall time divided by audio duration",
+    registry=REGISTRY,
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+)
+MODEL_LOADS = Counter(
+    "whisperx_model_loads",
+    "Models loaded by kind",
+    ["kind"],
+    registry=REGISTRY
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "whisperx_model_load_duration_seconds",
+    "Time taken to load a model",
+    ["kind"],
+    registry=REGISTRY,
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+)
+CACHE_LOOKUPS = Counter(
+    "whisperx_result_cache_lookups",
+    "Result cache lookups by outcome",
+    ["result"],
+    registry=REGISTRY
+)
+GPU_MEMORY_PEAK = Gauge(
+    "whisperx_gpu_memory_peak_bytes",
+    "High-water mark of memory allocated by torch on each CUDA device",
+    ["device"],
+    registry=REGISTRY
+)
+
+
+@contextmanager
+def span(stage, timings=None):
+    """Time a pipeline stage.
+
+    The duration is observed in the stage histogram and, when ``timings``
+    is given, added to ``timings[stage]`` for the per-request breakdown.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 3)
+
+
+def record_model_load(kind, seconds):
+    """Count a model load and observe its duration"""
+    MODEL_LOADS.labels(kind=kind).inc()
+    MODEL_LOAD_SECONDS.labels(kind=kind).observe(seconds)
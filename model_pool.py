@@ -0,0 +1,206 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# Approximate parameter counts of the Whisper checkpoints
+WHISPER_MODEL_PARAMS = {
+    "tiny": 39_000_000,
+    "base": 74_000_000,
+    "small": 244_000_000,
+    "medium": 769_000_000,
+    "large": 1_550_000_000,
+    "large-v1": 1_550_000_000,
+    "large-v2": 1_550_000_000,
+    "large-v3": 1_550_000_000,
+    "large-v3-turbo": 809_000_000,
+    "turbo": 809_000_000,
+    "distil-large-v2": 756_000_000,
+    "distil-large-v3": 756_000_000,
+    "distil-medium.en": 394_000_000,
+    "distil-small.en": 166_000_000
+}
+
+# Bytes per weight for CTranslate2 compute types
+COMPUTE_TYPE_BYTES = {
+    "float32": 4,
+    "float16": 2,
+    "bfloat16": 2,
+    "int16": 2,
+    "int8": 1,
+    "int8_float32": 1,
+    "int8_float16": 1,
+    "int8_bfloat16": 1
+}
+
+
+def estimate_model_bytes(model, key=None):
+    """Estimate the memory held by a torch module's parameters and buffers"""
+    if isinstance(model, tuple):
+        model = model[0]
+    total = 0
+    for attr in ("parameters", "buffers"):
+        tensors = getattr(model, attr, None)
+        if not callable(tensors):
+            continue
+        try:
+            total += sum(t.numel() * t.element_size() for t in tensors())
+        except Exception:
+            pass
+    return total
+
+
+def estimate_whisper_bytes(model, key):
+    """Estimate a Whisper model's weight memory from its ``(name, device,
+    compute_type)`` key; CTranslate2 models do not expose their tensors"""
+    name, _, compute_type = key
+    name = name.split("/")[-1].removeprefix("faster-whisper-")
+    params = WHISPER_MODEL_PARAMS.get(name) or WHISPER_MODEL_PARAMS.get(name.removesuffix(".en"))
+    if params is None:
+        return 0
+    return params * COMPUTE_TYPE_BYTES.get(compute_type, 2)
+
+
+class _PoolEntry:
+    __slots__ = ("value", "size", "load_seconds", "loaded_at")
+
+    def __init__(self, value, size, load_seconds):
+        self.value = value
+        self.size = size
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+
+class ModelPool:
+    """Keyed pool of loaded models with LRU eviction.
+
+    ``loader`` is called with the key's items as arguments. The pool keeps
+    at most ``max_models`` entries and at most ``max_bytes`` of estimated
+    model memory (0 disables a limit). Loads are serialized per key, so
+    concurrent requests for the same model wait for a single load instead
+    of loading it twice, while different keys load in parallel.
+    ``size_fn`` is called with ``(model, key)``. Keys in ``pinned`` are
+    never evicted, though they count towards the limits. ``on_load`` is
+    called with ``(key, seconds)`` after each load and ``on_evict`` with
+    the key of each evicted model.
+    """
+
+    def __init__(self, name, loader, max_models=0, max_bytes=0, size_fn=estimate_model_bytes,
+                 pinned=(), on_load=None, on_evict=None):
+        self.name = name
+        self.loader = loader
+        self.on_load = on_load
+        self.on_evict = on_evict
+        self.pinned = set(pinned)
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+
+    def get(self, key):
+        """Return the model for a key, loading it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+                self.misses += 1
+
+            print(f"Loading {self.name} model: {key}")
+            started = time.time()
+            value = self.loader(*key)
+            load_seconds = time.time() - started
+            size = self.size_fn(value, key)
+            print(f"{self.name.capitalize()} model loaded: {key} in {load_seconds:.2f}s")
+
+            with self._lock:
+                self._entries[key] = _PoolEntry(value, size, load_seconds)
+                self._total_bytes += size
+                self.loads += 1
+                self.load_seconds_total += load_seconds
+                evicted = self._evict(keep=key)
+            if self.on_load is not None:
+                self.on_load(key, load_seconds)
+            if self.on_evict is not None:
+                for evicted_key in evicted:
+                    self.on_evict(evicted_key)
+            return value
+
+    def prewarm(self, keys):
+        """Load a list of keys, logging (not raising) failures"""
+        for key in keys:
+            try:
+                self.get(key)
+            except Exception as e:
+                print(f"Warning: Could not prewarm {self.name} model {key}: {e}")
+
+    def _evict(self, keep):
+        # Caller holds the lock; returns the evicted keys
+        def over_budget():
+            if self.max_models and len(self._entries) > self.max_models:
+                return True
+            return bool(self.max_bytes) and self._total_bytes > self.max_bytes
+
+        evicted = []
+        for key in list(self._entries):
+            if not over_budget():
+                break
+            if key == keep or key in self.pinned:
+                continue
+            entry = self._entries.pop(key)
+            self._total_bytes -= entry.size
+            self.evictions += 1
+            evicted.append(key)
+            print(f"Evicted {self.name} model: {key}")
+        if over_budget():
+            print(f"Warning: {self.name} models exceed the pool limits but the rest are pinned")
+        return evicted
+
+    def loaded(self):
+        """Return the keys currently resident, least recently used first"""
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self):
+        """Report pool contents and hit/miss counters"""
+        with self._lock:
+            return {
+                "models": [
+                    {
+                        "key": list(key),
+                        "bytes": entry.size,
+                        "load_seconds": round(entry.load_seconds, 2),
+                        "pinned": key in self.pinned
+                    }
+                    for key, entry in self._entries.items()
+                ],
+                "bytes": self._total_bytes,
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds_total": round(self.load_seconds_total, 2)
+            }
@@ -0,0 +1,175 @@
+import numbers
+
+import numpy as np
+
+DEFAULT_SPEAKER = "SPEAKER_00"
+
+# Queries are matched in blocks to bound the candidate arrays
+_QUERY_BLOCK = 4096
+
+# Turns shorter than this share the smallest duration bucket
+_MIN_BUCKET_SECONDS = 2.0 ** -10
+
+# Widens the candidate window so float rounding never drops a turn
+_WINDOW_SLACK = 1e-6
+
+
+def diarization_to_turns(diarize_segments):
+    """Convert diarization output into a list of speaker turn dicts.
+
+    Accepts a pyannote ``Annotation``, the pandas DataFrame returned by
+    ``whisperx.DiarizationPipeline`` or an iterable of turn dicts.
+    """
+    if hasattr(diarize_segments, "itertracks"):
+        return [
+            {"start": turn.start, "end": turn.end, "speaker": speaker}
+            for turn, _, speaker in diarize_segments.itertracks(yield_label=True)
+        ]
+    if hasattr(diarize_segments, "to_dict"):
+        return [
+            {"start": row["start"], "end": row["end"], "speaker": row["speaker"]}
+            for row in diarize_segments.to_dict("records")
+        ]
+    return list(diarize_segments)
+
+
+class TurnIndex:
+    """Interval index over speaker turns, bucketed by turn duration.
+
+    Turns are grouped into buckets of durations up to a power of two and
+    sorted by start time within each bucket. A turn in a bucket whose
+    longest turn lasts ``D`` seconds can only overlap a query
+    ``[start, end)`` if it starts in ``[start - D, end)``, so each bucket
+    yields its candidates with two binary searches. One long turn (such as
+    background speech spanning the whole recording) lands in its own
+    bucket and adds a single candidate per query instead of widening the
+    window for every other turn. Overlaps for all candidates are then
+    computed in one vectorized pass.
+    """
+
+    def __init__(self, turns):
+        count = len(turns)
+        self.starts = np.fromiter((t["start"] for t in turns), dtype=np.float64, count=count)
+        self.ends = np.fromiter((t["end"] for t in turns), dtype=np.float64, count=count)
+        self.speakers = [turns[i]["speaker"] for i in range(count)]
+
+        # (turn indices sorted by start, their starts, longest duration) per bucket
+        self.buckets = []
+        if not count:
+            return
+        durations = np.maximum(self.ends - self.starts, 0.0)
+        exponents = np.ceil(np.log2(np.maximum(durations, _MIN_BUCKET_SECONDS))).astype(np.int64)
+        for exponent in np.unique(exponents):
+            members = np.flatnonzero(exponents == exponent)
+            # Stable sort keeps list order for equal starts
+            members = members[np.argsort(self.starts[members], kind="stable")]
+            self.buckets.append((members, self.starts[members], float(durations[members].max())))
+
+    def __len__(self):
+        return len(self.speakers)
+
+    def best_turns(self, starts, ends):
+        """Return, per query interval, the index of the turn with the largest
+        overlap (earliest turn on ties) or -1 when nothing overlaps."""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        best = np.full(len(starts), -1, dtype=np.int64)
+        if not len(self) or not len(starts):
+            return best
+
+        for offset in range(0, len(starts), _QUERY_BLOCK):
+            block = slice(offset, offset + _QUERY_BLOCK)
+            best[block] = self._best_block(starts[block], ends[block])
+        return best
+
+    def _candidates(self, starts, ends):
+        """Return ``(query_idx, turn_idx)`` pairs for every turn that may overlap"""
+        query_parts = []
+        turn_parts = []
+        queries = np.arange(len(starts))
+        for members, bucket_starts, longest in self.buckets:
+            lo = np.searchsorted(bucket_starts, starts - longest - _WINDOW_SLACK, side="left")
+            hi = np.searchsorted(bucket_starts, ends, side="left")
+            counts = np.maximum(hi - lo, 0)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            group_start = np.repeat(np.cumsum(counts) - counts, counts)
+            positions = np.repeat(lo, counts) + (np.arange(total) - group_start)
+            query_parts.append(np.repeat(queries, counts))
+            turn_parts.append(members[positions])
+        if not query_parts:
+            return None, None
+        return np.concatenate(query_parts), np.concatenate(turn_parts)
+
+    def _best_block(self, starts, ends):
+        best = np.full(len(starts), -1, dtype=np.int64)
+        query_idx, turn_idx = self._candidates(starts, ends)
+        if query_idx is None:
+            return best
+
+        overlap = (
+            np.minimum(ends[query_idx], self.ends[turn_idx])
+            - np.maximum(starts[query_idx], self.starts[turn_idx])
+        )
+
+        # Per query: largest overlap first, then earliest turn in list order
+        ranked = np.lexsort((turn_idx, -overlap, query_idx))
+        first = np.ones(len(ranked), dtype=bool)
+        first[1:] = query_idx[ranked][1:] != query_idx[ranked][:-1]
+        winners = ranked[first]
+
+        positive = overlap[winners] > 0
+        best[query_idx[winners][positive]] = turn_idx[winners][positive]
+        return best
+
+
+def _is_timed(item):
+    return isinstance(item.get("start"), numbers.Real) and isinstance(item.get("end"), numbers.Real)
+
+
+def _assign(index, items, fallbacks):
+    """Label items in place; ``fallbacks[i]`` is used when nothing overlaps"""
+    timed = [i for i, item in enumerate(items) if _is_timed(item)]
+    best = index.best_turns(
+        [items[i]["start"] for i in timed],
+        [items[i]["end"] for i in timed]
+    ).tolist()
+    turns = dict(zip(timed, best))
+
+    for i, item in enumerate(items):
+        turn = turns.get(i, -1)
+        speaker = index.speakers[turn] if turn >= 0 else None
+        if speaker:
+            item["speaker"] = speaker
+        elif fallbacks[i] is not None:
+            item["speaker"] = fallbacks[i]
+
+
+def assign_speakers(segments, turns, word_segments=None, default_speaker=DEFAULT_SPEAKER):
+    """Label segments and words with the speaker of the maximally overlapping turn.
+
+    Segments without any overlapping turn get ``default_speaker``. Words
+    inside a segment fall back to their segment's speaker; entries of
+    ``word_segments`` that are not part of a segment are left unlabelled
+    when no turn overlaps them. Lists are updated in place and
+    ``segments`` is returned.
+    """
+    index = TurnIndex(turns)
+    _assign(index, segments, [default_speaker] * len(segments))
+
+    words = []
+    fallbacks = []
+    seen = set()
+    for segment in segments:
+        for word in segment.get("words") or []:
+            words.append(word)
+            fallbacks.append(segment["speaker"])
+            seen.add(id(word))
+    for word in word_segments or []:
+        if id(word) not in seen:
+            words.append(word)
+            fallbacks.append(None)
+    _assign(index, words, fallbacks)
+
+    return segments
@@ -0,0 +1,166 @@
+# Languages written without spaces between words
+LANGUAGES_WITHOUT_SPACES = {"ja", "zh", "th", "lo", "km", "my", "yue"}
+
+SUBTITLE_MIMETYPES = {
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt",
+    "txt": "text/plain"
+}
+
+
+def format_timestamp(seconds, vtt_format=False):
+    """Format timestamp for SRT/VTT"""
+    if seconds < 0:
+        seconds = 0
+    whole = int(seconds)
+    # Same truncation as ``seconds % 1`` for non-negative floats
+    millisecs = int((seconds - whole) * 1000)
+    minutes, secs = divmod(whole, 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if vtt_format:
+        return "%02d:%02d:%02d.%03d" % (hours, minutes, secs, millisecs)
+    else:
+        return "%02d:%02d:%02d,%03d" % (hours, minutes, secs, millisecs)
+
+
+def _is_timed(item):
+    # Plain type check: numbers.Real is too slow for per-word use
+    return isinstance(item.get("start"), (int, float)) and isinstance(item.get("end"), (int, float))
+
+
+def _segment_words(segment):
+    """Return ``(text, start, end)`` for each word of a segment.
+
+    Aligned words keep their own timings; words without timings share the
+    time of their neighbours. Unaligned segments get timings interpolated
+    from the character length of each word.
+    """
+    start = segment.get("start", 0)
+    end = segment.get("end", start)
+    words = []
+    timed = False
+    last_end = start
+    for word in segment.get("words") or ():
+        text = str(word.get("word", "")).strip()
+        if not text:
+            continue
+        if _is_timed(word):
+            timed = True
+            last_end = word["end"]
+            words.append((text, word["start"], last_end))
+        else:
+            words.append((text, last_end, last_end))
+    if timed:
+        return words
+
+    texts = segment.get("text", "").split()
+    total = sum(len(text) for text in texts)
+    words = []
+    position = start
+    for text in texts:
+        duration = (end - start) * len(text) / total if total else 0
+        words.append((text, position, position + duration))
+        position += duration
+    return words
+
+
+def iter_cues(segments, max_chars=None, max_words=None, max_duration=None, language=None):
+    """Yield subtitle cues as ``{"start", "end", "text"}`` dicts.
+
+    Without limits every segment becomes one cue. With ``max_chars``,
+    ``max_words`` or ``max_duration`` (seconds) a segment is split at word
+    boundaries, using the aligned word timings when they are present.
+    """
+    separator = "" if language in LANGUAGES_WITHOUT_SPACES else " "
+
+    for segment in segments:
+        if not (max_chars or max_words or max_duration):
+            yield {
+                "start": segment.get("start", 0),
+                "end": segment.get("end", 0),
+                "text": segment.get("text", "").strip()
+            }
+            continue
+
+        cue_words = []
+        cue_chars = 0
+        for text, start, end in _segment_words(segment):
+            if cue_words:
+                too_many_words = max_words and len(cue_words) >= max_words
+                too_many_chars = max_chars and cue_chars + len(separator) + len(text) > max_chars
+                too_long = max_duration and end - cue_words[0][1] > max_duration
+                if too_many_words or too_many_chars or too_long:
+                    yield {
+                        "start": cue_words[0][1],
+                        "end": cue_words[-1][2],
+                        "text": separator.join(word[0] for word in cue_words)
+                    }
+                    cue_words = []
+                    cue_chars = 0
+            cue_chars += len(text) + (len(separator) if cue_words else 0)
+            cue_words.append((text, start, end))
+
+        if cue_words:
+            yield {
+                "start": cue_words[0][1],
+                "end": cue_words[-1][2],
+                "text": separator.join(word[0] for word in cue_words)
+            }
+
+
+def wrap_lines(text, max_words_per_line=None):
+    """Break cue text into lines of at most ``max_words_per_line`` words"""
+    if not max_words_per_line or max_words_per_line <= 0:
+        return text
+    words = text.split()
+    return "\n".join(
+        " ".join(words[i:i + max_words_per_line])
+        for i in range(0, len(words), max_words_per_line)
+    )
+
+
+def iter_srt(segments, max_words_per_line=None, **cue_options):
+    """Yield an SRT document cue by cue"""
+    for i, cue in enumerate(iter_cues(segments, **cue_options), 1):
+        start_time = format_timestamp(cue["start"])
+        end_time = format_timestamp(cue["end"])
+        yield f"{i}\n{start_time} --> {end_time}\n{wrap_lines(cue['text'], max_words_per_line)}\n\n"
+
+
+def iter_vtt(segments, max_words_per_line=None, **cue_options):
+    """Yield a WebVTT document cue by cue"""
+    yield "WEBVTT\n\n"
+    for cue in iter_cues(segments, **cue_options):
+        start_time = format_timestamp(cue["start"], vtt_format=True)
+        end_time = format_timestamp(cue["end"], vtt_format=True)
+        yield f"{start_time} --> {end_time}\n{wrap_lines(cue['text'], max_words_per_line)}\n\n"
+
+
+def iter_txt(segments, max_words_per_line=None, **cue_options):
+    """Yield a plain-text transcript, one cue per line"""
+    for cue in iter_cues(segments, **cue_options):
+        if cue["text"]:
+            yield wrap_lines(cue["text"], max_words_per_line) + "\n"
+
+
+WRITERS = {
+    "srt": iter_srt,
+    "vtt": iter_vtt,
+    "txt": iter_txt
+}
+
+
+def generate_srt(segments, max_words_per_line=None, **cue_options):
+    """Generate SRT format from segments"""
+    return "".join(iter_srt(segments, max_words_per_line, **cue_options))
+
+
+def generate_vtt(segments, max_words_per_line=None, **cue_options):
+    """Generate VTT format from segments"""
+    return "".join(iter_vtt(segments, max_words_per_line, **cue_options))
+
+
+def generate_txt(segments, max_words_per_line=None, **cue_options):
+    """Generate plain text from segments"""
+    return "".join(iter_txt(segments, max_words_per_line, **cue_options))
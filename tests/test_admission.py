@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, estimate_cost
+
+
+def wait_queued(controller, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while controller.stats()["queued"] < count:
+        assert time.monotonic() < deadline, "request never queued"
+        time.sleep(0.005)
+
+
+def admission_order(controller, requests):
+    """Queue ``(name, cost, client, priority)`` requests one by one behind a
+    request holding the whole budget, then return the order they run in"""
+    holder = controller.acquire(controller.budget, client="holder")
+    order = []
+    threads = []
+
+    def run(name, cost, client, priority):
+        with controller.admit(cost, client, priority):
+            order.append(name)
+
+    for i, request in enumerate(requests):
+        thread = threading.Thread(target=run, args=request)
+        thread.start()
+        threads.append(thread)
+        wait_queued(controller, i + 1)
+
+    controller.release(holder)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_estimate_cost_weights_the_requested_stages():
+    assert estimate_cost(10) == 10
+    assert estimate_cost(10, align=True, diarize=True) == pytest.approx(18)
+    assert estimate_cost(-1) == 0
+
+
+def test_admits_immediately_within_the_budget():
+    controller = AdmissionController(budget=100)
+    first = controller.acquire(40)
+    second = controller.acquire(60)
+    assert controller.stats()["in_use"] == 100
+    controller.release(first)
+    controller.release(second)
+    assert controller.stats()["running"] == 0
+
+
+def test_request_over_the_budget_runs_alone():
+    controller = AdmissionController(budget=10)
+    with controller.admit(1000) as ticket:
+        assert ticket.cost == 10
+
+
+def test_clients_are_served_fairly():
+    controller = AdmissionController(budget=10, max_running=1)
+    order = admission_order(controller, [
+        ("a1", 10, "a", 0),
+        ("a2", 10, "a", 0),
+        ("a3", 10, "a", 0),
+        ("b1", 10, "b", 0),
+        ("b2", 10, "b", 0)
+    ])
+    # Client b's requests are not held back behind a's whole burst
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_short_requests_overtake_a_long_burst():
+    controller = AdmissionController(budget=100, max_running=1)
+    order = admission_order(controller, [
+        ("long1", 100, "bulk", 0),
+        ("long2", 100, "bulk", 0),
+        ("short", 5, "interactive", 0)
+    ])
+    assert order.index("short") < order.index("long2")
+
+
+def test_priority_comes_before_fairness():
+    controller = AdmissionController(budget=10, max_running=1)
+    order = admission_order(controller, [
+        ("low1", 1, "a", 0),
+        ("low2", 1, "b", 0),
+        ("high", 10, "a", 5)
+    ])
+    assert order == ["high", "low1", "low2"]
+
+
+def test_wait_timeout_raises_503():
+    controller = AdmissionController(budget=10, max_wait=0.05)
+    holder = controller.acquire(10)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire(5)
+    assert excinfo.value.code == 503
+    assert excinfo.value.retry_after >= 1
+    stats = controller.stats()
+    assert (stats["queued"], stats["timed_out"]) == (0, 1)
+    controller.release(holder)
+
+
+def test_full_queue_rejects_bounded_requests_with_429():
+    controller = AdmissionController(budget=10, max_queued=1)
+    holder = controller.acquire(10)
+    waiter = threading.Thread(target=lambda: controller.release(controller.acquire(10)))
+    waiter.start()
+    wait_queued(controller, 1)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.check()
+    assert excinfo.value.code == 429
+    with pytest.raises(AdmissionRejected):
+        controller.acquire(1)
+
+    # Queued jobs and batch items wait regardless of the limit
+    job = threading.Thread(target=lambda: controller.release(controller.acquire(10, bounded=False)))
+    job.start()
+    wait_queued(controller, 2)
+    controller.release(holder)
+    waiter.join(5)
+    job.join(5)
+    assert controller.stats()["rejected"] == 2
+    assert controller.stats()["admitted"] == 3
+
+
+@pytest.mark.parametrize("max_queued", [0, None])
+def test_zero_queue_size_is_unbounded(max_queued):
+    controller = AdmissionController(budget=10, max_queued=max_queued)
+    controller.check()
+    holder = controller.acquire(10)
+    waiters = [threading.Thread(target=lambda: controller.release(controller.acquire(10))) for _ in range(5)]
+    for waiter in waiters:
+        waiter.start()
+    wait_queued(controller, 5)
+    controller.check()
+
+    controller.release(holder)
+    for waiter in waiters:
+        waiter.join(5)
+    assert controller.stats()["rejected"] == 0
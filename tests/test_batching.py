@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+import pytest
+
+import batching
+from batching import SAMPLE_RATE, BatchScheduler
+
+
+class ChunkModel:
+    """Stub model whose chunk features are the audio samples themselves"""
+
+    def preprocess(self, inputs):
+        return {"inputs": inputs["inputs"]}
+
+
+class Decoder:
+    """Stub ``decode_features``: a chunk's text is its first sample. Records
+    the tokenizer and size of every batch; ``gate`` holds decoding back."""
+
+    def __init__(self, gate=None, error=None):
+        self.gate = gate
+        self.error = error
+        self.batches = []
+
+    def __call__(self, model, features, tokenizer):
+        if self.gate is not None:
+            assert self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        self.batches.append((tokenizer, len(features)))
+        return [f"{tokenizer[0]}:{float(f[0]):g}" for f in features]
+
+
+@pytest.fixture
+def decoder(monkeypatch):
+    decoder = Decoder()
+    monkeypatch.setattr(batching, "decode_features", decoder)
+    monkeypatch.setattr(batching, "make_tokenizer", lambda model, language, task: (language, task))
+    return decoder
+
+
+def chunk(value):
+    return np.full(10, value, dtype=np.float32)
+
+
+def test_concurrent_chunks_share_a_batch(decoder):
+    # A full batch is decoded at once, without waiting out max_wait
+    scheduler = BatchScheduler(ChunkModel(), batch_size=4, max_wait=60)
+    futures = [scheduler.submit("en", "transcribe", chunk(i)) for i in range(4)]
+    assert [future.result(5) for future in futures] == ["en:0", "en:1", "en:2", "en:3"]
+    assert decoder.batches == [(("en", "transcribe"), 4)]
+    stats = scheduler.stats()
+    assert (stats["batches"], stats["chunks"], stats["mean_batch_fill"]) == (1, 4, 1.0)
+    scheduler.close()
+
+
+def test_a_lone_chunk_is_flushed_after_max_wait(decoder):
+    scheduler = BatchScheduler(ChunkModel(), batch_size=16, max_wait=0.01)
+    assert scheduler.submit("en", "transcribe", chunk(7)).result(5) == "en:7"
+    assert decoder.batches == [(("en", "transcribe"), 1)]
+    scheduler.close()
+
+
+def test_batches_never_mix_languages_or_tasks(decoder):
+    decoder.gate = threading.Event()
+    scheduler = BatchScheduler(ChunkModel(), batch_size=8, max_wait=0.01)
+    futures = [
+        scheduler.submit(language, task, chunk(i))
+        for i, (language, task) in enumerate([
+            ("en", "transcribe"), ("fr", "transcribe"), ("en", "translate"),
+            ("en", "transcribe"), ("fr", "transcribe"), ("en", "transcribe")
+        ])
+    ]
+    decoder.gate.set()
+    assert [future.result(5) for future in futures] == ["en:0", "fr:1", "en:2", "en:3", "fr:4", "en:5"]
+    assert sum(size for _, size in decoder.batches) == 6
+    assert len({tokenizer for tokenizer, _ in decoder.batches}) == 3
+    scheduler.close()
+
+
+def test_decode_errors_reach_every_chunk_in_the_batch(decoder):
+    decoder.error = RuntimeError("CUDA out of memory")
+    scheduler = BatchScheduler(ChunkModel(), batch_size=2, max_wait=0.01)
+    futures = [scheduler.submit("en", "transcribe", chunk(i)) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(5)
+    scheduler.close()
+
+
+def test_iter_transcribe_yields_segments_in_order(decoder):
+    # Each second of audio holds its own index, so a chunk's text is its start second
+    audio = np.repeat(np.arange(40, dtype=np.float32), SAMPLE_RATE)
+    spans = [(float(start), float(start) + 0.5) for start in range(0, 40, 2)]
+    plan = {"language": "en", "task": "transcribe", "spans": spans}
+    scheduler = BatchScheduler(ChunkModel(), batch_size=3, max_wait=0.01)
+
+    batches = list(scheduler.iter_transcribe(audio, plan))
+    assert [len(batch) for batch in batches] == [3] * 6 + [2]
+    segments = [segment for batch in batches for segment in batch]
+    assert [(s["start"], s["end"]) for s in segments] == spans
+    assert [s["text"] for s in segments] == [f"en:{start:g}" for start, _ in spans]
+    scheduler.close()
+
+
+def test_close_stops_the_decoding_thread(decoder):
+    scheduler = BatchScheduler(ChunkModel(), batch_size=2, max_wait=0.01)
+    scheduler.submit("en", "transcribe", chunk(1)).result(5)
+    thread = scheduler._thread
+    scheduler.close()
+    thread.join(5)
+    assert not thread.is_alive()
+    # A new submission restarts it
+    assert scheduler.submit("en", "transcribe", chunk(2)).result(5) == "en:2"
@@ -0,0 +1,94 @@
+import gzip
+import json
+
+import pytest
+
+from encoding import columnar_transcript, compress, segments_from_columns
+
+
+def transcript(speakers=True, scores=True):
+    segments = []
+    for i in range(3):
+        words = []
+        for j in range(4):
+            word = {"word": f"w{i}{j}", "start": i * 5 + j * 1.25, "end": i * 5 + j * 1.25 + 1.0}
+            if scores:
+                word["score"] = 0.5 + j / 10
+            if speakers:
+                word["speaker"] = f"SPEAKER_0{(i + j) % 2}"
+            words.append(word)
+        segment = {"start": i * 5.0, "end": i * 5 + 4.75, "text": " ".join(w["word"] for w in words), "words": words}
+        if speakers:
+            segment["speaker"] = f"SPEAKER_0{i % 2}"
+        segments.append(segment)
+    return segments
+
+
+@pytest.mark.parametrize("speakers", [True, False])
+@pytest.mark.parametrize("scores", [True, False])
+def test_round_trip(speakers, scores):
+    segments = transcript(speakers, scores)
+    columns = columnar_transcript(segments)
+    assert segments_from_columns(columns) == segments
+    # The columns are plain JSON
+    assert segments_from_columns(json.loads(json.dumps(columns))) == segments
+
+
+def test_speakers_are_stored_once():
+    columns = columnar_transcript(transcript())
+    assert columns["speakers"] == ["SPEAKER_00", "SPEAKER_01"]
+    assert columns["segments"]["speaker"] == [0, 1, 0]
+    assert columns["words"]["segment"] == [0] * 4 + [1] * 4 + [2] * 4
+
+
+def test_all_null_columns_are_dropped():
+    columns = columnar_transcript(transcript(speakers=False, scores=False))
+    assert "speaker" not in columns["segments"]
+    assert set(columns["words"]) == {"segment", "word", "start", "end"}
+    assert columns["speakers"] == []
+
+
+def test_times_are_rounded():
+    columns = columnar_transcript([{"start": 1.23456, "end": 2.0, "text": "hi"}], time_digits=2)
+    assert columns["segments"]["start"] == [1.23]
+    assert segments_from_columns(columns) == [{"start": 1.23, "end": 2.0, "text": "hi"}]
+
+
+def test_word_segments_without_segments():
+    words = [word for segment in transcript() for word in segment["words"]]
+    columns = columnar_transcript(word_segments=words)
+    assert "segments" not in columns
+    assert "segment" not in columns["words"]
+    assert columns["words"]["word"] == [word["word"] for word in words]
+    assert segments_from_columns(columns) is None
+
+
+def test_segments_without_words_fall_back_to_word_segments():
+    segments = [{"start": 0.0, "end": 1.0, "text": "a b"}]
+    words = [{"word": "a", "start": 0.0, "end": 0.5}, {"word": "b", "start": 0.5, "end": 1.0}]
+    columns = columnar_transcript(segments, words)
+    assert columns["words"]["word"] == ["a", "b"]
+    assert segments_from_columns(columns) == segments
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    from encoding import dump_msgpack
+
+    columns = columnar_transcript(transcript())
+    assert segments_from_columns(msgpack.unpackb(dump_msgpack(columns))) == transcript()
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compress_round_trip(encoding):
+    data = json.dumps(columnar_transcript(transcript())).encode("utf-8")
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        assert zstandard.ZstdDecompressor().decompress(compress(data, encoding)) == data
+    else:
+        assert gzip.decompress(compress(data, encoding)) == data
+
+
+def test_compress_rejects_unknown_encodings():
+    with pytest.raises(ValueError):
+        compress(b"", "br")
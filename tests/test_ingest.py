@@ -0,0 +1,137 @@
+import io
+import os
+
+import pytest
+
+from ingest import IngestError, MediaFetcher
+
+
+class FakeResponse:
+    """A streamed HTTP response; fails the test if a rejected body is read"""
+
+    def __init__(self, body, headers=None, readable=True):
+        self.body = body
+        self.headers = headers or {}
+        self.readable = readable
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        assert self.readable, "body read after the size check"
+        for offset in range(0, len(self.body), chunk_size):
+            yield self.body[offset:offset + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    allowed = tmp_path / "media"
+    allowed.mkdir()
+    (allowed / "a.wav").write_bytes(b"x" * 100)
+    (tmp_path / "secret.wav").write_bytes(b"x" * 10)
+    return allowed
+
+
+def fetcher(tmp_path, max_bytes=1000, **kwargs):
+    temp_dir = tmp_path / "downloads"
+    temp_dir.mkdir(exist_ok=True)
+    return MediaFetcher(max_bytes, chunk_size=16, temp_dir=str(temp_dir), **kwargs)
+
+
+def reject(fetch, url, code):
+    with pytest.raises(IngestError) as excinfo:
+        fetch(url)
+    assert excinfo.value.code == code
+    return excinfo.value
+
+
+def test_local_file_is_used_in_place(tmp_path, media_dir):
+    media = fetcher(tmp_path, allowed_dirs=[str(media_dir)]).fetch(f"file://{media_dir}/a.wav")
+    assert media.path == os.path.realpath(media_dir / "a.wav")
+    assert (media.owned, media.size) == (False, 100)
+    media.cleanup()
+    assert os.path.exists(media.path)
+
+
+def test_local_paths_are_disabled_by_default(tmp_path, media_dir):
+    reject(fetcher(tmp_path).fetch, f"file://{media_dir}/a.wav", 403)
+
+
+@pytest.mark.parametrize("path", [
+    "{media}/../secret.wav",
+    "{media}/%2E%2E/secret.wav",
+    "{media}/link.wav",
+    "{media}/linked-dir/secret.wav",
+    "{media}-other/a.wav",
+    "/etc/passwd"
+])
+def test_paths_outside_the_allowed_dirs_are_rejected(tmp_path, media_dir, path):
+    os.symlink(tmp_path / "secret.wav", media_dir / "link.wav")
+    os.symlink(tmp_path, media_dir / "linked-dir")
+    (tmp_path / "media-other").mkdir()
+    (tmp_path / "media-other" / "a.wav").write_bytes(b"x")
+
+    url = "file://" + path.format(media=media_dir)
+    error = reject(fetcher(tmp_path, allowed_dirs=[str(media_dir)]).fetch, url, 403)
+    assert "outside the allowed directories" in str(error)
+
+
+def test_missing_local_file_is_404(tmp_path, media_dir):
+    reject(fetcher(tmp_path, allowed_dirs=[str(media_dir)]).fetch, f"file://{media_dir}/missing.wav", 404)
+
+
+def test_remote_host_in_file_url_is_rejected(tmp_path, media_dir):
+    reject(fetcher(tmp_path, allowed_dirs=[str(media_dir)]).fetch, f"file://fileserver{media_dir}/a.wav", 400)
+
+
+def test_unsupported_scheme_is_rejected(tmp_path):
+    reject(fetcher(tmp_path).fetch, "ftp://example.com/a.wav", 400)
+
+
+def test_oversized_local_file_is_rejected(tmp_path, media_dir):
+    reject(fetcher(tmp_path, max_bytes=50, allowed_dirs=[str(media_dir)]).fetch, f"file://{media_dir}/a.wav", 413)
+
+
+def test_download_is_streamed_to_a_temp_file(tmp_path, monkeypatch):
+    media_fetcher = fetcher(tmp_path)
+    monkeypatch.setattr(media_fetcher.session, "get", lambda url, **kwargs: FakeResponse(b"abc" * 100))
+    media = media_fetcher.fetch("https://example.com/a.wav")
+    assert (media.owned, media.size) == (True, 300)
+    with open(media.path, "rb") as f:
+        assert f.read() == b"abc" * 100
+    media.cleanup()
+    assert os.listdir(tmp_path / "downloads") == []
+
+
+def test_content_length_over_the_limit_aborts_before_reading(tmp_path, monkeypatch):
+    media_fetcher = fetcher(tmp_path, max_bytes=100)
+    response = FakeResponse(b"x" * 200, {"Content-Length": "200"}, readable=False)
+    monkeypatch.setattr(media_fetcher.session, "get", lambda url, **kwargs: response)
+    reject(media_fetcher.fetch, "https://example.com/a.wav", 413)
+    assert os.listdir(tmp_path / "downloads") == []
+
+
+def test_streamed_body_over_the_limit_aborts(tmp_path, monkeypatch):
+    media_fetcher = fetcher(tmp_path, max_bytes=100)
+    # No Content-Length (chunked or compressed transfer)
+    monkeypatch.setattr(media_fetcher.session, "get", lambda url, **kwargs: FakeResponse(b"x" * 10_000))
+    error = reject(media_fetcher.fetch, "https://example.com/a.wav", 413)
+    assert "100 bytes" in str(error)
+    assert os.listdir(tmp_path / "downloads") == []
+
+
+def test_upload_over_the_limit_aborts(tmp_path):
+    media_fetcher = fetcher(tmp_path, max_bytes=100)
+    reject(media_fetcher.save_upload, io.BytesIO(b"x" * 101), 413)
+    assert os.listdir(tmp_path / "downloads") == []
+
+    media = media_fetcher.save_upload(io.BytesIO(b"x" * 100))
+    assert media.size == 100
+    media.cleanup()
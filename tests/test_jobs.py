@@ -0,0 +1,222 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import jobs
+import loadtest
+from audio import SAMPLE_RATE, DecodedAudio
+from ingest import MediaFile
+from jobs import JobManager, JobQueueFull
+
+
+class HandlerError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def wait_finished(manager, job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.finished_at is None or manager.backlog():
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+
+def test_submit_runs_the_handler():
+    manager = JobManager(lambda params: ({"text": params["id"]}, 0.5, {"decode": 0.1}))
+    job = manager.submit({"id": "abc"})
+    assert job.status in ("queued", "running", "completed")
+    wait_finished(manager, job)
+
+    assert manager.get(job.job_id) is job
+    assert job.to_dict() == {
+        "job_id": job.job_id,
+        "id": "abc",
+        "status": "completed",
+        "code": 200,
+        "response": {"text": "abc"},
+        "message": "success",
+        "queue_time": round(job.started_at - job.created_at, 2),
+        "processing_time": 0.5,
+        "timings": {"decode": 0.1}
+    }
+    assert manager.stats()["completed"] == 1
+
+
+def test_failed_job_reports_the_error_code():
+    def handler(params):
+        raise HandlerError("Unsupported media", 415)
+
+    manager = JobManager(handler)
+    job = manager.submit({})
+    wait_finished(manager, job)
+    assert (job.status, job.code, job.message) == ("failed", 415, "Unsupported media")
+
+
+def test_job_ids_carry_the_prefix():
+    manager = JobManager(lambda params: ({}, 0, None), id_prefix="w1-")
+    job = manager.submit({})
+    wait_finished(manager, job)
+    assert job.job_id.startswith("w1-")
+
+
+def test_full_queue_rejects_until_a_slot_frees():
+    release = threading.Event()
+
+    def handler(params):
+        release.wait(5)
+        return {}, 0, None
+
+    manager = JobManager(handler, max_workers=1, max_queued=1)
+    running = manager.submit({})
+    queued = manager.submit({})
+    with pytest.raises(JobQueueFull):
+        manager.submit({})
+    assert manager.backlog() == 2
+
+    release.set()
+    wait_finished(manager, running)
+    wait_finished(manager, queued)
+    job = manager.submit({})
+    wait_finished(manager, job)
+    assert job.status == "completed"
+
+
+def test_finished_jobs_expire_after_the_ttl():
+    manager = JobManager(lambda params: ({}, 0, None), result_ttl=60)
+    old = manager.submit({})
+    wait_finished(manager, old)
+    recent = manager.submit({})
+    wait_finished(manager, recent)
+
+    old.finished_at -= 61
+    assert manager.get(old.job_id) is None
+    assert manager.get(recent.job_id) is recent
+
+
+class FakeWebhook:
+    """Records webhook posts, failing the first ``failures`` of them"""
+
+    def __init__(self, failures, expected_calls):
+        self.failures = failures
+        self.expected_calls = expected_calls
+        self.payloads = []
+        self.done = threading.Event()
+
+    def post(self, url, json=None, timeout=None):
+        self.payloads.append(json)
+        if len(self.payloads) >= self.expected_calls:
+            self.done.set()
+        if len(self.payloads) <= self.failures:
+            raise jobs.requests.ConnectionError("connection refused")
+        return FakeResponse()
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    """Record the webhook retry delays instead of sleeping (for every
+    thread, so these tests wait on events rather than polling)"""
+    sleeps = []
+    monkeypatch.setattr(jobs.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_webhook_is_retried_with_backoff(monkeypatch, backoff):
+    webhook = FakeWebhook(failures=2, expected_calls=3)
+    monkeypatch.setattr(jobs.requests, "post", webhook.post)
+    manager = JobManager(lambda params: ({"text": "hi"}, 0, None), webhook_retries=3)
+    job = manager.submit({"id": "abc"}, webhook_url="http://example.com/hook")
+
+    assert webhook.done.wait(5)
+    assert backoff == [2, 4]
+    assert all(payload["job_id"] == job.job_id for payload in webhook.payloads)
+    assert webhook.payloads[-1]["status"] == "completed"
+    assert webhook.payloads[-1]["response"] == {"text": "hi"}
+
+
+def test_webhook_gives_up_after_the_retries(monkeypatch, backoff):
+    webhook = FakeWebhook(failures=10, expected_calls=3)
+    monkeypatch.setattr(jobs.requests, "post", webhook.post)
+    manager = JobManager(lambda params: ({}, 0, None), webhook_retries=3)
+    job = manager.submit({}, webhook_url="http://example.com/hook")
+
+    assert webhook.done.wait(5)
+    assert len(webhook.payloads) == 3
+    assert backoff == [2, 4]
+    # The result stays available for polling
+    assert manager.get(job.job_id).status == "completed"
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    loadtest.install_stubs()
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module, monkeypatch, tmp_path):
+    """Test client transcribing a local WAV file with the stub models"""
+    path = str(tmp_path / "speech.wav")
+    loadtest.write_wav(path, 3)
+    monkeypatch.setattr(app_module.Config, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(app_module, "result_cache", None)
+    monkeypatch.setattr(app_module, "fetch_media", lambda params: MediaFile(path, owned=False))
+    monkeypatch.setattr(app_module, "decode_audio", lambda path, **kwargs: DecodedAudio(
+        np.zeros(3 * SAMPLE_RATE, dtype=np.float32)
+    ))
+    return app_module.app.test_client()
+
+
+def test_async_job_through_the_api(app_module, client):
+    response = client.post("/v1/media/transcribe", json={
+        "media_url": "http://example.com/speech.wav",
+        "id": "req-1",
+        "async": True
+    })
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["status"] == "queued"
+
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(body["status_url"]).get_json()
+        if job["status"] in ("completed", "failed"):
+            break
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert (job["status"], job["code"], job["id"]) == ("completed", 200, "req-1")
+    assert job["response"]["segments"]
+
+
+def test_full_job_queue_returns_503(app_module, client, monkeypatch):
+    release = threading.Event()
+
+    def handler(params):
+        release.wait(5)
+        return {}, 0, None
+
+    manager = JobManager(handler, max_workers=1, max_queued=0)
+    monkeypatch.setattr(app_module, "job_manager", manager)
+    request = {"media_url": "http://example.com/speech.wav", "async": True}
+    try:
+        assert client.post("/v1/media/transcribe", json=request).status_code == 202
+        response = client.post("/v1/media/transcribe", json=request)
+        assert response.status_code == 503
+        assert response.get_json()["code"] == 503
+    finally:
+        release.set()
+
+
+def test_unknown_job_is_404(client):
+    response = client.get("/v1/jobs/does-not-exist")
+    assert response.status_code == 404
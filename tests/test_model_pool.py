@@ -0,0 +1,135 @@
+import threading
+import time
+
+from model_pool import ModelPool, estimate_whisper_bytes
+
+
+class Loader:
+    """Counts loads per key; keys in ``gates`` block until their event is set"""
+
+    def __init__(self, gates=None):
+        self.gates = gates or {}
+        self.loads = []
+        self.started = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._lock:
+            self.loads.append(name)
+        self.started.set()
+        gate = self.gates.get(name)
+        if gate is not None:
+            assert gate.wait(5)
+        return f"model-{name}"
+
+
+def sized(sizes):
+    return lambda model, key: sizes[key[0]]
+
+
+def test_hits_reuse_the_loaded_model():
+    loader = Loader()
+    pool = ModelPool("test", loader)
+    assert pool.get(("a",)) == "model-a"
+    assert pool.get(("a",)) == "model-a"
+    assert loader.loads == ["a"]
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["loads"]) == (1, 1, 1)
+
+
+def test_model_count_limit_evicts_the_least_recently_used():
+    evicted = []
+    pool = ModelPool("test", Loader(), max_models=2, on_evict=evicted.append)
+    pool.get(("a",))
+    pool.get(("b",))
+    pool.get(("a",))
+    pool.get(("c",))
+    assert pool.loaded() == [("a",), ("c",)]
+    assert evicted == [("b",)]
+
+
+def test_byte_budget_evicts_until_the_new_model_fits():
+    sizes = {"a": 4, "b": 4, "c": 6}
+    pool = ModelPool("test", Loader(), max_bytes=10, size_fn=sized(sizes))
+    pool.get(("a",))
+    pool.get(("b",))
+    assert pool.stats()["bytes"] == 8
+    pool.get(("c",))
+    assert pool.loaded() == [("b",), ("c",)]
+    assert pool.stats()["bytes"] == 10
+    assert pool.stats()["evictions"] == 1
+
+
+def test_a_model_over_the_budget_is_still_kept():
+    pool = ModelPool("test", Loader(), max_bytes=10, size_fn=sized({"a": 4, "big": 20}))
+    pool.get(("a",))
+    pool.get(("big",))
+    assert pool.loaded() == [("big",)]
+
+
+def test_pinned_models_are_never_evicted():
+    sizes = {"pinned": 4, "b": 4, "c": 4}
+    pool = ModelPool("test", Loader(), max_bytes=10, size_fn=sized(sizes), pinned=[("pinned",)])
+    pool.get(("pinned",))
+    pool.get(("b",))
+    pool.get(("c",))
+    assert pool.loaded() == [("pinned",), ("c",)]
+
+    pool = ModelPool("test", Loader(), max_models=1, pinned=[("a",), ("b",)])
+    pool.get(("a",))
+    pool.get(("b",))
+    # Pinned models may exceed the limits rather than be dropped
+    assert pool.loaded() == [("a",), ("b",)]
+    assert [model["pinned"] for model in pool.stats()["models"]] == [True, True]
+
+
+def test_concurrent_requests_share_one_load():
+    gate = threading.Event()
+    loader = Loader({"a": gate})
+    pool = ModelPool("test", loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get(("a",)))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert loader.started.wait(5)
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert loader.loads == ["a"]
+    assert results == ["model-a"] * 4
+    assert pool.stats()["hits"] == 3
+
+
+def test_different_keys_load_in_parallel():
+    gate = threading.Event()
+    loader = Loader({"slow": gate})
+    pool = ModelPool("test", loader)
+    slow = threading.Thread(target=pool.get, args=(("slow",),))
+    slow.start()
+    assert loader.started.wait(5)
+
+    # Not blocked behind the slow load
+    assert pool.get(("fast",)) == "model-fast"
+    gate.set()
+    slow.join(5)
+    assert sorted(loader.loads) == ["fast", "slow"]
+
+
+def test_prewarm_logs_failures():
+    def loader(name):
+        if name == "broken":
+            raise RuntimeError("download failed")
+        return name
+
+    pool = ModelPool("test", loader)
+    pool.prewarm([("broken",), ("ok",)])
+    assert pool.loaded() == [("ok",)]
+
+
+def test_whisper_size_from_name_and_compute_type():
+    assert estimate_whisper_bytes(None, ("large-v3", "cuda", "float16")) == 3_100_000_000
+    assert estimate_whisper_bytes(None, ("Systran/faster-whisper-small", "cpu", "int8")) == 244_000_000
+    assert estimate_whisper_bytes(None, ("medium.en", "cuda", "float32")) == 769_000_000 * 4
+    assert estimate_whisper_bytes(None, ("my-finetune", "cuda", "float16")) == 0
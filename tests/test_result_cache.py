@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from result_cache import RESULT_PARAMS, ResultCache, hash_file
+
+PARAMS = {
+    "model": "large-v3",
+    "compute_type": "float16",
+    "task": "transcribe",
+    "language": None,
+    "beam_size": 5,
+    "temperature": 0.0,
+    "include_word_timestamps": True,
+    "include_speaker_labels": False,
+    "max_speakers": None,
+    "output_format": "json",
+    "max_words_per_line": None
+}
+
+
+def value(n, size=100):
+    """A cached value whose JSON encoding is exactly ``size`` bytes"""
+    text = f"{n:>{size - len(json.dumps({'text': ''}))}}"
+    data = {"text": text}
+    assert len(json.dumps(data)) == size
+    return data
+
+
+def test_put_and_get(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    assert cache.get("a") is None
+    cache.put("a", {"segments": [{"text": "hi"}]})
+    assert cache.get("a") == {"segments": [{"text": "hi"}]}
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=250)
+    cache.put("a", value(1))
+    cache.put("b", value(2))
+    assert cache.get("a") == value(1)
+    cache.put("c", value(3))
+
+    assert cache.get("b") is None
+    assert not os.path.exists(tmp_path / "b.json")
+    assert cache.get("a") == value(1)
+    assert cache.get("c") == value(3)
+    assert cache.stats()["bytes"] == 200
+
+
+def test_replacing_an_entry_does_not_double_count(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=250)
+    cache.put("a", value(1))
+    cache.put("a", value(2))
+    cache.put("b", value(3))
+    assert cache.stats()["bytes"] == 200
+    assert cache.get("a") == value(2)
+
+
+def test_values_larger_than_the_cache_are_not_stored(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=50)
+    cache.put("a", value(1))
+    assert cache.get("a") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_entries_survive_a_restart(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", value(1))
+    cache.put("b", value(2))
+
+    reopened = ResultCache(str(tmp_path), max_bytes=1000)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.get("b") == value(2)
+
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", value(1))
+    (tmp_path / "a.json").write_text("{not json")
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_key_depends_on_the_audio(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    first = tmp_path / "first.wav"
+    second = tmp_path / "second.wav"
+    first.write_bytes(b"RIFF1")
+    second.write_bytes(b"RIFF2")
+    assert hash_file(str(first)) != hash_file(str(second))
+    assert cache.make_key(hash_file(str(first)), PARAMS) != cache.make_key(hash_file(str(second)), PARAMS)
+
+
+@pytest.mark.parametrize("name, changed", [
+    ("model", "medium"),
+    ("compute_type", "int8"),
+    ("task", "translate"),
+    ("language", "en"),
+    ("beam_size", 1),
+    ("temperature", 0.2),
+    ("include_word_timestamps", False),
+    ("include_speaker_labels", True),
+    ("max_speakers", 2)
+])
+def test_key_depends_on_each_result_param(tmp_path, name, changed):
+    assert name in RESULT_PARAMS
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    assert cache.make_key("abc", PARAMS) != cache.make_key("abc", dict(PARAMS, **{name: changed}))
+
+
+@pytest.mark.parametrize("name, changed", [
+    ("output_format", "srt"),
+    ("max_words_per_line", 5),
+    ("id", "request-2")
+])
+def test_key_ignores_output_options(tmp_path, name, changed):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    assert cache.make_key("abc", PARAMS) == cache.make_key("abc", dict(PARAMS, **{name: changed}))
@@ -0,0 +1,182 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+from speakers import DEFAULT_SPEAKER, TurnIndex, assign_speakers
+
+
+def nested_loop_speaker(item, turns):
+    """The original speaker assignment: strictly largest overlap, first turn wins ties"""
+    best_speaker = None
+    max_overlap = 0
+    for turn in turns:
+        overlap = max(0, min(item["end"], turn["end"]) - max(item["start"], turn["start"]))
+        if overlap > max_overlap:
+            max_overlap = overlap
+            best_speaker = turn["speaker"]
+    return best_speaker
+
+
+def reference_assign(segments, turns, word_segments=None):
+    """Nested-loop labels for segments and words, with the documented fallbacks"""
+    seen = set()
+    for segment in segments:
+        segment["speaker"] = nested_loop_speaker(segment, turns) or DEFAULT_SPEAKER
+        for word in segment.get("words") or []:
+            seen.add(id(word))
+            speaker = nested_loop_speaker(word, turns) if "start" in word else None
+            word["speaker"] = speaker or segment["speaker"]
+    for word in word_segments or []:
+        if id(word) not in seen and "start" in word:
+            speaker = nested_loop_speaker(word, turns)
+            if speaker:
+                word["speaker"] = speaker
+    return segments
+
+
+def random_case(rng, num_turns, num_segments, span=120.0):
+    turns = []
+    for _ in range(num_turns):
+        start = round(rng.uniform(0, span), rng.choice([0, 1, 3]))
+        duration = rng.choice([0.0, round(rng.uniform(0, 2), 1), rng.uniform(0, 20), rng.uniform(0, span)])
+        turns.append({"start": start, "end": start + duration, "speaker": f"SPEAKER_{rng.randrange(5):02d}"})
+
+    segments = []
+    word_segments = []
+    for _ in range(num_segments):
+        start = round(rng.uniform(0, span), rng.choice([0, 1, 3]))
+        end = start + rng.choice([0.0, rng.uniform(0, 10)])
+        words = []
+        for _ in range(rng.randrange(4)):
+            word_start = rng.uniform(start, end)
+            word = {"word": "w", "start": word_start, "end": rng.uniform(word_start, end)}
+            words.append(word)
+            word_segments.append(word)
+        segments.append({"start": start, "end": end, "text": "w", "words": words})
+    # Words that belong to no segment
+    for _ in range(rng.randrange(3)):
+        start = rng.uniform(0, span)
+        word_segments.append({"word": "x", "start": start, "end": start + rng.uniform(0, 1)})
+    return turns, segments, word_segments
+
+
+def labels(segments, word_segments):
+    return (
+        [segment.get("speaker") for segment in segments],
+        [[word.get("speaker") for word in segment.get("words", [])] for segment in segments],
+        [word.get("speaker") for word in word_segments]
+    )
+
+
+def assert_matches_nested_loop(turns, segments, word_segments=None):
+    # deepcopy keeps words shared between segments and word_segments shared
+    expected_segments, expected_words = copy.deepcopy((segments, word_segments or []))
+    reference_assign(expected_segments, turns, expected_words)
+    assign_speakers(segments, turns, word_segments)
+    assert labels(segments, word_segments or []) == labels(expected_segments, expected_words)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_nested_loop_on_random_input(seed):
+    rng = random.Random(seed)
+    turns, segments, word_segments = random_case(rng, rng.randrange(0, 40), rng.randrange(1, 30))
+    assert_matches_nested_loop(turns, segments, word_segments)
+
+
+def test_matches_nested_loop_with_a_turn_spanning_everything():
+    rng = random.Random(7)
+    turns, segments, word_segments = random_case(rng, 200, 200)
+    turns.insert(50, {"start": -1.0, "end": 1000.0, "speaker": "BACKGROUND"})
+    assert_matches_nested_loop(turns, segments, word_segments)
+
+
+def test_tie_goes_to_the_earliest_turn_in_list_order():
+    turns = [
+        {"start": 5.0, "end": 10.0, "speaker": "B"},
+        {"start": 0.0, "end": 5.0, "speaker": "A"},
+    ]
+    segments = [{"start": 3.0, "end": 7.0}]
+    assign_speakers(segments, turns)
+    assert segments[0]["speaker"] == "B"
+
+    # Equal starts: list order decides as well
+    turns = [
+        {"start": 0.0, "end": 4.0, "speaker": "C"},
+        {"start": 0.0, "end": 4.0, "speaker": "D"},
+    ]
+    segments = [{"start": 1.0, "end": 2.0}]
+    assign_speakers(segments, turns)
+    assert segments[0]["speaker"] == "C"
+
+
+def test_zero_length_turns_and_segments_never_overlap():
+    turns = [{"start": 2.0, "end": 2.0, "speaker": "ZERO"}]
+    segments = [{"start": 1.0, "end": 3.0}, {"start": 2.0, "end": 2.0}]
+    assign_speakers(segments, turns)
+    assert [s["speaker"] for s in segments] == [DEFAULT_SPEAKER, DEFAULT_SPEAKER]
+
+
+def test_nested_turns_pick_the_larger_overlap():
+    turns = [
+        {"start": 0.0, "end": 100.0, "speaker": "OUTER"},
+        {"start": 10.0, "end": 20.0, "speaker": "INNER"},
+    ]
+    segments = [
+        {"start": 12.0, "end": 18.0},  # Tie at 6s: OUTER comes first
+        {"start": 5.0, "end": 25.0},   # OUTER overlaps 20s, INNER 10s
+        {"start": 50.0, "end": 60.0},
+    ]
+    assign_speakers(segments, turns)
+    assert [s["speaker"] for s in segments] == ["OUTER", "OUTER", "OUTER"]
+
+    turns = [
+        {"start": 10.0, "end": 20.0, "speaker": "INNER"},
+        {"start": 0.0, "end": 100.0, "speaker": "OUTER"},
+    ]
+    segments = [{"start": 12.0, "end": 18.0}]
+    assign_speakers(segments, turns)
+    assert segments[0]["speaker"] == "INNER"
+
+
+def test_segments_without_overlap_get_the_default_speaker():
+    segments = [{"start": 0.0, "end": 1.0}, {"start": 5.0, "end": 6.0}]
+    assign_speakers(segments, [{"start": 2.0, "end": 4.0, "speaker": "A"}])
+    assert [s["speaker"] for s in segments] == [DEFAULT_SPEAKER, DEFAULT_SPEAKER]
+
+    segments = [{"start": 0.0, "end": 1.0}]
+    assign_speakers(segments, [], default_speaker="NOBODY")
+    assert segments[0]["speaker"] == "NOBODY"
+
+
+def test_words_fall_back_to_their_segment_speaker():
+    turns = [{"start": 0.0, "end": 2.0, "speaker": "A"}, {"start": 3.0, "end": 4.0, "speaker": "B"}]
+    inside = {"word": "one", "start": 0.5, "end": 1.0}
+    gap = {"word": "two", "start": 2.2, "end": 2.8}
+    untimed = {"word": "3"}
+    stray = {"word": "four", "start": 10.0, "end": 11.0}
+    segments = [{"start": 0.0, "end": 2.9, "words": [inside, gap, untimed]}]
+    assign_speakers(segments, turns, [inside, gap, untimed, stray])
+
+    assert segments[0]["speaker"] == "A"
+    assert [inside["speaker"], gap["speaker"], untimed["speaker"]] == ["A", "A", "A"]
+    # Not part of any segment and no overlapping turn: left unlabelled
+    assert "speaker" not in stray
+
+
+def test_turn_index_returns_minus_one_without_overlap():
+    index = TurnIndex([{"start": 0.0, "end": 1.0, "speaker": "A"}])
+    assert index.best_turns([0.5, 2.0], [0.8, 3.0]).tolist() == [0, -1]
+    assert TurnIndex([]).best_turns([0.0], [1.0]).tolist() == [-1]
+
+
+def test_long_turn_does_not_widen_the_search_for_other_turns():
+    turns = [{"start": float(i), "end": i + 0.9, "speaker": f"S{i % 3}"} for i in range(2000)]
+    turns.append({"start": 0.0, "end": 2000.0, "speaker": "BACKGROUND"})
+    index = TurnIndex(turns)
+    starts = [i + 0.1 for i in range(2000)]
+    starts = np.array(starts)
+    query_idx, _ = index._candidates(starts, starts + 0.5)
+    # The neighbouring short turns plus the long one, not every earlier turn
+    assert len(query_idx) <= 4 * len(starts)
@@ -0,0 +1,107 @@
+import pytest
+
+from subtitles import format_timestamp, generate_srt, generate_txt, generate_vtt, iter_cues, wrap_lines
+
+
+def aligned_segment(words, start=0.0, step=1.0):
+    """A segment with one aligned word per ``step`` seconds"""
+    timed = [
+        {"word": word, "start": start + i * step, "end": start + i * step + 0.5 * step}
+        for i, word in enumerate(words)
+    ]
+    return {"start": start, "end": timed[-1]["end"], "text": " ".join(words), "words": timed}
+
+
+def cues(segments, **options):
+    return [(cue["start"], cue["end"], cue["text"]) for cue in iter_cues(segments, **options)]
+
+
+def test_without_limits_each_segment_is_a_cue():
+    segments = [aligned_segment(["one", "two"]), aligned_segment(["three"], start=5)]
+    assert cues(segments) == [(0.0, 1.5, "one two"), (5, 5.5, "three")]
+
+
+def test_split_by_word_count_uses_word_timings():
+    segment = aligned_segment(["a", "b", "c", "d", "e"])
+    assert cues([segment], max_words=2) == [
+        (0.0, 1.5, "a b"),
+        (2.0, 3.5, "c d"),
+        (4.0, 4.5, "e")
+    ]
+
+
+def test_split_by_characters():
+    segment = aligned_segment(["alpha", "beta", "gamma", "delta", "epsilon"])
+    result = cues([segment], max_chars=12)
+    assert [text for _, _, text in result] == ["alpha beta", "gamma delta", "epsilon"]
+    assert all(len(text) <= 12 for _, _, text in result)
+
+
+def test_a_word_longer_than_the_limit_gets_its_own_cue():
+    segment = aligned_segment(["a", "extraordinarily", "b"])
+    assert [text for _, _, text in cues([segment], max_chars=5)] == ["a", "extraordinarily", "b"]
+
+
+def test_split_by_duration():
+    segment = aligned_segment(["a", "b", "c", "d", "e", "f"])
+    result = cues([segment], max_duration=2.0)
+    assert [text for _, _, text in result] == ["a b", "c d", "e f"]
+    assert all(end - start <= 2.0 for start, end, _ in result)
+
+
+def test_cues_never_span_segments():
+    segments = [aligned_segment(["a", "b"]), aligned_segment(["c", "d"], start=3)]
+    assert [text for _, _, text in cues(segments, max_words=3)] == ["a b", "c d"]
+
+
+def test_unaligned_segment_is_split_by_character_length():
+    segment = {"start": 0.0, "end": 6.0, "text": " aa bbbb "}
+    assert cues([segment], max_words=1) == [(0.0, 2.0, "aa"), (2.0, 6.0, "bbbb")]
+
+
+def test_untimed_words_share_their_neighbours_time():
+    segment = {
+        "start": 0.0,
+        "end": 3.0,
+        "text": "a 42 b",
+        "words": [
+            {"word": "a", "start": 0.0, "end": 1.0},
+            {"word": "42"},
+            {"word": "b", "start": 2.0, "end": 3.0}
+        ]
+    }
+    assert cues([segment], max_words=2) == [(0.0, 1.0, "a 42"), (2.0, 3.0, "b")]
+
+
+def test_languages_without_spaces_are_joined_directly():
+    segment = aligned_segment(["今日", "は", "晴れ", "です"])
+    assert [text for _, _, text in cues([segment], max_chars=3, language="ja")] == ["今日は", "晴れ", "です"]
+
+
+@pytest.mark.parametrize("seconds, srt, vtt", [
+    (0, "00:00:00,000", "00:00:00.000"),
+    (3661.5, "01:01:01,500", "01:01:01.500"),
+    (-1, "00:00:00,000", "00:00:00.000")
+])
+def test_format_timestamp(seconds, srt, vtt):
+    assert format_timestamp(seconds) == srt
+    assert format_timestamp(seconds, vtt_format=True) == vtt
+
+
+def test_wrap_lines():
+    assert wrap_lines("a b c d e", 2) == "a b\nc d\ne"
+    assert wrap_lines("a b c", None) == "a b c"
+
+
+def test_documents_use_the_split_cues():
+    segment = aligned_segment(["a", "b", "c"])
+    assert generate_srt([segment], max_words=2) == (
+        "1\n00:00:00,000 --> 00:00:01,500\na b\n\n"
+        "2\n00:00:02,000 --> 00:00:02,500\nc\n\n"
+    )
+    assert generate_vtt([segment], max_words_per_line=1, max_words=2) == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:01.500\na\nb\n\n"
+        "00:00:02.000 --> 00:00:02.500\nc\n\n"
+    )
+    assert generate_txt([segment], max_words=2) == "a b\nc\n"
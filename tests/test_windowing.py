@@ -0,0 +1,188 @@
+import random
+
+import numpy as np
+import pytest
+
+import loadtest
+from windowing import find_silence, plan_windows
+
+SAMPLE_RATE = 16000
+# Speakers are told apart by their level; who speaks depends only on absolute time
+SPEAKER_LEVELS = (0.25, 0.5, 0.75)
+SPEAKER_TURN_SECONDS = 23
+
+
+def synthetic_speech(duration, seed=0, crossing=None, sample_rate=SAMPLE_RATE):
+    """Speech regions separated by silent gaps.
+
+    Speakers take turns every ``SPEAKER_TURN_SECONDS`` of absolute time,
+    so a region crossing a change is split between two speakers.
+    ``crossing`` forces one region covering that time, e.g. a window's
+    nominal end. Returns the waveform and the regions in seconds.
+    """
+    rng = random.Random(seed)
+    regions = []
+    position = 1.0
+    while position < duration - 1:
+        length = rng.uniform(2, 12)
+        if crossing is not None and position < crossing < position + length + 4:
+            # Make this region span the nominal cut
+            length = crossing - position + rng.uniform(2, 5)
+        end = min(position + length, duration - 1)
+        regions.append((round(position, 2), round(end, 2)))
+        position = end + rng.uniform(0.5, 3)
+
+    waveform = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    epochs = np.arange(len(waveform)) // (SPEAKER_TURN_SECONDS * sample_rate)
+    levels = np.asarray(SPEAKER_LEVELS, dtype=np.float32)[epochs % len(SPEAKER_LEVELS)]
+    for start, end in regions:
+        region = slice(int(round(start * sample_rate)), int(round(end * sample_rate)))
+        waveform[region] = levels[region]
+    return waveform, regions
+
+
+def runs(values):
+    """(start, end) sample runs of equal non-zero values"""
+    changes = np.flatnonzero(np.diff(values)) + 1
+    bounds = np.concatenate(([0], changes, [len(values)]))
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if values[start] != 0]
+
+
+class SpeechModel:
+    """Stub WhisperX model: one segment per stretch of speech"""
+
+    def transcribe(self, audio, batch_size=16, language=None, task=None, **kwargs):
+        segments = []
+        for start, end in runs((np.asarray(audio) != 0).astype(np.int8)):
+            segments.append({"start": round(start / SAMPLE_RATE, 3), "end": round(end / SAMPLE_RATE, 3)})
+        return {"segments": segments, "language": language or "en"}
+
+
+def align(segments, model, metadata, audio, device, return_char_alignments=False, **kwargs):
+    """Stub alignment: a word every second of each segment"""
+    aligned = []
+    word_segments = []
+    for segment in segments:
+        words = []
+        position = segment["start"]
+        while position < segment["end"]:
+            words.append({"word": "w", "start": round(position, 3),
+                          "end": round(min(position + 0.8, segment["end"]), 3), "score": 0.9})
+            position += 1.0
+        aligned.append(dict(segment, text=" ".join(w["word"] for w in words), words=words))
+        word_segments.extend(words)
+    return {"segments": aligned, "word_segments": word_segments}
+
+
+class SpeakerPipeline:
+    """Stub diarization: a turn per run of one speaker's level, with local
+    labels in order of appearance like pyannote, plus one embedding per label"""
+
+    def __call__(self, audio, return_embeddings=False, **kwargs):
+        audio = np.asarray(audio)
+        turns = []
+        local_labels = {}
+        embeddings = {}
+        for start, end in runs(audio):
+            level = float(audio[start])
+            if level not in local_labels:
+                local = local_labels[level] = f"SPEAKER_{len(local_labels):02d}"
+                embeddings[local] = np.eye(len(SPEAKER_LEVELS))[SPEAKER_LEVELS.index(level)]
+            turns.append({"start": start / SAMPLE_RATE, "end": end / SAMPLE_RATE, "speaker": local_labels[level]})
+        return (turns, embeddings) if return_embeddings else turns
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_cors")
+    loadtest.install_stubs()
+    import app
+    return app
+
+
+@pytest.fixture
+def pipeline(app_module, monkeypatch):
+    """The app with stub models and 60 s windows cut within 15 s"""
+    whisperx = app_module.whisperx.load()
+    monkeypatch.setattr(whisperx, "DiarizationPipeline", SpeakerPipeline)
+    monkeypatch.setattr(whisperx, "align", align)
+    monkeypatch.setattr(app_module.whisper_pool, "get", lambda key: SpeechModel())
+    monkeypatch.setattr(app_module, "load_alignment_model", lambda language: (object(), {"language": language}))
+    monkeypatch.setattr(app_module, "load_diarization_model", SpeakerPipeline)
+    monkeypatch.setattr(app_module.Config, "BATCH_SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(app_module.Config, "LONG_AUDIO_WINDOW_SECONDS", 60)
+    monkeypatch.setattr(app_module.Config, "LONG_AUDIO_OVERLAP_SECONDS", 15)
+    return app_module
+
+
+def transcribe(app, waveform, long_audio):
+    params = app.parse_transcribe_params({
+        "media_url": "http://example.com/a.wav",
+        "include_word_timestamps": "true",
+        "include_speaker_labels": "true"
+    })
+    run = app.transcribe_long_audio if long_audio else app.transcribe_audio
+    result = run(waveform, params, {})
+    return result["segments"], result["word_segments"]
+
+
+def timing(items):
+    return [(item["start"], item["end"]) for item in items]
+
+
+def partition(items):
+    """Speaker labels renamed in order of first appearance"""
+    names = {}
+    return [names.setdefault(item["speaker"], len(names)) for item in items]
+
+
+@pytest.mark.parametrize("parallel_diarization", [True, False])
+@pytest.mark.parametrize("seed", range(5))
+def test_long_audio_matches_single_pass(pipeline, monkeypatch, seed, parallel_diarization):
+    monkeypatch.setattr(pipeline.Config, "PARALLEL_DIARIZATION", parallel_diarization)
+    waveform, _ = synthetic_speech(400, seed=seed, crossing=60.0)
+    segments, words = transcribe(pipeline, waveform, long_audio=True)
+    expected_segments, expected_words = transcribe(pipeline, waveform, long_audio=False)
+
+    assert len(plan_windows(waveform, SAMPLE_RATE, 60, 15)) > 5
+    assert timing(segments) == timing(expected_segments)
+    assert [s["text"] for s in segments] == [s["text"] for s in expected_segments]
+    assert [timing(s["words"]) for s in segments] == [timing(s["words"]) for s in expected_segments]
+    assert timing(words) == timing(expected_words)
+    assert len(set(partition(expected_segments))) == len(SPEAKER_LEVELS)
+    assert partition(segments) == partition(expected_segments)
+    assert partition(words) == partition(expected_words)
+
+
+def test_segment_crossing_the_nominal_cut_stays_whole(pipeline):
+    waveform, regions = synthetic_speech(200, seed=3, crossing=60.0)
+    crossing = next((start, end) for start, end in regions if start < 60.0 < end)
+    segments, _ = transcribe(pipeline, waveform, long_audio=True)
+
+    # The first window ends in the pause before the crossing region
+    first_end = plan_windows(waveform, SAMPLE_RATE, 60, 15)[0][1] / SAMPLE_RATE
+    assert first_end <= crossing[0]
+    assert timing(segments).count(crossing) == 1
+
+
+def test_windows_cover_the_audio_once():
+    waveform, _ = synthetic_speech(1000, seed=1, sample_rate=100)
+    windows = plan_windows(waveform, 100, 90, 15)
+    assert windows[0][0] == 0 and windows[-1][1] == len(waveform)
+    assert all(prev_end == next_start for (_, prev_end), (next_start, _) in zip(windows, windows[1:]))
+    assert all(end - start <= 90 * 100 for start, end in windows)
+    # Every cut lands in silence
+    assert all(waveform[end] == 0 for _, end in windows[:-1])
+
+
+def test_short_audio_is_one_window():
+    waveform, _ = synthetic_speech(50, sample_rate=100)
+    assert plan_windows(waveform, 100, 60, 15) == [(0, len(waveform))]
+
+
+def test_find_silence_prefers_the_longest_pause():
+    audio = np.full(1000, 0.5, dtype=np.float32)
+    audio[100:120] = 0  # short pause
+    audio[600:800] = 0  # long pause
+    assert 600 <= find_silence(audio, 0, 1000, 100) < 800
@@ -0,0 +1,224 @@
+import numbers
+
+import numpy as np
+
+
+def find_silence(waveform, start, end, sample_rate, frame_seconds=0.02, quiet_ratio=0.1):
+    """Return the sample index at the centre of the longest quiet stretch in
+    ``[start, end)``.
+
+    A frame is quiet when its energy is at most ``quiet_ratio`` times the
+    median frame energy of the span (or it is the quietest frame), a
+    simple energy-based voice activity detector. Only that span is read,
+    so memory-mapped input stays on disk.
+    """
+    frame = max(int(frame_seconds * sample_rate), 1)
+    region = np.asarray(waveform[start:end], dtype=np.float32)
+    count = len(region) // frame
+    if count == 0:
+        return (start + end) // 2
+    energy = np.square(region[:count * frame]).reshape(count, frame).mean(axis=1)
+    quiet = (energy <= quiet_ratio * np.median(energy)) | (energy <= energy.min())
+
+    # Longest run of quiet frames; the latest one wins ties to keep windows long
+    best_start, best_length = 0, 0
+    run_start = None
+    for i, is_quiet in enumerate(np.append(quiet, False)):
+        if is_quiet and run_start is None:
+            run_start = i
+        elif not is_quiet and run_start is not None:
+            if i - run_start >= best_length:
+                best_start, best_length = run_start, i - run_start
+            run_start = None
+    return start + (best_start * frame + (best_start + best_length) * frame) // 2
+
+
+def plan_windows(waveform, sample_rate, window_seconds, search_seconds):
+    """Split a waveform into consecutive ``(start, end)`` sample windows that
+    end in silence.
+
+    Each window ends at the longest quiet stretch within the last
+    ``search_seconds`` before ``window_seconds``, so speech is not cut
+    mid-utterance and every sample is transcribed by exactly one window.
+    Without any pause in that span the cut falls on its quietest frame.
+    """
+    num_samples = len(waveform)
+    window = int(window_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), window // 2)
+    windows = []
+    start = 0
+    while num_samples - start > window:
+        target = start + window
+        cut = find_silence(waveform, target - search, target, sample_rate)
+        windows.append((start, cut))
+        start = cut
+    windows.append((start, num_samples))
+    return windows
+
+
+def _is_timed(item):
+    return isinstance(item.get("start"), numbers.Real) and isinstance(item.get("end"), numbers.Real)
+
+
+def shift_items(items, offset):
+    """Shift the timestamps of segments (and their words) or turns in place"""
+    for item in items:
+        if _is_timed(item):
+            item["start"] = round(item["start"] + offset, 3)
+            item["end"] = round(item["end"] + offset, 3)
+        for word in item.get("words") or []:
+            if _is_timed(word):
+                word["start"] = round(word["start"] + offset, 3)
+                word["end"] = round(word["end"] + offset, 3)
+    return items
+
+
+def _overlap(a_start, a_end, b_start, b_end):
+    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+
+
+def match_speakers(reference_turns, turns, region_start, region_end):
+    """Map local speaker labels onto reference labels.
+
+    Speakers are paired greedily by how long they talk at the same time
+    within ``[region_start, region_end)``, the overlap between two windows.
+    Returns ``{local_label: reference_label}`` for matched speakers only.
+    """
+    scores = {}
+    for ref in reference_turns:
+        ref_start = max(ref["start"], region_start)
+        ref_end = min(ref["end"], region_end)
+        if ref_end <= ref_start:
+            continue
+        for turn in turns:
+            shared = _overlap(ref_start, ref_end, turn["start"], turn["end"])
+            if shared > 0:
+                key = (turn["speaker"], ref["speaker"])
+                scores[key] = scores.get(key, 0.0) + shared
+
+    mapping = {}
+    used = set()
+    for (local, reference), _ in sorted(scores.items(), key=lambda item: -item[1]):
+        if local not in mapping and reference not in used:
+            mapping[local] = reference
+            used.add(reference)
+    return mapping
+
+
+def _cosine(a, b):
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / norm) if norm else 0.0
+
+
+class WindowStitcher:
+    """Stitch per-window pipeline output back into one timeline.
+
+    Windows come from ``plan_windows``: consecutive and cut in silence, so
+    each window's segments and words are shifted to absolute time and
+    concatenated. Diarization sees each window plus ``context_seconds`` of
+    the previous one (``diarization_window``). Speaker labels are carried
+    across windows by co-talk in that shared context; speakers who are
+    silent there are matched by embedding similarity when the diarization
+    provides speaker embeddings. Remaining speakers get new global labels.
+    """
+
+    def __init__(self, windows, sample_rate, context_seconds=0.0, similarity_threshold=0.5):
+        self.windows = windows
+        self.sample_rate = sample_rate
+        self.context = int(context_seconds * sample_rate)
+        self.bounds = [(start / float(sample_rate), end / float(sample_rate)) for start, end in windows]
+        self.segments = []
+        self.word_segments = []
+        self.turns = []
+        self._previous_turns = []
+        self._speaker_count = 0
+        self._centroids = {}  # global label -> (embedding sum, count)
+        self.similarity_threshold = similarity_threshold
+
+    def diarization_window(self, index):
+        """Sample range to diarize for a window: the window plus the tail of the previous one"""
+        start, end = self.windows[index]
+        return max(start - self.context, 0), end
+
+    def _new_label(self):
+        label = f"SPEAKER_{self._speaker_count:02d}"
+        self._speaker_count += 1
+        return label
+
+    def _relabel(self, index, turns, embeddings=None):
+        if index > 0:
+            region_start = self.diarization_window(index)[0] / float(self.sample_rate)
+            mapping = match_speakers(self._previous_turns, turns, region_start, self.bounds[index][0])
+        else:
+            mapping = {}
+
+        embeddings = embeddings or {}
+        for turn in turns:
+            local = turn["speaker"]
+            if local in mapping:
+                continue
+            mapping[local] = self._closest_speaker(embeddings.get(local), set(mapping.values())) or self._new_label()
+
+        for local, label in mapping.items():
+            if embeddings.get(local) is not None:
+                vector = np.asarray(embeddings[local], dtype=np.float64)
+                total, count = self._centroids.get(label, (np.zeros_like(vector), 0))
+                self._centroids[label] = (total + vector, count + 1)
+        for turn in turns:
+            turn["speaker"] = mapping[turn["speaker"]]
+
+    def _closest_speaker(self, embedding, taken):
+        """Return the known speaker most similar to an embedding, or None"""
+        if embedding is None or not len(embedding):
+            return None
+        best_label = None
+        best_score = self.similarity_threshold
+        for label, (total, count) in self._centroids.items():
+            if label in taken:
+                continue
+            score = _cosine(np.asarray(embedding, dtype=np.float64), total / count)
+            if score >= best_score:
+                best_label, best_score = label, score
+        return best_label
+
+    def preview(self, index, segments):
+        """Return shifted copies of a window's segments without recording
+        them (used to stream partial output)"""
+        offset, _ = self.bounds[index]
+        copies = [dict(segment, words=[dict(word) for word in segment["words"]]) if segment.get("words") else dict(segment) for segment in segments]
+        return shift_items(copies, offset)
+
+    def add(self, index, segments, word_segments=None, turns=None, embeddings=None):
+        """Add one window's output and return its segments in absolute time.
+
+        ``segments`` and ``word_segments`` are relative to the window start;
+        ``turns`` are relative to the start of ``diarization_window(index)``.
+        ``embeddings`` optionally maps the window's local speaker labels to
+        speaker embedding vectors.
+        """
+        offset, window_end = self.bounds[index]
+
+        shift_items(segments, offset)
+        self.segments.extend(segments)
+
+        if word_segments:
+            # Words nested in segments were already shifted with them
+            nested = {id(word) for segment in segments for word in segment.get("words") or []}
+            shift_items([w for w in word_segments if id(w) not in nested], offset)
+            self.word_segments.extend(word_segments)
+
+        if turns is not None:
+            context_start = self.diarization_window(index)[0] / float(self.sample_rate)
+            turns = shift_items([dict(turn) for turn in turns], context_start)
+            self._relabel(index, turns, embeddings)
+            self._previous_turns = turns
+            # The context belongs to the previous window; the last window keeps everything after its start
+            low = offset if index > 0 else float("-inf")
+            high = window_end if index < len(self.windows) - 1 else float("inf")
+            for turn in turns:
+                start = max(turn["start"], low)
+                end = min(turn["end"], high)
+                if end > start:
+                    self.turns.append({"start": start, "end": end, "speaker": turn["speaker"]})
+
+        return segments
@@ -0,0 +1,133 @@
+"""Worker processes for multi-process serving.
+
+``plan_workers`` decides how many model workers to run and pins each to a
+device; ``WorkerSupervisor`` starts them and restarts any that exit. The
+dispatcher in ``dispatcher.py`` proxies requests to them.
+"""
+import os
+import sys
+import time
+import threading
+import subprocess
+
+from config import Config
+
+
+class WorkerSpec:
+    """One model worker process: its slot, device and environment"""
+
+    def __init__(self, slot, device, port, env):
+        self.slot = slot
+        self.device = device
+        self.port = port
+        self.env = env
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def to_dict(self):
+        return {"slot": self.slot, "device": self.device, "url": self.url}
+
+
+def plan_workers(force_cpu=False, devices=("0",), processes=0, cpu_threads=0, base_port=5773, cpu_count=None):
+    """Assign worker slots to devices.
+
+    On GPU each worker sees one device through ``CUDA_VISIBLE_DEVICES``;
+    with more processes than devices they are spread round robin. On CPU
+    the available cores are split evenly unless ``cpu_threads`` is set.
+    """
+    if force_cpu:
+        processes = processes or 1
+        threads = cpu_threads or max((cpu_count or os.cpu_count() or 1) // processes, 1)
+    else:
+        devices = list(devices) or ["0"]
+        processes = processes or len(devices)
+
+    specs = []
+    for slot in range(processes):
+        env = {"WORKER_SLOT": str(slot), "JOB_ID_PREFIX": f"w{slot}-"}
+        if force_cpu:
+            device = "cpu"
+            env.update({
+                "FORCE_CPU": "true",
+                "CPU_THREADS": str(threads),
+                "OMP_NUM_THREADS": str(threads),
+                "MKL_NUM_THREADS": str(threads)
+            })
+        else:
+            index = devices[slot % len(devices)]
+            device = f"cuda:{index}"
+            env["CUDA_VISIBLE_DEVICES"] = index
+        specs.append(WorkerSpec(slot, device, base_port + slot, env))
+    return specs
+
+
+def plan_workers_from_config():
+    return plan_workers(
+        force_cpu=Config.DEFAULT_DEVICE == "cpu",
+        devices=Config.WORKER_DEVICES,
+        processes=Config.WORKER_PROCESSES,
+        cpu_threads=Config.CPU_THREADS,
+        base_port=Config.WORKER_BASE_PORT
+    )
+
+
+def gunicorn_command(spec):
+    """Command line that serves the API for one worker under gunicorn"""
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+    return [sys.executable, "-m", "gunicorn", "--config", config, "--bind", f"127.0.0.1:{spec.port}"]
+
+
+class WorkerSupervisor:
+    """Start the worker processes and restart any that exit.
+
+    ``command`` turns a WorkerSpec into an argument list; the spec's
+    environment is added to this process's environment. ``stdout`` is
+    passed to the worker processes (default: inherited).
+    """
+
+    def __init__(self, specs, command=gunicorn_command, restart_delay=5.0, cwd=None, stdout=None):
+        self.specs = specs
+        self.command = command
+        self.stdout = stdout
+        self.restart_delay = restart_delay
+        self.cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+        self.processes = {}
+        self.restarts = 0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _spawn(self, spec):
+        env = dict(os.environ)
+        env.update(spec.env)
+        process = subprocess.Popen(self.command(spec), cwd=self.cwd, env=env, stdout=self.stdout)
+        print(f"Started worker {spec.slot} on {spec.device} (pid {process.pid}, port {spec.port})")
+        self.processes[spec.slot] = process
+
+    def start(self):
+        for spec in self.specs:
+            self._spawn(spec)
+        self._thread = threading.Thread(target=self._watch, name="worker-supervisor", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while not self._stopping.wait(self.restart_delay):
+            for spec in self.specs:
+                code = self.processes[spec.slot].poll()
+                if code is not None and not self._stopping.is_set():
+                    print(f"Worker {spec.slot} exited with code {code}, restarting")
+                    self.restarts += 1
+                    self._spawn(spec)
+
+    def stop(self, timeout=30):
+        self._stopping.set()
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.time() + timeout
+        for process in self.processes.values():
+            try:
+                process.wait(max(deadline - time.time(), 0.1))
+            except subprocess.TimeoutExpired:
+                process.kill()